@@ -0,0 +1,107 @@
+"""
+Benchmark LLM JSON recovery on megabyte-scale responses
+
+Builds a summary-shaped response (Hindi and English text, fenced, with trailing
+commas and raw newlines inside strings) and times recover_json against the
+previous clean_json_string + json.loads and safe_json_response paths. The old
+functions are reproduced here for comparison only.
+
+Usage:
+    python -m benchmarks.bench_json_recovery --clauses 2000 --runs 5
+"""
+import argparse
+import json
+import re
+import string
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.llm_provider.json_recovery import recover_json
+
+CLAUSE_TEXT = (
+    "The Issuer shall disclose all material information to the stock exchanges within the prescribed timelines.\n"
+    "सूचीबद्ध इकाई सभी महत्वपूर्ण सूचनाओं का प्रकटीकरण निर्धारित समय-सीमा के भीतर करेगी। "
+)
+
+
+def legacy_clean_json_string(json_str: str) -> str:
+    """clean_json_string as it was in run_pipeline.py"""
+    json_str = json_str.replace("```json", "").replace("```", "").strip()
+    valid_chars = string.printable + '\n\r\t'
+    cleaned = ''.join(char if char in valid_chars else ' ' for char in json_str)
+    cleaned = re.sub(r',\s*([}\]])', r'\1', cleaned)
+    cleaned = ''.join(char if ord(char) >= 32 or char in '\n\r\t' else ' ' for char in cleaned)
+    return cleaned.strip()
+
+
+def legacy_safe_json_response(text: str):
+    """safe_json_response as it was in safe_json_helper.py"""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        match = re.search(r"\{.*\}", text, re.DOTALL)
+        if match:
+            safe_json = re.sub(r'\\(?![\\/"bfnrtu])', r'\\\\', match.group(0))
+            return json.loads(safe_json)
+        raise
+
+
+def build_response(num_clauses: int, raw_newlines: bool) -> str:
+    """A fenced summary response with trailing commas, optionally with raw newlines in strings"""
+    clause_text = CLAUSE_TEXT if raw_newlines else CLAUSE_TEXT.replace("\n", "\\n")
+    clauses = ",\n".join(
+        f'    {{"clause_id": "C-{i + 1}", "text_en": "{clause_text * 2}", "page": {i // 10 + 1},}}'
+        for i in range(num_clauses)
+    )
+    return (
+        "```json\n{\n"
+        f'  "summary": "{clause_text * 20}",\n'
+        '  "Timelines": {"listing": {"start": "2024-01-01", "end": null,},},\n'
+        f'  "Clauses": [\n{clauses},\n  ],\n'
+        "}\n```"
+    )
+
+
+def time_call(func, text: str, runs: int) -> tuple:
+    best, result = float("inf"), None
+    for _ in range(runs):
+        start = time.perf_counter()
+        try:
+            result = func(text)
+        except Exception as e:
+            result = e
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clauses", type=int, default=2000, help="Clauses in the synthetic response")
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs per implementation (best is reported)")
+    args = parser.parse_args()
+
+    implementations = [
+        ("clean_json_string+loads", lambda raw: json.loads(legacy_clean_json_string(raw))),
+        ("safe_json_response", legacy_safe_json_response),
+        ("recover_json", recover_json),
+    ]
+    for raw_newlines in (False, True):
+        text = build_response(args.clauses, raw_newlines)
+        label = "fences, trailing commas" + (", raw newlines" if raw_newlines else "")
+        print(f"\nResponse: {len(text.encode('utf-8')) / 1e6:.2f} MB, {args.clauses} clauses ({label})")
+        print(f"{'implementation':<24} {'ms':>9}  result")
+        for name, func in implementations:
+            elapsed, result = time_call(func, text, args.runs)
+            if isinstance(result, Exception):
+                outcome = f"failed: {type(result).__name__}"
+            else:
+                hindi_kept = "सूचीबद्ध" in result.get("summary", "")
+                outcome = f"{len(result.get('Clauses', []))} clauses, Unicode {'kept' if hindi_kept else 'lost'}"
+            print(f"{name:<24} {elapsed:>9.1f}  {outcome}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark sequential vs page-parallel PDF text extraction
+
+Generates a synthetic filing (500 text-dense pages by default) with PyMuPDF,
+or uses a PDF passed with --input, and times both extraction paths.
+
+Usage:
+    python -m benchmarks.bench_pdf_extraction --pages 500 --runs 3 --mode layout
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.extraction import extract_pipeline
+
+PARAGRAPH = (
+    "The Company shall comply with the SEBI (Issue of Capital and Disclosure Requirements) Regulations, 2018 "
+    "and disclose all material risks, related party transactions and pending litigation in the offer document. "
+)
+
+
+def build_pdf(pages: int) -> bytes:
+    """Create a multi-page PDF with a page of wrapped text on every page"""
+    with fitz.open() as doc:
+        for number in range(pages):
+            page = doc.new_page()
+            text = f"{number + 1}. Section {number + 1}\n" + PARAGRAPH * 30
+            page.insert_textbox(fitz.Rect(50, 50, 550, 800), text, fontsize=8)
+        return doc.tobytes()
+
+
+def time_extraction(file_bytes: bytes, parallel: bool, runs: int, mode: str) -> tuple:
+    best, pages = float("inf"), None
+    for _ in range(runs):
+        start = time.perf_counter()
+        pages = extract_pipeline.extract_pages(file_bytes, parallel=parallel, mode=mode)
+        best = min(best, time.perf_counter() - start)
+    return best, pages
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", help="Optional PDF to benchmark instead of a generated one")
+    parser.add_argument("--pages", type=int, default=500, help="Pages in the generated PDF")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per mode; the best time is reported")
+    parser.add_argument("--mode", choices=["text", "layout"], default=extract_pipeline.EXTRACTION_MODE)
+    args = parser.parse_args()
+
+    file_bytes = Path(args.input).read_bytes() if args.input else build_pdf(args.pages)
+
+    # Warm the pool so worker start-up isn't billed to the first run
+    extract_pipeline.get_process_pool().submit(int).result()
+
+    sequential, sequential_pages = time_extraction(file_bytes, parallel=False, runs=args.runs, mode=args.mode)
+    parallel, parallel_pages = time_extraction(file_bytes, parallel=True, runs=args.runs, mode=args.mode)
+    stats = {}
+    for _ in extract_pipeline.iter_pdf_pages(file_bytes, parallel=False, mode=args.mode, stats=stats):
+        pass
+    extract_pipeline.shutdown_process_pool()
+
+    assert sequential_pages == parallel_pages, "parallel extraction changed page order or content"
+
+    print(f"pages:      {len(sequential_pages)}")
+    print(f"mode:       {args.mode} ({stats['tokens']} of {stats['raw_tokens']} tokens kept, {stats['tokens_saved']} saved)")
+    print(f"workers:    {extract_pipeline.MAX_EXTRACT_WORKERS}")
+    print(f"sequential: {sequential:.3f}s")
+    print(f"parallel:   {parallel:.3f}s ({sequential / parallel:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
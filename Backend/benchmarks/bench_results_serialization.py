@@ -0,0 +1,115 @@
+"""
+Benchmark results.json serialization options
+
+Builds a synthetic processing result shaped like the output of run_backend
+and reports the stored size and parse time for every encoder/compression
+combination supported by PayloadCodec.
+
+Usage:
+    python -m benchmarks.bench_results_serialization --clauses 40 --runs 50
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.storage.serialization import PayloadCodec, SUPPORTED_COMPRESSIONS, SUPPORTED_ENCODERS
+
+CLAUSE_TEXT = (
+    "The Issuer shall ensure that all material information is disclosed to the stock exchanges "
+    "within the timelines prescribed under the SEBI (Listing Obligations and Disclosure Requirements) "
+    "Regulations, 2015, and shall not enter into any arrangement that prejudices minority shareholders. "
+)
+
+
+def _text(rng: random.Random, repeat: int) -> str:
+    """Shuffle the sample clause so payloads don't compress unrealistically well"""
+    words = (CLAUSE_TEXT * repeat).split()
+    rng.shuffle(words)
+    return " ".join(words)
+
+
+def build_results(num_clauses: int) -> dict:
+    """Create a results payload with realistic clause, rule and risk content"""
+    rng = random.Random(42)
+    clauses = [{"clause_id": f"C-{i + 1}", "text_en": _text(rng, 3)} for i in range(num_clauses)]
+    verification_results = [
+        {
+            "clause": clause["text_en"],
+            "is_compliant": i % 3 != 0,
+            "matched_rules": [
+                {
+                    "rule": _text(rng, 2),
+                    "metadata": {"doc_id": f"sebi_{j}", "clause_id": f"R-{j}", "chunk_id": f"{j}-0", "score": 12.5 - j},
+                    "is_relevant": j < 2,
+                    "reason": "The rule governs disclosure timelines applicable to the clause.",
+                }
+                for j in range(5)
+            ],
+            "final_reason": "The clause aligns with disclosure obligations but omits timelines.",
+            "Section": "Compliance",
+        }
+        for i, clause in enumerate(clauses)
+    ]
+    risk_explanations = [
+        {
+            "severity": "High",
+            "category": "Legal",
+            "risk_score": 9,
+            "impact": "Legal risk (high) detected.",
+            "mitigation": "Review and address compliance gap immediately.",
+        }
+        for _ in clauses
+    ]
+    return {
+        "document_id": "doc_benchmark",
+        "summary": _text(rng, 20),
+        "timelines": {f"timeline{i}": {"start": "2024", "end": None, "description": _text(rng, 1)} for i in range(5)},
+        "clauses": clauses,
+        "compliance_results": {
+            "verification_results": verification_results,
+            "risk_explanations": risk_explanations,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clauses", type=int, default=40, help="Number of clauses in the synthetic document")
+    parser.add_argument("--runs", type=int, default=50, help="Parse iterations per configuration")
+    args = parser.parse_args()
+
+    results = build_results(args.clauses)
+    baseline = json.dumps(results, indent=2, default=str).encode("utf-8")
+
+    start = time.perf_counter()
+    for _ in range(args.runs):
+        json.loads(baseline)
+    baseline_ms = (time.perf_counter() - start) / args.runs * 1000
+
+    print(f"{'encoder':<8} {'compression':<11} {'bytes':>10} {'saved':>8} {'parse ms':>9} {'saved ms':>9}")
+    print(f"{'indent':<8} {'none':<11} {len(baseline):>10} {'-':>8} {baseline_ms:>9.3f} {'-':>9}")
+
+    for encoder in SUPPORTED_ENCODERS:
+        for compression in SUPPORTED_COMPRESSIONS:
+            codec = PayloadCodec(encoder=encoder, compression=compression)
+            if (codec.encoder, codec.compression) != (encoder, compression):
+                print(f"{encoder:<8} {compression:<11} {'(not installed)':>10}")
+                continue
+            payload = codec.encode(results)
+
+            start = time.perf_counter()
+            for _ in range(args.runs):
+                codec.decode(payload)
+            parse_ms = (time.perf_counter() - start) / args.runs * 1000
+
+            saved = 1 - len(payload) / len(baseline)
+            print(f"{encoder:<8} {compression:<11} {len(payload):>10} {saved:>7.1%} {parse_ms:>9.3f} {baseline_ms - parse_ms:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Fuzz LLM JSON recovery
+
+Runs recover_json over a corpus of malformed responses seen from the summary
+and verifier models, then over randomly damaged versions of valid payloads:
+each payload is wrapped in fences/prose and serialized with trailing commas,
+raw control characters or Python literals, and must come back equal to the
+original. Truncated copies must be recovered or rejected with JSONDecodeError.
+
+Usage:
+    python -m benchmarks.fuzz_json_recovery --cases 5000 --seed 7
+"""
+import argparse
+import json
+import random
+import re
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.llm_provider.json_recovery import recover_json
+
+# (raw response, expected value)
+CORPUS = [
+    ('{"a": 1}', {"a": 1}),
+    ('```json\n{"a": 1}\n```', {"a": 1}),
+    ('```\n{"a": [1, 2,]}\n```', {"a": [1, 2]}),
+    ('Here is the analysis:\n{"is_compliant": true, "matched_rules": [],}\nLet me know!', {"is_compliant": True, "matched_rules": []}),
+    ('{"summary": "line one\nline two\ttabbed"}', {"summary": "line one\nline two\ttabbed"}),
+    ('{"summary": "सेबी विनियम, 2015 के अनुसार प्रकटीकरण"}', {"summary": "सेबी विनियम, 2015 के अनुसार प्रकटीकरण"}),
+    ('{"path": "C:\\data\\sebi"}', {"path": "C:\\data\\sebi"}),
+    ('{"quote": "He said \\"comply\\" {now}"}', {"quote": 'He said "comply" {now}'}),
+    ('{"ok": True, "missing": None, "bad": False}', {"ok": True, "missing": None, "bad": False}),
+    ('{"results": [{"clause_id": "1", "is_compliant": false,},]}', {"results": [{"clause_id": "1", "is_compliant": False}]}),
+    ('[{"clause_id": "1"}, {"clause_id": "2"},]', [{"clause_id": "1"}, {"clause_id": "2"}]),
+    ('```json\n[1, 2, 3]\n```', [1, 2, 3]),
+    ('{"a": {"b": [1, {"c": "d"}]}} trailing {"x": 1}', {"a": {"b": [1, {"c": "d"}]}}),
+    ('{"Summary": "cut off', {"Summary": "cut off"}),
+    ('{"Clauses": [{"clause_id": "C-1", "text_en": "x"},', {"Clauses": [{"clause_id": "C-1", "text_en": "x"}]}),
+    ('{"a": [1, 2}', {"a": [1, 2]}),
+    ('{"emoji": "✅ compliant 🚩", "yen": "¥"}', {"emoji": "✅ compliant 🚩", "yen": "¥"}),
+    ('{"ctrl": "bell\x07here"}', {"ctrl": "bell\x07here"}),
+    ('{"unicode": "\\u0938\\u0947\\u092c\\u0940"}', {"unicode": "सेबी"}),
+    ('{"text": "True story, None of it False"}', {"text": "True story, None of it False"}),
+]
+
+WORDS = ["SEBI", "सेबी", "disclosure", "क्लॉज़", "risk", "C:\\temp", "tab\there", "new\nline", "\"quoted\"", "{brace}", "[bracket]", "✅"]
+
+
+def random_value(rng: random.Random, depth: int = 0):
+    choice = rng.random()
+    if depth > 3 or choice < 0.4:
+        return rng.choice([
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 6))),
+            rng.randint(-1000, 1000),
+            round(rng.uniform(-100, 100), 3),
+            rng.choice([True, False, None]),
+        ])
+    if choice < 0.7:
+        return [random_value(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+    return {f"k{i}_{rng.choice(WORDS)}": random_value(rng, depth + 1) for i in range(rng.randint(0, 4))}
+
+
+def _string(value: str, raw_controls: bool, ensure_ascii: bool) -> str:
+    text = json.dumps(value, ensure_ascii=ensure_ascii)
+    if raw_controls:
+        # Raw newlines/tabs instead of escapes; only escapes not preceded by another backslash
+        text = re.sub(r'(?<!\\)((?:\\\\)*)\\([nt])', lambda m: m.group(1) + ("\n" if m.group(2) == "n" else "\t"), text)
+    return text
+
+
+def damage(rng: random.Random, value, options: dict = None) -> str:
+    """Serialize a value the way a careless LLM might: trailing commas, Python literals, raw control characters"""
+    if options is None:
+        options = {
+            "trailing_commas": rng.random() < 0.5,
+            "python_literals": rng.random() < 0.3,
+            "raw_controls": rng.random() < 0.4,
+            "ensure_ascii": rng.random() < 0.2,
+        }
+        prefix, suffix = rng.choice([("", ""), ("```json\n", "\n```"), ("Sure! Here is the JSON:\n", "\nHope this helps."), ("```\n", "\n```\nDone.")])
+        return prefix + damage(rng, value, options) + suffix
+
+    trailing = "," if options["trailing_commas"] and rng.random() < 0.5 else ""
+    if isinstance(value, dict):
+        items = [f"{_string(key, options['raw_controls'], options['ensure_ascii'])}: {damage(rng, item, options)}"
+                 for key, item in value.items()]
+        return "{" + ", ".join(items) + (trailing if items else "") + "}"
+    if isinstance(value, list):
+        items = [damage(rng, item, options) for item in value]
+        return "[" + ",\n ".join(items) + (trailing if items else "") + "]"
+    if isinstance(value, str):
+        return _string(value, options["raw_controls"], options["ensure_ascii"])
+    if options["python_literals"] and (value is None or isinstance(value, bool)):
+        return repr(value)
+    return json.dumps(value)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cases", type=int, default=2000, help="Random damaged payloads to try")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    failures = 0
+    for raw, expected in CORPUS:
+        try:
+            result = recover_json(raw)
+        except Exception as e:
+            result = f"<{type(e).__name__}: {e}>"
+        if result != expected:
+            failures += 1
+            print(f"[CORPUS] {raw!r}\n  expected {expected!r}\n  got      {result!r}")
+
+    rng = random.Random(args.seed)
+    for case in range(args.cases):
+        value = {"case": case, "data": random_value(rng)}
+        raw = damage(rng, value)
+        try:
+            result = recover_json(raw)
+        except Exception as e:
+            failures += 1
+            print(f"[FUZZ {case}] {type(e).__name__}: {e}\n  {raw[:200]!r}")
+            continue
+        if result != value:
+            failures += 1
+            print(f"[FUZZ {case}] mismatch\n  {raw[:200]!r}")
+
+        # Truncated responses are recovered, or rejected with JSONDecodeError
+        cut = raw[:rng.randint(1, len(raw))]
+        if "{" in cut:
+            try:
+                recover_json(cut)
+            except json.JSONDecodeError:
+                pass  # nothing recoverable, e.g. cut right after a key
+            except Exception as e:
+                failures += 1
+                print(f"[TRUNCATED {case}] {type(e).__name__}: {e}\n  {cut[:200]!r}")
+
+    total = len(CORPUS) + args.cases
+    print(f"{total - failures}/{total} cases recovered")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,56 @@
 """
 Compliance Agent
 
-This agent uses all the agents under it to ensure compliance 
+This agent uses all the agents under it to ensure compliance
 with regulatory requirements by analyzing and verifying relevant data.
+
+Clauses flow through retrieve -> verify -> risk as a pipeline: each clause moves
+to the next stage as soon as its own work is done, with bounded queues between
+stages, so a slow retrieval for one clause no longer holds up every other clause.
+Retrieval runs in micro-batches, so embeddings are encoded several clauses at a time.
 """
 
+import asyncio
+import os
 from src.compliance_checker.regulation_retriever import RegulationRetriever
-from src.compliance_checker.llm_verifier import LLMVerifier
+from src.compliance_checker.llm_verifier import LLMVerifier, VERIFY_CONCURRENCY, VERIFY_BATCH_MAX_CLAUSES
 from src.compliance_checker.risk_explainer_agent import RiskExplainer
+from src.llm_provider.llm_clients import close_llm_clients
+
+# Retrieval calls in flight, and clauses per call (encoded together)
+RETRIEVE_CONCURRENCY = int(os.getenv("RETRIEVE_CONCURRENCY", "4"))
+RETRIEVE_BATCH_SIZE = int(os.getenv("RETRIEVE_BATCH_SIZE", str(VERIFY_BATCH_MAX_CLAUSES)))
+# Items allowed to wait between two stages
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "16"))
+
+def count_verdicts(verification_results: list) -> dict:
+    """
+    Count compliant, non-compliant and unverified clauses.
+    Clauses whose verification failed (see LLMVerifier.error_result) are only counted
+    as unverified, so an LLM outage does not read as non-compliance.
+    Args:
+        verification_results: Verification results, in clause order.
+    Returns:
+        A dictionary with compliant_count, non_compliant_count, unverified_count and
+        compliance_rate, the percentage of verified clauses that are compliant.
+    """
+    unverified = sum(1 for result in verification_results if result.get("is_compliant") is None)
+    compliant = sum(1 for result in verification_results if result.get("is_compliant") is True)
+    verified = len(verification_results) - unverified
+    return {
+        "compliant_count": compliant,
+        "non_compliant_count": verified - compliant,
+        "unverified_count": unverified,
+        "compliance_rate": round(compliant / verified * 100, 2) if verified > 0 else 0
+    }
 
 class ComplianceAgent:
-    def __init__(self, llm_client: str ="gemini"):
+    def __init__(self, llm_client: str = None):
         """
         Initialize the ComplianceAgent with the specified LLM client and vector database.
+        The client defaults to COMPLIANCE_LLM_PROVIDER ("gemini", "openai", "claude", "mistral" or "auto").
         """
+        llm_client = llm_client or os.getenv("COMPLIANCE_LLM_PROVIDER", "gemini")
         self.regulation_retriever = RegulationRetriever("faiss_index.bin", "metadata.pkl")
         self.llm_verifier = LLMVerifier(llm_client=llm_client)
         self.risk_explainer = RiskExplainer()
@@ -21,16 +58,149 @@ class ComplianceAgent:
     def ensure_compliance(self, clauses):
         """
         Ensure compliance of the given clauses with regulatory requirements.
+        Runs the pipeline on a private event loop, so call it from worker threads only;
+        several threads may share one agent, and with it the loaded retrieval model.
         Args:
             clauses: A list of legal clauses to verify.
         Returns:
             A dictionary containing verification results and risk explanations.
         """
-        relevant_rules = self.regulation_retriever.retrieve_similar_rules(clauses)
-        verification_results = self.llm_verifier.verify_clauses(relevant_rules)
-        risk_explanations = self.risk_explainer.explain_all(verification_results)
+        async def run():
+            try:
+                return await self.aensure_compliance(clauses)
+            finally:
+                # Async LLM clients are bound to this loop, which closes when we return
+                await close_llm_clients()
+
+        return asyncio.run(run())
+
+    async def _next_group(self, queue: asyncio.Queue) -> list:
+        """
+        Wait for the next retrieved clause, then take the ones already queued, up to a batch.
+        Returns an empty list once retrieval is finished.
+        """
+        item = await queue.get()
+        if item is None:
+            # Keep the end marker for the next call
+            queue.put_nowait(None)
+            return []
+        group = [item]
+        while len(group) < VERIFY_BATCH_MAX_CLAUSES:
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            if item is None:
+                queue.put_nowait(None)
+                break
+            group.append(item)
+        return group
+
+    async def aensure_compliance(self, clauses, on_result=None):
+        """
+        Async version of ensure_compliance; clauses are pipelined through retrieval,
+        verification and risk explanation on the event loop.
+        Args:
+            clauses: A list of legal clauses to verify.
+            on_result: Optional callback, called with (clause index, verification result, risk explanation)
+                as soon as each clause is verified.
+        Returns:
+            A dictionary containing verification results and risk explanations, in clause order.
+        """
+        verification_results = [None] * len(clauses)
+        risk_explanations = [None] * len(clauses)
+        pending = asyncio.Queue()
+        for index in range(len(clauses)):
+            pending.put_nowait(index)
+        retrieved = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        verified = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        # Usage and rule ids are per document, so one agent can check several documents at once
+        llm_verifier = LLMVerifier(llm_client=self.llm_verifier.llm_client)
+
+        async def retrieve_worker():
+            while not pending.empty():
+                indexes = [pending.get_nowait() for _ in range(min(RETRIEVE_BATCH_SIZE, pending.qsize()))]
+                try:
+                    relevant_rules = await asyncio.to_thread(self.regulation_retriever.retrieve_similar_rules,
+                                                             [clauses[index] for index in indexes])
+                except Exception as e:
+                    # These clauses skip verification as unverified; the rest of the document goes on
+                    print(f"[VERIFY] Retrieval of {len(indexes)} clauses failed: {e}")
+                    for index in indexes:
+                        clause_obj = {"original_clause": clauses[index], "matches": []}
+                        await verified.put((index, llm_verifier.error_result(clause_obj, e)))
+                    continue
+                for index, clause_obj in zip(indexes, relevant_rules):
+                    await retrieved.put((index, clause_obj))
+
+        async def verify(group, slots):
+            try:
+                clause_objs = [clause_obj for _, clause_obj in group]
+                try:
+                    results = await llm_verifier.averify_group(clause_objs)
+                except Exception as e:
+                    # Only this group's clauses are marked as failed; the rest of the document goes on
+                    print(f"[VERIFY] Group of {len(group)} clauses failed: {e}")
+                    results = [llm_verifier.error_result(clause_obj, e) for clause_obj in clause_objs]
+                for (index, _), result in zip(group, results):
+                    await verified.put((index, result))
+            finally:
+                slots.release()
+
+        async def verify_stage():
+            # One batcher forms the groups once a slot is free: a free slot takes whatever is
+            # retrieved, while all slots are busy retrieved clauses pile up and the next group gets bigger
+            slots = asyncio.Semaphore(VERIFY_CONCURRENCY)
+            running = []
+            while True:
+                await slots.acquire()
+                group = await self._next_group(retrieved)
+                if not group:
+                    slots.release()
+                    break
+                running.append(asyncio.create_task(verify(group, slots)))
+            try:
+                await asyncio.gather(*running)
+            finally:
+                for task in running:
+                    task.cancel()
+            await verified.put(None)
+
+        async def risk_worker():
+            while True:
+                item = await verified.get()
+                if item is None:
+                    return
+                index, verification_result = item
+                verification_results[index] = verification_result
+                # Unverified clauses have no verdict to explain
+                if not verification_result.get("error"):
+                    risk_explanations[index] = self.risk_explainer.explain_risk(verification_result)
+                if on_result is not None:
+                    on_result(index, verification_result, risk_explanations[index])
+
+        async def retrieve_stage():
+            await asyncio.gather(*(retrieve_worker() for _ in range(RETRIEVE_CONCURRENCY)))
+            # Signal the verify stage that retrieval is done
+            await retrieved.put(None)
+
+        tasks = [
+            asyncio.create_task(retrieve_stage()),
+            asyncio.create_task(verify_stage()),
+            asyncio.create_task(risk_worker())
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # A failed stage would leave the others waiting on their queues
+            for task in tasks:
+                task.cancel()
+
+        usage = llm_verifier.usage
+        print(f"[VERIFY] {len(clauses)} clauses: {usage['calls']} LLM calls, ~{usage['input_tokens']} input tokens")
 
         return {
             "verification_results": verification_results,
-            "risk_explanations": risk_explanations
-        }
\ No newline at end of file
+            "risk_explanations": risk_explanations,
+            "prompt_stats": llm_verifier.prompt_stats
+        }
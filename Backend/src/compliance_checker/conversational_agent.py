@@ -1,11 +1,18 @@
 """
 Conversational Compliance Agent
 Multi-turn dialogue interface for compliance questions and document analysis
+
+Conversations live in a bounded session store (see src/storage/session_store.py),
+so idle sessions expire and concurrent requests for one session are serialized.
+chat() returns the whole answer; chat_stream() yields it as it is generated.
 """
 
-import os
-from typing import List, Dict, Any, Optional
+import asyncio
+import uuid
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 from datetime import datetime
+from src.storage.session_store import SessionStore, get_session_store
+from src.compliance_checker.retrieval_cache import get_retrieval_cache
 
 
 class ConversationalComplianceAgent:
@@ -17,18 +24,30 @@ class ConversationalComplianceAgent:
     context-aware compliance assistance.
     """
     
-    def __init__(self, llm_verifier=None, retriever=None):
+    def __init__(self, llm_verifier=None, retriever=None, sessions: SessionStore = None):
         """
         Initialize the conversational agent.
         
         Args:
             llm_verifier: LLM verifier instance (Vertex AI, Gemini, etc.)
             retriever: Regulation retriever with Elastic hybrid search
+            sessions: Session store for conversations (shared "conversations" store by default)
         """
         self.llm_verifier = llm_verifier
         self.retriever = retriever
-        self.conversation_history = {}  # Store conversations by session_id
+        self.sessions = sessions or get_session_store("conversations")
+        # Shared by all sessions and agents
+        self.retrieval_cache = get_retrieval_cache()
         self.max_history = 10  # Keep last 10 messages
+
+    @staticmethod
+    def _new_session(session_id: str) -> Dict[str, Any]:
+        return {
+            "session_id": session_id,
+            "messages": [],
+            "context": {},
+            "started_at": datetime.now().isoformat()
+        }
         
     def start_session(self, session_id: str = None) -> str:
         """
@@ -38,20 +57,17 @@ class ConversationalComplianceAgent:
             session_id for this conversation
         """
         if session_id is None:
-            session_id = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            session_id = f"session_{uuid.uuid4().hex}"
         
-        self.conversation_history[session_id] = {
-            "messages": [],
-            "context": {},
-            "started_at": datetime.now().isoformat()
-        }
+        with self.sessions.lock(session_id):
+            self.sessions.set(session_id, self._new_session(session_id))
         
         return session_id
     
     def chat(
         self,
         user_message: str,
-        session_id: str = "default",
+        session_id: str = None,
         document_context: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """
@@ -59,28 +75,29 @@ class ConversationalComplianceAgent:
         
         Args:
             user_message: User's question or statement
-            session_id: Conversation session identifier
+            session_id: Conversation session identifier; a new session is started if omitted
             document_context: Optional document being analyzed
             
         Returns:
-            Response with answer, context, and suggestions
+            Response with answer, context, suggestions and the session_id
         """
-        # Ensure session exists
-        if session_id not in self.conversation_history:
-            self.start_session(session_id)
-        
-        session = self.conversation_history[session_id]
-        
-        # Add user message to history
-        session["messages"].append({
-            "role": "user",
-            "content": user_message,
-            "timestamp": datetime.now().isoformat()
-        })
-        
-        # Update document context if provided
-        if document_context:
-            session["context"].update(document_context)
+        if session_id is None:
+            session_id = f"session_{uuid.uuid4().hex}"
+
+        # Requests for the same session run one at a time; others proceed in parallel
+        with self.sessions.session(session_id, lambda: self._new_session(session_id)) as session:
+            response = self._chat_turn(user_message, session, document_context)
+        response["session_id"] = session_id
+        return response
+
+    def _chat_turn(
+        self,
+        user_message: str,
+        session: Dict[str, Any],
+        document_context: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Answer one message and record the exchange in the session."""
+        self._add_user_message(session, user_message, document_context)
         
         # Analyze user intent
         intent = self._analyze_intent(user_message, session)
@@ -93,10 +110,95 @@ class ConversationalComplianceAgent:
             document_context
         )
         
+        self._add_assistant_message(session, response["answer"], intent)
+        return response
+
+    async def chat_stream(
+        self,
+        user_message: str,
+        session_id: str = None,
+        document_context: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Streaming version of chat, for the event loop.
+        
+        Args:
+            user_message: User's question or statement
+            session_id: Conversation session identifier; a new session is started if omitted
+            document_context: Optional document being analyzed
+            
+        Yields:
+            (event, data) pairs: "start" with the session_id, intent and retrieved
+            regulations; "token" per answer fragment ({"text": ...}); "complete" with
+            the same response chat() returns. The exchange is recorded in the session
+            once the answer is complete; if the LLM fails midway, "error" replaces
+            "complete" and the exchange is not recorded.
+        """
+        if session_id is None:
+            session_id = f"session_{uuid.uuid4().hex}"
+
+        async with self.sessions.asession(session_id, lambda: self._new_session(session_id)) as session:
+            # The session is only modified once the answer is complete, so an abandoned stream leaves no trace
+            intent = self._analyze_intent(user_message, session)
+            response = self._new_response(intent)
+            response["retrieved_regulations"] = await asyncio.to_thread(self._retrieve_for_intent, user_message, intent)
+            yield "start", {
+                "session_id": session_id,
+                "intent": intent,
+                "retrieved_regulations": response["retrieved_regulations"]
+            }
+
+            fragments = []
+            try:
+                if self.llm_verifier and hasattr(self.llm_verifier, "chat_stream"):
+                    prompt = self._build_contextual_prompt(user_message, intent, response["retrieved_regulations"], document_context)
+                    async for text in self.llm_verifier.chat_stream(prompt, session_id=session_id):
+                        fragments.append(text)
+                        yield "token", {"text": text}
+                    response["confidence"] = 0.9
+                elif self.llm_verifier and hasattr(self.llm_verifier, "chat"):
+                    prompt = self._build_contextual_prompt(user_message, intent, response["retrieved_regulations"], document_context)
+                    fragments.append(await asyncio.to_thread(self.llm_verifier.chat, prompt, session_id=session_id))
+                    yield "token", {"text": fragments[-1]}
+                    response["confidence"] = 0.9
+            except Exception as e:
+                print(f"⚠️ LLM error: {e}")
+                if fragments:
+                    # Part of the answer was already sent: report the failure instead of completing,
+                    # and leave the turn out of the session as the LLM's own history does
+                    yield "error", {"session_id": session_id, "error": "Chat error", "message": str(e), "type": type(e).__name__}
+                    return
+                response["confidence"] = 0.5
+            if not fragments:
+                fragments.append(self._fallback_response(user_message, intent, response["retrieved_regulations"]))
+                response["confidence"] = response["confidence"] or 0.5
+                yield "token", {"text": fragments[-1]}
+
+            response["answer"] = "".join(fragments)
+            response["suggestions"] = self._generate_suggestions(intent, document_context)
+            response["session_id"] = session_id
+            self._add_user_message(session, user_message, document_context)
+            self._add_assistant_message(session, response["answer"], intent)
+        yield "complete", response
+
+    @staticmethod
+    def _add_user_message(session: Dict[str, Any], user_message: str, document_context: Optional[Dict[str, Any]]):
+        # Add user message to history
+        session["messages"].append({
+            "role": "user",
+            "content": user_message,
+            "timestamp": datetime.now().isoformat()
+        })
+        
+        # Update document context if provided
+        if document_context:
+            session["context"].update(document_context)
+
+    def _add_assistant_message(self, session: Dict[str, Any], answer: str, intent: str):
         # Add assistant response to history
         session["messages"].append({
             "role": "assistant",
-            "content": response["answer"],
+            "content": answer,
             "timestamp": datetime.now().isoformat(),
             "intent": intent
         })
@@ -104,8 +206,6 @@ class ConversationalComplianceAgent:
         # Trim history if too long
         if len(session["messages"]) > self.max_history * 2:
             session["messages"] = session["messages"][-self.max_history * 2:]
-        
-        return response
     
     def _analyze_intent(self, message: str, session: Dict) -> str:
         """
@@ -140,32 +240,8 @@ class ConversationalComplianceAgent:
     ) -> Dict[str, Any]:
         """Generate contextual response based on intent."""
         
-        response = {
-            "answer": "",
-            "intent": intent,
-            "suggestions": [],
-            "retrieved_regulations": [],
-            "confidence": 0.0
-        }
-        
-        # Use Elastic hybrid search to find relevant regulations
-        if self.retriever and intent in ["compliance_check", "regulation_lookup", "risk_assessment"]:
-            # Create a pseudo-clause for retrieval
-            pseudo_clause = {
-                "text_en": message,
-                "id": f"query_{datetime.now().timestamp()}"
-            }
-            
-            try:
-                retrieval_results = self.retriever.retrieve_similar_rules(
-                    [pseudo_clause],
-                    top_k=3
-                )
-                
-                if retrieval_results and len(retrieval_results) > 0:
-                    response["retrieved_regulations"] = retrieval_results[0].get("matches", [])
-            except Exception as e:
-                print(f"⚠️ Retrieval error: {e}")
+        response = self._new_response(intent)
+        response["retrieved_regulations"] = self._retrieve_for_intent(message, intent)
         
         # Use LLM for intelligent response generation
         if self.llm_verifier:
@@ -180,7 +256,7 @@ class ConversationalComplianceAgent:
                 if hasattr(self.llm_verifier, 'chat'):
                     llm_response = self.llm_verifier.chat(
                         self._build_contextual_prompt(message, intent, response["retrieved_regulations"], document_context),
-                        session_id=session.get("session_id", "default")
+                        session_id=session.get("session_id")
                     )
                     response["answer"] = llm_response
                     response["confidence"] = 0.9
@@ -201,6 +277,49 @@ class ConversationalComplianceAgent:
         
         return response
     
+    @staticmethod
+    def _new_response(intent: str) -> Dict[str, Any]:
+        return {
+            "answer": "",
+            "intent": intent,
+            "suggestions": [],
+            "retrieved_regulations": [],
+            "confidence": 0.0
+        }
+
+    def _retrieve_for_intent(self, message: str, intent: str) -> List[Dict]:
+        """Use Elastic hybrid search to find relevant regulations, for intents that need them."""
+        if not self.retriever or intent not in ["compliance_check", "regulation_lookup", "risk_assessment"]:
+            return []
+        try:
+            return self._retrieve(message, top_k=3)
+        except Exception as e:
+            print(f"⚠️ Retrieval error: {e}")
+            return []
+
+    def _retrieve(self, message: str, top_k: int) -> List[Dict]:
+        """Retrieve regulations for a message, through the shared retrieval cache."""
+        index_version = getattr(self.retriever, "index_version", lambda: None)()
+        if index_version is not None:
+            cached = self.retrieval_cache.get(message, top_k, index_version)
+            if cached is not None:
+                return cached
+
+        # Create a pseudo-clause for retrieval
+        pseudo_clause = {
+            "text_en": message,
+            "id": f"query_{datetime.now().timestamp()}"
+        }
+        retrieval_results = self.retriever.retrieve_similar_rules([pseudo_clause], top_k=top_k)
+        if not retrieval_results:
+            return []
+
+        matches = retrieval_results[0].get("matches", [])
+        # Only successful searches against a known index version are cached
+        if index_version is not None and not retrieval_results[0].get("error"):
+            self.retrieval_cache.set(message, top_k, index_version, matches)
+        return matches
+    
     def _build_contextual_prompt(
         self,
         message: str,
@@ -301,11 +420,10 @@ Keep the response conversational and easy to understand."""
     def get_conversation_summary(self, session_id: str) -> Dict[str, Any]:
         """Get summary of conversation session."""
         
-        if session_id not in self.conversation_history:
+        session = self.sessions.get(session_id)
+        if session is None:
             return {"error": "Session not found"}
         
-        session = self.conversation_history[session_id]
-        
         return {
             "session_id": session_id,
             "started_at": session.get("started_at"),
@@ -320,10 +438,10 @@ Keep the response conversational and easy to understand."""
     
     def clear_session(self, session_id: str):
         """Clear a conversation session."""
-        if session_id in self.conversation_history:
-            del self.conversation_history[session_id]
+        with self.sessions.lock(session_id):
+            self.sessions.delete(session_id)
             
-            # Also clear LLM chat session if available
-            if self.llm_verifier and hasattr(self.llm_verifier, 'clear_session'):
-                self.llm_verifier.clear_session(session_id)
+        # Also clear LLM chat session if available
+        if self.llm_verifier and hasattr(self.llm_verifier, 'clear_session'):
+            self.llm_verifier.clear_session(session_id)
 
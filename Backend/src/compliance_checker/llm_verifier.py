@@ -5,24 +5,84 @@ This agent verifies the compliance of clauses against regulations
 using a language model.
 """
 
+import asyncio
 import json
+import os
+from typing import Callable, Optional
+from src.extraction.chunking import estimate_tokens
+from src.compliance_checker.prompt_builder import PromptBuilder
 from src.llm_provider.verifier_llms import openai_verifier, gemini_verifier, claude_verifier, mistral_verifier
+from src.llm_provider.router import get_llm_router
+from src.llm_provider.schemas import BATCH_RESULT, VERIFICATION, VERIFICATION_BATCH
+
+# provider -> (sync verifier, async verifier)
+VERIFIERS = {
+    "openai": (openai_verifier.verify_with_openai, openai_verifier.averify_with_openai),
+    "gemini": (gemini_verifier.verify_with_gemini, gemini_verifier.averify_with_gemini),
+    "mistral": (mistral_verifier.verify_with_mistral, mistral_verifier.averify_with_mistral),
+    "claude": (claude_verifier.verify_with_claude, claude_verifier.averify_with_claude),
+}
+
+# Clauses verified concurrently by averify_clauses
+VERIFY_CONCURRENCY = int(os.getenv("VERIFY_CONCURRENCY", "8"))
+# Pack several clauses into one request, up to this many prompt tokens / clauses per batch
+VERIFY_BATCH = os.getenv("VERIFY_BATCH", "true").lower() == "true"
+VERIFY_BATCH_TOKENS = int(os.getenv("VERIFY_BATCH_TOKENS", "6000"))
+VERIFY_BATCH_MAX_CLAUSES = int(os.getenv("VERIFY_BATCH_MAX_CLAUSES", "8"))
+# Expected response tokens allowed per batch; keep below every provider's output limit
+# (e.g. CLAUDE_MAX_TOKENS) so batch responses are not cut off
+VERIFY_BATCH_OUTPUT_TOKENS = int(os.getenv("VERIFY_BATCH_OUTPUT_TOKENS", "3000"))
+# Estimated response tokens per clause result and per matched rule in it
+OUTPUT_TOKENS_PER_CLAUSE = 80
+OUTPUT_TOKENS_PER_RULE = 40
+
+BATCH_SYSTEM_PROMPT = """You are a compliance verification assistant.
+Rules are listed once with an id; each numbered clause lists the ids of its candidate rules.
+For each clause, compare it against its candidate regulatory rules.
+For every clause you must:
+- Analyze each candidate rule carefully
+- Decide which (if any) rules actually apply
+- State whether the clause is compliant
+- Explain reasoning clearly
+
+Return JSON in format, with exactly one result per clause:
+{
+  "results": [
+    {
+      "clause_id": "<the clause's id>",
+      "is_compliant": true/false,
+      "matched_rules": [
+        {"rule": "<rule id>", "is_relevant": true/false, "reason": "..."}
+      ],
+      "final_reason": "Summary reasoning whether compliant or not",
+      "Section": "Wealth/Banking/Insurance/Compliance"
+    }
+  ]
+}
+"""
 
 class LLMVerifier:
     def __init__(self, llm_client: str ='gemini'):
         """
         Initialize the LLMVerifier with a specific LLM client.
+        "auto" routes each clause to the healthiest configured provider, with failover.
         """
         self.llm_client = llm_client
+        self.prompt_builder = PromptBuilder()
+        # Candidate-rule compaction stats of the last verify_clauses/averify_clauses run
+        self.prompt_stats = None
+        # LLM calls and estimated input tokens of the last verify_clauses/averify_clauses run
+        self.usage = {"calls": 0, "input_tokens": 0}
+        # Normalized rule text -> rule id for the document verified group by group
+        self._rule_ids = {}
 
-    def examine_clause(self, clause_obj: dict) -> dict:
+    def build_prompts(self, clause_obj: dict) -> tuple:
         """
-        This function examines a legal clause against regulatory rules.
+        Build the system and user prompts for verifying one clause.
         Args:
             clause_obj (dict): The clause object containing the clause text and metadata.
-
         Returns:
-            dict: The verification result containing compliance status and matched rules.
+            tuple: (system_prompt, user_prompt)
         """
 
         # Construct system prompt
@@ -41,7 +101,6 @@ class LLMVerifier:
           "matched_rules": [
               {
                 "rule": "...", #Can be from your knowledge base
-                "metadata": {...},
                 "is_relevant": true/false,
                 "reason": "..."
               }
@@ -51,35 +110,311 @@ class LLMVerifier:
         }
         """
 
-        # Prepare candidate rules in a structured way
-        candidate_rules = [
-            {"rule": rule, "metadata": metadata}
-            for rule, metadata in clause_obj["matches"]
-        ]
-
         # Construct user prompt
         user_prompt = f"""
         Clause:
         {clause_obj['original_clause']}
         
         Candidate Rules:
-        {json.dumps(candidate_rules, indent=2)}
+        {json.dumps(self._candidate_rules(clause_obj), separators=(",", ":"))}
         
         Check compliance. For each rule, mark whether it is relevant and why.
         Then decide overall if the clause is compliant.
         """
 
-        # Call the appropriate verification function based on the LLM client
-        if self.llm_client == "openai":
-            return openai_verifier.verify_with_openai(system_prompt, user_prompt)
-        elif self.llm_client == "gemini":
-            return gemini_verifier.verify_with_gemini(system_prompt, user_prompt)
-        elif self.llm_client == "mistral":
-            return mistral_verifier.verify_with_mistral(system_prompt, user_prompt)
-        elif self.llm_client == "claude":
-            return claude_verifier.verify_with_claude(system_prompt, user_prompt)
+        return system_prompt, user_prompt
+
+    @staticmethod
+    def _candidate_rules(clause_obj: dict) -> list[dict]:
+        return [
+            {"rule": match["rule_text"], "metadata": match.get("metadata", {})}
+            for match in clause_obj["matches"]
+        ]
+
+    @staticmethod
+    def _clause_text(clause_obj: dict) -> str:
+        clause = clause_obj["original_clause"]
+        return clause.get("text_en", "") if isinstance(clause, dict) else str(clause)
+
+    def _batch_entry(self, clause_id: str, clause_obj: dict) -> str:
+        entry = {"clause_id": clause_id, "clause": self._clause_text(clause_obj)}
+        if all("rule_id" in match for match in clause_obj["matches"]):
+            entry["rule_ids"] = [match["rule_id"] for match in clause_obj["matches"]]
         else:
+            entry["candidate_rules"] = self._candidate_rules(clause_obj)
+        return json.dumps(entry, separators=(",", ":"))
+
+    @staticmethod
+    def _rule_line(match: dict) -> str:
+        return json.dumps({"id": match["rule_id"], "text": match["rule_text"], "metadata": match.get("metadata", {})},
+                          separators=(",", ":"))
+
+    @staticmethod
+    def _batch_rules(clause_objs: list[dict]) -> dict:
+        """Rule id -> match for the rules referenced by a batch, each once."""
+        rules = {}
+        for clause_obj in clause_objs:
+            for match in clause_obj["matches"]:
+                if "rule_id" in match:
+                    rules.setdefault(match["rule_id"], match)
+        return rules
+
+    @staticmethod
+    def _output_tokens(clause_obj: dict) -> int:
+        """Estimated response tokens for one clause's result: a reason per candidate rule plus the verdict."""
+        return OUTPUT_TOKENS_PER_CLAUSE + OUTPUT_TOKENS_PER_RULE * len(clause_obj["matches"])
+
+    def build_batches(self, all_clause_objs: list[dict], max_tokens: int = VERIFY_BATCH_TOKENS,
+                      max_clauses: int = VERIFY_BATCH_MAX_CLAUSES,
+                      max_output_tokens: int = VERIFY_BATCH_OUTPUT_TOKENS) -> list[list[int]]:
+        """
+        Group clauses into batches under a prompt token budget and an expected response size.
+        A clause that alone exceeds the budgets gets a batch of its own.
+        Args:
+            all_clause_objs (list[dict]): The clause objects to verify.
+            max_tokens (int): Prompt tokens allowed per batch, instructions included.
+            max_clauses (int): Clauses allowed per batch.
+            max_output_tokens (int): Expected response tokens allowed per batch.
+        Returns:
+            list[list[int]]: Batches of indexes into all_clause_objs.
+        """
+        budget = max_tokens - estimate_tokens(BATCH_SYSTEM_PROMPT)
+        batches, current, used, output, rule_ids = [], [], 0, 0, set()
+        for index, clause_obj in enumerate(all_clause_objs):
+            entry_tokens = estimate_tokens(self._batch_entry(str(index + 1), clause_obj))
+            rule_tokens = {rule_id: estimate_tokens(self._rule_line(match))
+                           for rule_id, match in self._batch_rules([clause_obj]).items()}
+            # Rules shared with clauses already in the batch are only sent once
+            tokens = entry_tokens + sum(cost for rule_id, cost in rule_tokens.items() if rule_id not in rule_ids)
+            output_tokens = self._output_tokens(clause_obj)
+            if current and (used + tokens > budget or output + output_tokens > max_output_tokens
+                            or len(current) >= max_clauses):
+                batches.append(current)
+                current, used, output, rule_ids = [], 0, 0, set()
+                tokens = entry_tokens + sum(rule_tokens.values())
+            current.append(index)
+            rule_ids |= rule_tokens.keys()
+            used += tokens
+            output += output_tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def build_batch_prompts(self, clause_objs: list[dict]) -> tuple:
+        """
+        Build one system and user prompt verifying several clauses; clause ids are "1".."n".
+        Args:
+            clause_objs (list[dict]): The clause objects in the batch.
+        Returns:
+            tuple: (system_prompt, user_prompt)
+        """
+        rules = "\n".join(self._rule_line(match) for match in self._batch_rules(clause_objs).values())
+        entries = "\n".join(self._batch_entry(str(position + 1), clause_obj)
+                            for position, clause_obj in enumerate(clause_objs))
+        user_prompt = (f"Rules (one JSON object per line):\n{rules}\n\n"
+                       f"Clauses (one JSON object per line):\n{entries}\n\n"
+                       "For each clause, mark whether each candidate rule is relevant and why, "
+                       "then decide overall if the clause is compliant.")
+        return BATCH_SYSTEM_PROMPT, user_prompt
+
+    @staticmethod
+    def _with_metadata(result: dict, clause_obj: dict) -> dict:
+        """Attach candidate-rule metadata to the matched rules; the response schema leaves it out."""
+        metadata = {match["rule_text"]: match.get("metadata", {}) for match in clause_obj["matches"]}
+        result["matched_rules"] = [
+            {**rule, "metadata": metadata[rule["rule"]]} if rule.get("rule") in metadata else rule
+            for rule in result.get("matched_rules", [])
+        ]
+        return result
+
+    def split_batch_response(self, response, clause_objs: list[dict]) -> list:
+        """
+        Map a batch response back to its clauses.
+        Args:
+            response: Parsed JSON response, {"results": [...]} or a bare list.
+            clause_objs (list[dict]): The clause objects in the batch.
+        Returns:
+            list: One result per clause, None where the response had no valid result for it.
+        """
+        items = response.get("results") if isinstance(response, dict) else response
+        rules = self._batch_rules(clause_objs)
+        results = [None] * len(clause_objs)
+        if not isinstance(items, list):
+            return results
+        for item in items:
+            if not BATCH_RESULT.is_valid(item):
+                continue
+            try:
+                position = int(str(item.get("clause_id")).strip()) - 1
+            except ValueError:
+                continue
+            if 0 <= position < len(clause_objs) and results[position] is None:
+                result = {key: value for key, value in item.items() if key != "clause_id"}
+                result.setdefault("clause", self._clause_text(clause_objs[position]))
+                # Expand rule ids back to the rule text and metadata the risk explainer reads
+                result["matched_rules"] = [
+                    {**rule, "rule": rules[rule["rule"]]["rule_text"], "metadata": rules[rule["rule"]].get("metadata", {})}
+                    if isinstance(rule["rule"], str) and rule["rule"] in rules else rule
+                    for rule in result["matched_rules"]
+                ]
+                results[position] = result
+        return results
+
+    def _count(self, system_prompt: str, user_prompt: str) -> tuple:
+        self.usage["calls"] += 1
+        self.usage["input_tokens"] += estimate_tokens(system_prompt) + estimate_tokens(user_prompt)
+        return system_prompt, user_prompt
+
+    def _compact(self, all_clause_objs: list[dict]) -> list[dict]:
+        """Dedupe, filter and trim candidate rules across the document before prompting"""
+        document = self.prompt_builder.compact(all_clause_objs)
+        self.prompt_stats = document["stats"]
+        print(f"[VERIFY] Candidate rules: {self.prompt_stats['candidates']} -> {self.prompt_stats['kept']} "
+              f"({self.prompt_stats['unique_rules']} unique, {self.prompt_stats['dropped_low_score']} below score threshold); "
+              f"~{self.prompt_stats['tokens_saved']} rule tokens saved")
+        return document["clauses"]
+
+    def reset_stats(self):
+        """Start a new document: clear usage, candidate-rule stats and the document's rule ids"""
+        self.usage = {"calls": 0, "input_tokens": 0}
+        self.prompt_stats = None
+        self._rule_ids = {}
+
+    def _add_group_stats(self, stats: dict):
+        """Fold a group's compaction stats into the document's; unique rules are counted across groups"""
+        totals = {key: (self.prompt_stats or {}).get(key, 0) + value for key, value in stats.items()}
+        totals["unique_rules"] = len(self._rule_ids)
+        totals["tokens_saved"] = max(0, totals["rule_tokens"] - totals["compact_rule_tokens"])
+        self.prompt_stats = totals
+
+    async def averify_group(self, clause_objs: list[dict]) -> list[dict]:
+        """
+        Verify a group of clauses that became ready together, e.g. in a streaming pipeline.
+        Candidate rules are compacted with rule ids shared across the document's groups and the
+        group is batched under the token budget; usage and candidate-rule stats accumulate until reset_stats.
+        Args:
+            clause_objs (list[dict]): Retrieval results for the clauses in the group.
+        Returns:
+            list[dict]: A verification result per clause, in input order; see error_result for clauses that failed.
+        """
+        document = self.prompt_builder.compact(clause_objs, self._rule_ids)
+        self._add_group_stats(document["stats"])
+        clause_objs = document["clauses"]
+        if not VERIFY_BATCH:
+            return list(await asyncio.gather(*(self._aexamine_or_error(clause_obj) for clause_obj in clause_objs)))
+
+        results = [None] * len(clause_objs)
+        for batch in self.build_batches(clause_objs):
+            for index, result in zip(batch, await self.aexamine_batch([clause_objs[i] for i in batch])):
+                results[index] = result
+        return results
+
+    def _log_usage(self, all_clause_objs: list[dict], batches: list[list[int]]):
+        single_tokens = sum(estimate_tokens(prompt) for clause_obj in all_clause_objs
+                            for prompt in self.build_prompts(clause_obj))
+        print(f"[VERIFY] {len(all_clause_objs)} clauses in {len(batches)} batches: "
+              f"{self.usage['calls']} LLM calls, ~{self.usage['input_tokens']} input tokens "
+              f"(one call per clause: {len(all_clause_objs)} calls, ~{single_tokens} tokens)")
+
+    def _verifiers(self) -> tuple:
+        if self.llm_client == "auto":
+            router = get_llm_router()
+            return router.complete_json_sync, router.complete_json
+        if self.llm_client not in VERIFIERS:
             raise ValueError(f"Unsupported provider: {self.llm_client}")
+        return VERIFIERS[self.llm_client]
+
+    def examine_clause(self, clause_obj: dict) -> dict:
+        """
+        This function examines a legal clause against regulatory rules.
+        Args:
+            clause_obj (dict): The clause object containing the clause text and metadata.
+
+        Returns:
+            dict: The verification result containing compliance status and matched rules.
+        """
+        verify, _ = self._verifiers()
+        return self._with_metadata(verify(*self._count(*self.build_prompts(clause_obj)), VERIFICATION), clause_obj)
+
+    async def aexamine_clause(self, clause_obj: dict) -> dict:
+        """
+        Async version of examine_clause, for use on the event loop.
+        Args:
+            clause_obj (dict): The clause object containing the clause text and metadata.
+        Returns:
+            dict: The verification result containing compliance status and matched rules.
+        """
+        _, averify = self._verifiers()
+        return self._with_metadata(await averify(*self._count(*self.build_prompts(clause_obj)), VERIFICATION), clause_obj)
+
+    def error_result(self, clause_obj: dict, error: Exception) -> dict:
+        """
+        Verdict for a clause that could not be verified, so one failure does not fail the document.
+        Args:
+            clause_obj (dict): The clause object that failed.
+            error (Exception): Why it failed.
+        Returns:
+            dict: A result with is_compliant None and no matched rules, carrying the error;
+                it is neither compliant nor non-compliant and gets no risk explanation.
+        """
+        return {
+            "clause": self._clause_text(clause_obj),
+            "is_compliant": None,
+            "matched_rules": [],
+            "final_reason": f"Verification error: {error}",
+            "error": str(error)
+        }
+
+    async def _aexamine_or_error(self, clause_obj: dict) -> dict:
+        try:
+            return await self.aexamine_clause(clause_obj)
+        except Exception as e:
+            print(f"[WARN] Clause verification failed ({e})")
+            return self.error_result(clause_obj, e)
+
+    def examine_batch(self, clause_objs: list[dict]) -> list[dict]:
+        """
+        Verify several clauses in one LLM request.
+        Clauses missing from, or invalid in, the response are re-verified one per call.
+        Args:
+            clause_objs (list[dict]): The clause objects in the batch.
+        Returns:
+            list[dict]: A verification result per clause, in input order.
+        """
+        if len(clause_objs) == 1:
+            return [self.examine_clause(clause_objs[0])]
+        verify, _ = self._verifiers()
+        try:
+            response = verify(*self._count(*self.build_batch_prompts(clause_objs)), VERIFICATION_BATCH)
+            results = self.split_batch_response(response, clause_objs)
+        except Exception as e:
+            print(f"[WARN] Batch verification failed ({e}); verifying {len(clause_objs)} clauses individually")
+            results = [None] * len(clause_objs)
+        return [result if result is not None else self.examine_clause(clause_obj)
+                for result, clause_obj in zip(results, clause_objs)]
+
+    async def aexamine_batch(self, clause_objs: list[dict]) -> list[dict]:
+        """
+        Async version of examine_batch; a clause whose single-call retry also fails
+        gets an error_result instead of failing the batch.
+        Args:
+            clause_objs (list[dict]): The clause objects in the batch.
+        Returns:
+            list[dict]: A verification result per clause, in input order.
+        """
+        results = [None] * len(clause_objs)
+        if len(clause_objs) > 1:
+            _, averify = self._verifiers()
+            try:
+                response = await averify(*self._count(*self.build_batch_prompts(clause_objs)), VERIFICATION_BATCH)
+                results = self.split_batch_response(response, clause_objs)
+            except Exception as e:
+                print(f"[WARN] Batch verification failed ({e}); verifying {len(clause_objs)} clauses individually")
+        missing = [position for position, result in enumerate(results) if result is None]
+        retried = await asyncio.gather(*(self._aexamine_or_error(clause_objs[position]) for position in missing))
+        for position, result in zip(missing, retried):
+            results[position] = result
+        return results
 
     def verify_clauses(self, all_clause_objs: list[dict]) -> list[dict]:
         """
@@ -89,8 +424,56 @@ class LLMVerifier:
         Returns:
             list[dict]: A list of verification results for each clause.
         """
-        results = []
-        for clause_obj in all_clause_objs:
-            result = self.examine_clause(clause_obj)
-            results.append(result)
-        return results
\ No newline at end of file
+        all_clause_objs = self._compact(all_clause_objs)
+        if not VERIFY_BATCH:
+            return [self.examine_clause(clause_obj) for clause_obj in all_clause_objs]
+
+        self.usage = {"calls": 0, "input_tokens": 0}
+        batches = self.build_batches(all_clause_objs)
+        results = [None] * len(all_clause_objs)
+        for batch in batches:
+            for index, result in zip(batch, self.examine_batch([all_clause_objs[i] for i in batch])):
+                results[index] = result
+        self._log_usage(all_clause_objs, batches)
+        return results
+
+    async def averify_clauses(self, all_clause_objs: list[dict], max_concurrency: int = VERIFY_CONCURRENCY,
+                              on_result: Optional[Callable[[int, dict], None]] = None) -> list[dict]:
+        """
+        Verify multiple clauses concurrently on the event loop.
+        Args:
+            all_clause_objs (list[dict]): A list of clause objects to verify.
+            max_concurrency (int): Maximum clauses in flight at once.
+            on_result: Called with (clause index, result) as soon as each clause is verified.
+        Returns:
+            list[dict]: A list of verification results, in the order of the input clauses.
+        """
+        all_clause_objs = self._compact(all_clause_objs)
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        if not VERIFY_BATCH:
+            async def verify(index, clause_obj):
+                async with semaphore:
+                    result = await self.aexamine_clause(clause_obj)
+                if on_result is not None:
+                    on_result(index, result)
+                return result
+
+            return list(await asyncio.gather(*(verify(index, clause_obj) for index, clause_obj in enumerate(all_clause_objs))))
+
+        async def verify_batch(batch):
+            async with semaphore:
+                batch_results = await self.aexamine_batch([all_clause_objs[i] for i in batch])
+            if on_result is not None:
+                for index, result in zip(batch, batch_results):
+                    on_result(index, result)
+            return batch_results
+
+        self.usage = {"calls": 0, "input_tokens": 0}
+        batches = self.build_batches(all_clause_objs)
+        results = [None] * len(all_clause_objs)
+        for batch, batch_results in zip(batches, await asyncio.gather(*(verify_batch(batch) for batch in batches))):
+            for index, result in zip(batch, batch_results):
+                results[index] = result
+        self._log_usage(all_clause_objs, batches)
+        return results
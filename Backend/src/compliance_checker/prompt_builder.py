@@ -0,0 +1,160 @@
+"""
+Verification Prompt Builder
+
+This stage compacts the candidate rules retrieved for a document before they
+are sent to the verifier LLM. Retrieval returns the top chunks per clause, and
+neighbouring clauses often retrieve the same chunks, so:
+- low-score candidates are dropped relative to each clause's best match,
+- identical rules are deduplicated across the document under short ids (R1, R2, ...),
+- each rule is trimmed to the sentences that overlap most with the clauses that retrieved it,
+- metadata is reduced to what identifies the rule.
+"""
+
+import json
+import os
+import re
+from src.extraction.chunking import estimate_tokens
+
+# Candidates scoring below this fraction of the clause's best match are dropped
+RULE_MIN_RELATIVE_SCORE = float(os.getenv("RULE_MIN_RELATIVE_SCORE", "0.5"))
+# Sentences kept per rule (0 keeps the full text)
+RULE_MAX_SENTENCES = int(os.getenv("RULE_MAX_SENTENCES", "3"))
+# Metadata fields sent to the LLM; the rest (chunk ids, scores) only costs tokens
+RULE_METADATA_FIELDS = ("doc_id", "clause_id")
+
+SENTENCE_SPLIT = re.compile(r"(?<=[.;:!?])\s+(?=[A-Z(\"'\d])")
+WORD = re.compile(r"[a-z0-9]{3,}")
+STOPWORDS = frozenset(
+    "the and for with that this shall any such from are not has have been its which may all "
+    "under into other than their there where will would by of to in on or be as an is it".split()
+)
+
+def _terms(text: str) -> set:
+    return {word for word in WORD.findall(text.lower()) if word not in STOPWORDS}
+
+def _clause_text(clause_obj: dict) -> str:
+    clause = clause_obj["original_clause"]
+    return clause.get("text_en", "") if isinstance(clause, dict) else str(clause)
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split()).lower()
+
+def trim_rule(rule_text: str, terms: set, max_sentences: int = RULE_MAX_SENTENCES) -> str:
+    """
+    Keep the sentences of a rule that share the most terms with the clauses it was retrieved for.
+    Args:
+        rule_text (str): Full rule text.
+        terms (set): Terms of the clauses that retrieved the rule.
+        max_sentences (int): Sentences to keep; 0 keeps the full text.
+    Returns:
+        str: The trimmed rule, sentences in their original order, gaps marked with "...".
+    """
+    sentences = [sentence for sentence in SENTENCE_SPLIT.split(" ".join(rule_text.split())) if sentence]
+    if max_sentences <= 0 or len(sentences) <= max_sentences:
+        return " ".join(sentences)
+
+    ranked = sorted(range(len(sentences)), key=lambda i: (-len(_terms(sentences[i]) & terms), i))
+    keep = sorted(ranked[:max_sentences])
+    parts = []
+    for position, index in enumerate(keep):
+        if position == 0 and index > 0 or position > 0 and index != keep[position - 1] + 1:
+            parts.append("...")
+        parts.append(sentences[index])
+    if keep[-1] < len(sentences) - 1:
+        parts.append("...")
+    return " ".join(parts)
+
+class PromptBuilder:
+    def __init__(self, min_relative_score: float = RULE_MIN_RELATIVE_SCORE, max_sentences: int = RULE_MAX_SENTENCES):
+        """
+        Initialize the PromptBuilder.
+        Args:
+            min_relative_score (float): Drop candidates scoring below this fraction of the clause's best match.
+            max_sentences (int): Sentences kept per rule (0 keeps the full text).
+        """
+        self.min_relative_score = min_relative_score
+        self.max_sentences = max_sentences
+
+    def _keep(self, matches: list[dict]) -> list[dict]:
+        """Drop candidates far below the clause's best match; unscored candidates are kept."""
+        scores = [match.get("metadata", {}).get("score") for match in matches]
+        scored = [score for score in scores if isinstance(score, (int, float))]
+        if not scored:
+            return matches
+        cutoff = max(scored) * self.min_relative_score
+        return [match for match, score in zip(matches, scores)
+                if not isinstance(score, (int, float)) or score >= cutoff]
+
+    def compact(self, all_clause_objs: list[dict], rule_ids: dict = None) -> dict:
+        """
+        Compact the candidate rules of a document.
+        Args:
+            all_clause_objs (list[dict]): Retrieval results, {"original_clause", "matches"} per clause.
+            rule_ids (dict): Normalized rule text -> rule id, updated in place; pass the same dict
+                when a document is compacted in groups so each rule keeps one id across the document.
+        Returns:
+            dict: {
+                "clauses": clause objects whose matches are {"rule_id", "rule_text", "metadata"},
+                "rules": rule id -> {"text", "metadata"}, each unique rule of these clauses once,
+                "stats": candidate counts and estimated prompt tokens before and after
+            }
+        """
+        rule_ids = {} if rule_ids is None else rule_ids
+        rule_terms, originals = {}, {}
+        kept_matches = []
+        candidates = kept = dropped = 0
+        original_tokens = 0
+        for clause_obj in all_clause_objs:
+            matches = clause_obj.get("matches", [])
+            candidates += len(matches)
+            original_tokens += sum(estimate_tokens(json.dumps({"rule": match["rule_text"], "metadata": match.get("metadata", {})}))
+                                   for match in matches)
+            clause_terms = _terms(_clause_text(clause_obj))
+            ids = []
+            retained = self._keep(matches)
+            dropped += len(matches) - len(retained)
+            for match in retained:
+                key = _normalize(match["rule_text"])
+                if key not in rule_ids:
+                    rule_ids[key] = f"R{len(rule_ids) + 1}"
+                rule_id = rule_ids[key]
+                if rule_id not in originals:
+                    originals[rule_id] = match
+                    rule_terms[rule_id] = set()
+                rule_terms[rule_id] |= clause_terms
+                if rule_id not in ids:
+                    ids.append(rule_id)
+            kept += len(ids)
+            kept_matches.append(ids)
+
+        rules = {}
+        for rule_id, match in originals.items():
+            metadata = match.get("metadata", {})
+            rules[rule_id] = {
+                "text": trim_rule(match["rule_text"], rule_terms[rule_id], self.max_sentences),
+                "metadata": {field: metadata[field] for field in RULE_METADATA_FIELDS if metadata.get(field) is not None}
+            }
+
+        clauses = [
+            {
+                **clause_obj,
+                "matches": [{"rule_id": rule_id, "rule_text": rules[rule_id]["text"], "metadata": rules[rule_id]["metadata"]}
+                            for rule_id in ids]
+            }
+            for clause_obj, ids in zip(all_clause_objs, kept_matches)
+        ]
+        compact_tokens = sum(estimate_tokens(json.dumps({"id": rule_id, **rule})) for rule_id, rule in rules.items())
+        compact_tokens += sum(estimate_tokens(json.dumps(ids)) for ids in kept_matches)
+        return {
+            "clauses": clauses,
+            "rules": rules,
+            "stats": {
+                "candidates": candidates,
+                "kept": kept,
+                "dropped_low_score": dropped,
+                "unique_rules": len(rules),
+                "rule_tokens": original_tokens,
+                "compact_rule_tokens": compact_tokens,
+                "tokens_saved": max(0, original_tokens - compact_tokens)
+            }
+        }
@@ -7,10 +7,15 @@ from a Elasticsearch index based on input legal clauses.
 
 import os
 import pickle
+import threading
+import time
 import faiss
 from elasticsearch import Elasticsearch
 from src.embedder.embeddings import EmbeddingModel
 
+# How often the index version is re-read; cached retrievals are invalidated when it changes
+INDEX_VERSION_CHECK_SECONDS = float(os.getenv("RETRIEVAL_INDEX_VERSION_CHECK_SECONDS", "60"))
+
 class RegulationRetriever:
     def __init__(self, faiss_index_path: str, metadata_path: str, model_name: str = "nlpaueb/legal-bert-base-uncased"):
         """
@@ -26,11 +31,24 @@ class RegulationRetriever:
         self.es = None
         self.metadata = None
         self.embedding_model = None
+        # Set once the index is reachable, so per-clause retrieval skips the ping/exists round trips
+        self._ready = False
+        self._ready_lock = threading.Lock()
+        self._index_version = None
+        self._version_checked_at = 0.0
     
     def _get_es_index(self) -> Elasticsearch:
         """
         Get the Elasticsearch index and ingest metadata and embeddings if not present.
         """
+        if self._ready:
+            return True
+        with self._ready_lock:
+            if not self._ready:
+                self._ready = self._init_es_index()
+        return self._ready
+
+    def _init_es_index(self) -> bool:
         try:
             # Load metadata and generate embeddings
             if self.metadata is None:
@@ -113,6 +131,30 @@ class RegulationRetriever:
         
         return True
 
+    def index_version(self) -> str:
+        """
+        Identify the current contents of the regulation index.
+        Combines the index UUID (changes when the index is recreated), the optional
+        "_meta.version" of its mapping (set by ingestion) and the document count.
+        Re-read at most every INDEX_VERSION_CHECK_SECONDS.
+        Returns:
+            str: The version, or None if the index is unavailable.
+        """
+        if not self._get_es_index():
+            return None
+        now = time.monotonic()
+        if self._index_version is not None and now - self._version_checked_at < INDEX_VERSION_CHECK_SECONDS:
+            return self._index_version
+        try:
+            settings = self.es.indices.get_settings(index=self.index)[self.index]["settings"]["index"]
+            mappings = self.es.indices.get_mapping(index=self.index)[self.index]["mappings"]
+            count = self.es.count(index=self.index)["count"]
+            self._index_version = f"{settings.get('uuid')}:{mappings.get('_meta', {}).get('version', '')}:{count}"
+            self._version_checked_at = now
+        except Exception as e:
+            print(f"Warning: Could not read index version: {e}")
+        return self._index_version
+
     def retrieve_similar_rules(self, clauses: list[dict], top_k: int = 5) -> list[dict]:
         """
         Retrieve top k similar rules for each clause using Elasticsearch.
@@ -121,7 +163,8 @@ class RegulationRetriever:
             # Return dummy results if loading fails
             return [{
                 "original_clause": clause,
-                "matches": [{"rule_text": "Retrieval error: Could not connect to Elasticsearch", "metadata": {}}]
+                "matches": [{"rule_text": "Retrieval error: Could not connect to Elasticsearch", "metadata": {}}],
+                "error": "Could not connect to Elasticsearch"
             } for clause in clauses]
         
         try:
@@ -179,5 +222,6 @@ class RegulationRetriever:
             print(f"Warning: Elasticsearch retrieval failed: {e}")
             return [{
                 "original_clause": clause,
-                "matches": [{"rule_text": f"Retrieval error: {str(e)}", "metadata": {}}]
+                "matches": [{"rule_text": f"Retrieval error: {str(e)}", "metadata": {}}],
+                "error": str(e)
             } for clause in clauses]
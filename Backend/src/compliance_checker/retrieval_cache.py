@@ -0,0 +1,126 @@
+"""
+Retrieval Cache
+
+Caches regulation retrieval results for conversational queries, keyed by the
+normalized query text and top_k, so repeated FAQ-style questions skip the
+embedding and the Elasticsearch round trip. Entries expire after a TTL, the
+least recently used are evicted beyond a size limit, and the whole cache is
+dropped when the regulation index version changes. One cache is shared by all
+sessions.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# Seconds a cached retrieval stays valid
+RETRIEVAL_CACHE_TTL_SECONDS = float(os.getenv("RETRIEVAL_CACHE_TTL_SECONDS", "3600"))
+# Queries kept before the least recently used are evicted (0 disables the cache)
+RETRIEVAL_CACHE_MAX_ENTRIES = int(os.getenv("RETRIEVAL_CACHE_MAX_ENTRIES", "2048"))
+
+PUNCTUATION = re.compile(r"[^\w\s]")
+
+def normalize_query(text: str) -> str:
+    """
+    Normalize a query so trivially different phrasings share a cache entry.
+    Args:
+        text (str): The user's query.
+    Returns:
+        str: Lowercased query without punctuation, whitespace collapsed.
+    """
+    return " ".join(PUNCTUATION.sub(" ", text.lower()).split())
+
+class RetrievalCache:
+    def __init__(self, ttl_seconds: float = RETRIEVAL_CACHE_TTL_SECONDS, max_entries: int = RETRIEVAL_CACHE_MAX_ENTRIES):
+        """
+        Initialize the RetrievalCache.
+        Args:
+            ttl_seconds (float): Seconds a cached retrieval stays valid.
+            max_entries (int): Queries kept before the least recently used are evicted.
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # (normalized query, top_k) -> (matches, expires_at), least recently used first
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.invalidations = 0
+
+    def _check_version(self, index_version: str):
+        if index_version != self._version:
+            if self._entries:
+                self.invalidations += 1
+                print(f"[RETRIEVAL] Index version changed ({self._version} -> {index_version}); "
+                      f"dropping {len(self._entries)} cached queries")
+            self._entries.clear()
+            self._version = index_version
+
+    def get(self, query: str, top_k: int, index_version: str) -> Optional[list]:
+        """
+        Look up the matches cached for a query.
+        Args:
+            query (str): The query text.
+            top_k (int): Number of matches requested.
+            index_version (str): Current version of the regulation index.
+        Returns:
+            list: The cached matches, or None on a miss.
+        """
+        key = (normalize_query(query), top_k)
+        with self._lock:
+            self._check_version(index_version)
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(entry[0])
+
+    def set(self, query: str, top_k: int, index_version: str, matches: list):
+        """
+        Cache the matches retrieved for a query.
+        Args:
+            query (str): The query text.
+            top_k (int): Number of matches requested.
+            index_version (str): Version of the regulation index the matches came from.
+            matches (list): The retrieved matches.
+        """
+        if self.max_entries <= 0:
+            return
+        key = (normalize_query(query), top_k)
+        with self._lock:
+            self._check_version(index_version)
+            self._entries[key] = (matches, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry count, hit/miss counts and invalidations so far"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "index_version": self._version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "invalidations": self.invalidations
+            }
+
+# Global cache shared by every conversational agent
+_retrieval_cache = None
+_retrieval_cache_lock = threading.Lock()
+
+def get_retrieval_cache() -> RetrievalCache:
+    """Get or create the global retrieval cache"""
+    global _retrieval_cache
+    if _retrieval_cache is None:
+        with _retrieval_cache_lock:
+            if _retrieval_cache is None:
+                _retrieval_cache = RetrievalCache()
+    return _retrieval_cache
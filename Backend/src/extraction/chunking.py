@@ -0,0 +1,72 @@
+"""
+Token-budgeted chunking of extracted document text.
+
+Chunks break on page and section boundaries where possible, so each LLM
+call sees self-contained parts of the document.
+"""
+
+import re
+from typing import Iterable, Iterator, Union
+
+# Rough token estimate; Gemini averages about four characters per token for English text
+CHARS_PER_TOKEN = 4
+
+# Lines that start a new section: "Section 4", "ARTICLE II", "12.3 Definitions", ...
+SECTION_HEADING = re.compile(
+    r"^\s*(?:(?:section|article|chapter|part|schedule|annexure)\s+[\divxlc]+\b|\d+(?:\.\d+)*[.)]?\s+[A-Z])",
+    re.IGNORECASE
+)
+
+def estimate_tokens(text: str) -> int:
+    """Approximate the number of LLM tokens in a text."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def _blocks(text: str) -> list[str]:
+    return [block.strip() for block in re.split(r"\n\s*\n|\f", text) if block.strip()]
+
+def iter_page_chunks(pages: Iterable[Union[dict, str]], max_tokens: int) -> Iterator[dict]:
+    """
+    Group a stream of pages into chunks under a token budget.
+    Chunks are yielded as soon as they are full, so callers can start work on
+    early pages while later pages are still being extracted.
+    Args:
+        pages: Page dicts ({"page": n, "text": ...}) or plain page strings, in order.
+        max_tokens: Maximum estimated tokens per chunk.
+    Yields:
+        dict: {"text": ..., "start_page": n, "end_page": m}
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    current, current_len, start_page, end_page = [], 0, None, None
+
+    for number, page in enumerate(pages, 1):
+        if isinstance(page, dict):
+            number, page = page.get("page", number), page.get("text", "")
+
+        for block in _blocks(page):
+            # Hard-split blocks that are larger than a chunk on their own
+            for piece in (block[i:i + max_chars] for i in range(0, len(block), max_chars)):
+                # Close the chunk early at a section heading once it is half full,
+                # so sections are not split across chunks when avoidable
+                at_heading = SECTION_HEADING.match(piece) and current_len > max_chars // 2
+                if current and (current_len + len(piece) > max_chars or at_heading):
+                    yield {"text": "\n\n".join(current), "start_page": start_page, "end_page": end_page}
+                    current, current_len, start_page = [], 0, None
+                if start_page is None:
+                    start_page = number
+                end_page = number
+                current.append(piece)
+                current_len += len(piece) + 2
+
+    if current:
+        yield {"text": "\n\n".join(current), "start_page": start_page, "end_page": end_page}
+
+def split_into_chunks(text: str, max_tokens: int) -> list[str]:
+    """
+    Split text into chunks under a token budget, breaking on page and section boundaries.
+    Args:
+        text (str): The extracted document text (pages separated by blank lines).
+        max_tokens (int): Maximum estimated tokens per chunk.
+    Returns:
+        list[str]: Chunks in document order.
+    """
+    return [chunk["text"] for chunk in iter_page_chunks([text], max_tokens)]
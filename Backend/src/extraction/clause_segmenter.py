@@ -0,0 +1,228 @@
+"""
+Rule-based clause segmentation.
+
+Splits legal text into clauses locally using numbered headings, sub-clause
+markers and, for PDF pages from layout extraction, heading lines set in a
+larger or bold font. Produces {"clause_id", "text_en", "page"} records without
+an LLM call. Clauses longer than CLAUSE_MAX_CHARS are split at sentence
+boundaries. For documents with more than CLAUSE_MAX_COUNT clauses, those
+continuation fragments are merged back into the clause they came from (beyond
+CLAUSE_MAX_CHARS if needed); clauses that start with a heading or marker, such
+as "4.2" or "(b)", are never merged with each other.
+"""
+
+import os
+import re
+from typing import Iterable, Optional, Union
+
+MIN_CLAUSE_CHARS = int(os.getenv("CLAUSE_MIN_CHARS", "40"))
+MAX_CLAUSE_CHARS = int(os.getenv("CLAUSE_MAX_CHARS", "2000"))
+# Clauses per document; each one is retrieved and verified, so this bounds the LLM work (0 = no cap)
+MAX_CLAUSES = int(os.getenv("CLAUSE_MAX_COUNT", "150"))
+
+# "Clause 5", "Section 3A", "Article IV", "Regulation 12.1"
+NAMED_HEADING = re.compile(
+    r"^(?:clause|section|article|regulation|rule|schedule|annexure)\s+(?:\d+[A-Z]?(?:\.\d+)*|[IVXLC]+)\b",
+    re.IGNORECASE
+)
+# "1. Definitions", "4.2 The Issuer shall", "12) Fees" -- a short number followed by text
+NUMBERED_HEADING = re.compile(r"^\d{1,3}(?:\.\d{1,3}){0,3}[.)]?\s+[A-Z(\"“']")
+# "(a)", "(iv)", "(2)" -- sub-clauses stay with their parent unless it grows too long
+SUB_CLAUSE = re.compile(r"^\((?:[a-z]{1,2}|[ivxlc]{1,6}|\d{1,2})\)\s+", re.IGNORECASE)
+# Whitespace after the end of a sentence
+SENTENCE_END = re.compile(r"(?<=[.;?!])\s+")
+SENTENCE_ENDINGS = (".", ";", "?", "!")
+
+def is_heading(line: str) -> bool:
+    """Whether a line starts a new top-level clause."""
+    return bool(NAMED_HEADING.match(line) or NUMBERED_HEADING.match(line))
+
+class ClauseSegmenter:
+    """
+    Incremental clause segmenter. Feed lines or pages in document order, then call finish().
+    """
+
+    def __init__(self, min_chars: int = MIN_CLAUSE_CHARS, max_chars: int = MAX_CLAUSE_CHARS,
+                 max_clauses: int = MAX_CLAUSES):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self.max_clauses = max_clauses
+        self.clauses = []
+        # Per clause: whether it starts with a heading or marker rather than continuing a split clause
+        self._marked = []
+        self._lines = []
+        self._length = 0
+        self._page = None
+        self._starts_marked = False
+
+    def feed_line(self, line: str, page: Optional[int] = None, heading: bool = False):
+        """
+        Add one line of text.
+        Args:
+            line: The line text.
+            page: Page number the line is on.
+            heading: Layout says this line is a heading (e.g. larger or bold font).
+        """
+        line = line.strip()
+        if not line:
+            return
+
+        starts_clause = heading or is_heading(line)
+        # A long clause is split at a sub-clause marker or after a line that ends a sentence
+        splits_long_clause = self._length > self.max_chars and (
+            SUB_CLAUSE.match(line) or self._lines[-1].endswith(SENTENCE_ENDINGS))
+        # A bare heading ("1. Definitions") is kept with the text that follows it
+        if (starts_clause or splits_long_clause) and self._length >= self.min_chars:
+            self._flush()
+
+        if not self._lines:
+            self._page = page
+            self._starts_marked = starts_clause or bool(SUB_CLAUSE.match(line))
+        self._lines.append(line)
+        self._length += len(line) + 1
+
+    def feed(self, text: str, page: Optional[int] = None, headings: Iterable[str] = ()):
+        """
+        Add a page (or any block) of plain text.
+        Args:
+            text: The text.
+            page: Page number the text is on.
+            headings: Lines of the text that layout extraction marked as headings.
+        """
+        headings = set(headings)
+        for line in text.splitlines():
+            self.feed_line(line, page, heading=line.strip() in headings)
+
+    def feed_page(self, page: Union[dict, str], number: Optional[int] = None):
+        """Add a page from iter_pdf_pages ({"page", "text", "headings"}) or a page string."""
+        if isinstance(page, dict):
+            self.feed(page.get("text", ""), page.get("page", number), page.get("headings") or ())
+        else:
+            self.feed(page, number)
+
+    def _split(self, text: str) -> list[str]:
+        """Split text longer than max_chars at sentence boundaries, or at spaces within run-on sentences."""
+        if len(text) <= self.max_chars:
+            return [text]
+        pieces, current = [], ""
+        for sentence in SENTENCE_END.split(text):
+            while len(sentence) > self.max_chars:
+                cut = sentence.rfind(" ", 0, self.max_chars + 1)
+                if cut <= 0:
+                    cut = self.max_chars
+                if current:
+                    pieces.append(current)
+                    current = ""
+                pieces.append(sentence[:cut].rstrip())
+                sentence = sentence[cut:].lstrip()
+            if not sentence:
+                continue
+            if current and len(current) + 1 + len(sentence) > self.max_chars:
+                pieces.append(current)
+                current = sentence
+            else:
+                current = f"{current} {sentence}" if current else sentence
+        if current:
+            pieces.append(current)
+        return pieces
+
+    def _flush(self):
+        text = ""
+        for line in self._lines:
+            # Re-join words hyphenated across line breaks
+            if text.endswith("-") and line[:1].islower():
+                text = text[:-1] + line
+            else:
+                text = f"{text} {line}" if text else line
+
+        if len(text) >= self.min_chars:
+            for position, piece in enumerate(self._split(text)):
+                self.clauses.append({
+                    "clause_id": f"C-{len(self.clauses) + 1}",
+                    "text_en": piece,
+                    "page": self._page
+                })
+                self._marked.append(self._starts_marked and position == 0)
+        self._lines, self._length, self._page = [], 0, None
+
+    def _units(self) -> list[list[dict]]:
+        """Group each marked clause with the continuation fragments that follow it."""
+        units = []
+        for clause, marked in zip(self.clauses, self._marked):
+            if marked or not units:
+                units.append([clause])
+            else:
+                units[-1].append(clause)
+        return units
+
+    @staticmethod
+    def _pack(units: list[list[dict]], budget: float) -> list[list[dict]]:
+        """Group consecutive clauses of the same unit while a group's text stays within budget characters."""
+        groups = []
+        for unit in units:
+            length = budget + 1
+            for clause in unit:
+                size = len(clause["text_en"]) + 1
+                if length + size <= budget:
+                    groups[-1].append(clause)
+                    length += size
+                else:
+                    groups.append([clause])
+                    length = size
+        return groups
+
+    def _cap(self):
+        """
+        Merge continuation fragments back into their clause until at most max_clauses remain.
+        Merged clauses stay within max_chars where possible. Marked clauses are never merged,
+        so a document with more of them than max_clauses keeps them all.
+        """
+        units = self._units()
+        budget = self.max_chars
+        groups = self._pack(units, budget)
+        while len(groups) > max(self.max_clauses, len(units)):
+            budget *= 1.25
+            groups = self._pack(units, budget)
+        if len(groups) > self.max_clauses:
+            print(f"[CLAUSES] {len(groups)} clauses start with a heading or marker; "
+                  f"keeping them all over CLAUSE_MAX_COUNT={self.max_clauses}")
+        elif budget > self.max_chars:
+            print(f"[CLAUSES] Merged split clauses into {len(groups)} of up to {int(budget)} chars "
+                  f"to stay under CLAUSE_MAX_COUNT={self.max_clauses}")
+        self.clauses = [{
+            "clause_id": f"C-{number}",
+            "text_en": " ".join(clause["text_en"] for clause in group),
+            "page": group[0]["page"]
+        } for number, group in enumerate(groups, 1)]
+        self._marked = [True] * len(self.clauses)
+
+    def finish(self) -> list[dict]:
+        """Flush the last clause and return all clauses, merged down to max_clauses if needed."""
+        if self._lines:
+            self._flush()
+        if self.max_clauses and len(self.clauses) > self.max_clauses:
+            self._cap()
+        return self.clauses
+
+def segment(text: str) -> list[dict]:
+    """
+    Segment plain text into clauses.
+    Args:
+        text: Extracted document text.
+    Returns:
+        list[dict]: Clauses with "clause_id", "text_en" and "page" (None for plain text).
+    """
+    segmenter = ClauseSegmenter()
+    segmenter.feed(text)
+    return segmenter.finish()
+
+def segment_pages(pages: Iterable[Union[dict, str]]) -> list[dict]:
+    """
+    Segment a sequence of pages (e.g. from iter_pdf_pages) into clauses.
+    Clauses may continue across page boundaries; each records the page it starts on.
+    Heading lines reported by layout extraction start new clauses.
+    """
+    segmenter = ClauseSegmenter()
+    for number, page in enumerate(pages, 1):
+        segmenter.feed_page(page, number)
+    return segmenter.finish()
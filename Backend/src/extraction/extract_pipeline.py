@@ -1,46 +1,218 @@
 import argparse
 import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from itertools import chain
 from pathlib import Path
+from typing import Iterable, Iterator
 import fitz  # PyMuPDF
+from src.extraction.chunking import CHARS_PER_TOKEN
+from src.extraction.clause_segmenter import segment, segment_pages
+from src.extraction.layout import body_font_size, extract_page_layout, find_boilerplate
+
+# "layout": block-based text without repeated headers/footers, in column reading order
+# "text": PyMuPDF's plain get_text("text") output
+EXTRACTION_MODE = os.getenv("PDF_EXTRACTION_MODE", "layout").lower()
+# Bump when page extraction or clause segmentation output changes, to invalidate stored artifacts
+EXTRACTION_VERSION = 2
+
+# Documents with fewer pages are extracted in-process; pool start-up isn't worth it
+PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))
+MAX_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+
+_process_pool = None
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Get or create the shared extraction process pool."""
+    global _process_pool
+    if _process_pool is None:
+        # Start the resource tracker first so workers inherit it instead of starting their own,
+        # which would unlink the parent's shared memory when a worker exits
+        resource_tracker.ensure_running()
+        _process_pool = ProcessPoolExecutor(max_workers=MAX_EXTRACT_WORKERS)
+    return _process_pool
+
+def shutdown_process_pool():
+    """Shut down the extraction process pool, if it was started."""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=True, cancel_futures=True)
+        _process_pool = None
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """Attach to a shared memory block created by the parent process."""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # Pool workers share the parent's resource tracker, so attaching only re-registers
+    # the same name; unregistering here would make the parent's unlink fail
+    return shared_memory.SharedMemory(name=name)
+
+def _extract_page(page, mode: str, boilerplate: frozenset, body_size: float) -> dict:
+    if mode == "layout":
+        return extract_page_layout(page, boilerplate, body_size)
+    text = page.get_text("text")
+    return {"text": text, "raw_chars": len(text)}
+
+def _extract_page_range(name: str, size: int, start: int, end: int, mode: str, boilerplate: frozenset,
+                        body_size: float) -> list[dict]:
+    """Worker: extract pages [start, end) from the shared PDF, reading it in place."""
+    shm = _attach_shared_memory(name)
+    view = shm.buf[:size]
+    try:
+        # PyMuPDF reads a memoryview stream without copying it
+        doc = fitz.open(stream=view, filetype="pdf")
+        try:
+            return [_extract_page(doc[i], mode, boilerplate, body_size) for i in range(start, end)]
+        finally:
+            doc.close()
+            # The document keeps a reference to its stream; drop it so the view can be released
+            del doc
+    finally:
+        view.release()
+        shm.close()
+
+def _page_ranges(page_count: int) -> list[tuple]:
+    workers = min(MAX_EXTRACT_WORKERS, page_count)
+    step = -(-page_count // workers)
+    return [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+
+def _iter_pages_parallel(file_bytes: bytes, page_count: int, mode: str, boilerplate: frozenset,
+                         body_size: float) -> Iterator[list[dict]]:
+    """Split the page range across the process pool and yield each range's pages in order."""
+    shm = shared_memory.SharedMemory(create=True, size=len(file_bytes))
+    futures = []
+    try:
+        shm.buf[:len(file_bytes)] = file_bytes
+        pool = get_process_pool()
+        futures = [pool.submit(_extract_page_range, shm.name, len(file_bytes), start, end, mode, boilerplate, body_size)
+                   for start, end in _page_ranges(page_count)]
+        # Futures are consumed in submission order, so pages stay in order
+        for future in futures:
+            yield future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+        shm.close()
+        shm.unlink()
+
+def _numbered_pages(pages: Iterable[dict], mode: str, stats: dict = None) -> Iterator[dict]:
+    """Number pages and tally how many tokens the extraction mode removed."""
+    raw_chars = kept_chars = 0
+    number = 0
+    for number, page in enumerate(pages, 1):
+        raw_chars += page.pop("raw_chars")
+        kept_chars += len(page["text"])
+        yield {"page": number, **page}
+
+    if stats is not None:
+        raw_tokens, tokens = raw_chars // CHARS_PER_TOKEN, kept_chars // CHARS_PER_TOKEN
+        stats.update({
+            "mode": mode,
+            "pages": number,
+            "raw_tokens": raw_tokens,
+            "tokens": tokens,
+            "tokens_saved": max(0, raw_tokens - tokens)
+        })
+
+def iter_pdf_pages(file_bytes: bytes, parallel: bool = None, mode: str = None, stats: dict = None) -> Iterator[dict]:
+    """
+    Stream the text of a PDF page by page.
+    Pages are yielded as soon as they are decoded, so downstream stages can start
+    on early pages while later ones are still being extracted. The document is
+    closed when the generator finishes or is closed.
+    Args:
+        file_bytes: Raw PDF bytes.
+        parallel: Force page-parallel extraction on or off; decided by page count when None.
+        mode: "layout" or "text"; defaults to PDF_EXTRACTION_MODE.
+        stats: Optional dict filled with token counts before and after boilerplate
+            removal once the last page has been yielded.
+    Yields:
+        dict: {"page": page number (1-based), "text": page text}, plus "columns",
+            "boilerplate_blocks" and "headings" in layout mode.
+    """
+    mode = mode or EXTRACTION_MODE
+    with fitz.open(stream=file_bytes, filetype="pdf") as doc:
+        page_count = doc.page_count
+        # Headers, footers and the body font are detected on sampled pages up front so pages can still be streamed
+        boilerplate = find_boilerplate(doc) if mode == "layout" else frozenset()
+        body_size = body_font_size(doc) if mode == "layout" else 0.0
+        if parallel is None:
+            parallel = page_count >= PARALLEL_MIN_PAGES and MAX_EXTRACT_WORKERS > 1
+        if not parallel:
+            yield from _numbered_pages((_extract_page(page, mode, boilerplate, body_size) for page in doc), mode, stats)
+            return
+
+    ranges = _iter_pages_parallel(file_bytes, page_count, mode, boilerplate, body_size)
+    yield from _numbered_pages(chain.from_iterable(ranges), mode, stats)
+
+def extract_pages(file_bytes: bytes, parallel: bool = None, mode: str = None) -> list[str]:
+    """
+    Extract the text of every page of a PDF.
+    Args:
+        file_bytes: Raw PDF bytes.
+        parallel: Force page-parallel extraction on or off; decided by page count when None.
+        mode: "layout" or "text"; defaults to PDF_EXTRACTION_MODE.
+    Returns:
+        list[str]: Text of each page, in page order.
+    """
+    return [page["text"] for page in iter_pdf_pages(file_bytes, parallel, mode)]
+
+def extraction_version(mode: str = None) -> str:
+    """Version tag stored with extraction artifacts; changes with the mode or the extractor."""
+    return f"{mode or EXTRACTION_MODE}-v{EXTRACTION_VERSION}"
+
+def extract_document(file_bytes: bytes, parallel: bool = None, mode: str = None) -> dict:
+    """
+    Extract a PDF into a storable artifact, so later analyses need not re-parse it.
+    Args:
+        file_bytes: Raw PDF bytes.
+        parallel: Force page-parallel extraction on or off; decided by page count when None.
+        mode: "layout" or "text"; defaults to PDF_EXTRACTION_MODE.
+    Returns:
+        dict: {"version", "pages" (per-page text and layout metadata), "clauses", "stats"}
+    """
+    stats = {}
+    pages = list(iter_pdf_pages(file_bytes, parallel, mode, stats))
+    return {
+        "version": extraction_version(mode),
+        "pages": pages,
+        "clauses": segment_pages(pages),
+        "stats": stats
+    }
 
 # If you already have LayoutLMv3 text, pass it in via --text-file.
 # Otherwise we fall back to a simple PDF text extractor (PyMuPDF).
-def _extract_text_from_pdf(file_bytes: bytes) -> str:
-    doc = fitz.open(stream=file_bytes, filetype="pdf")
-    pages = [p.get_text("text") for p in doc]
-    return "\n\n".join(pages)
-
-# def main():
-#     parser = argparse.ArgumentParser()
-#     parser.add_argument("--input", required=True, help="Path to PDF/DOCX/TXT")
-#     parser.add_argument("--doc-id", required=True)
-#     parser.add_argument("--outdir", required=True)
-#     parser.add_argument("--text-file", help="Optional: path to pre-extracted plain text")
-#     args = parser.parse_args()
-
-#     # 1) get raw text
-#     if args.text_file:
-#         raw_text = Path(args.text_file).read_text(encoding="utf-8", errors="ignore")
-#     else:
-#         in_path = Path(args.input)
-#         if in_path.suffix.lower() == ".pdf":
-#             raw_text = _extract_text_from_pdf(str(in_path))
-#         elif in_path.suffix.lower() in {".txt"}:
-#             raw_text = in_path.read_text(encoding="utf-8", errors="ignore")
-#         else:
-#             raise SystemExit(f"Unsupported input type: {in_path.suffix}. Provide --text-file for extracted text.")
-
-#     # 2) segment
-#     from clause_segmenter import segment
-#     clauses = segment(raw_text)
-
-#     # 3) write correct JSON schema
-#     out = {"document_id": args.doc_id, "clauses": clauses}
-#     outdir = Path(args.outdir)
-#     outdir.mkdir(parents=True, exist_ok=True)
-#     outfile = outdir / f"{args.doc_id}_extracted.json"
-#     outfile.write_text(json.dumps(out, ensure_ascii=False, indent=2), encoding="utf-8")
-#     print(f"Wrote {outfile}")
-
-# if __name__ == "__main__":
-#     main()
+def _extract_text_from_pdf(file_bytes: bytes, parallel: bool = None, mode: str = None) -> str:
+    return "\n\n".join(extract_pages(file_bytes, parallel, mode))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", required=True, help="Path to PDF/TXT")
+    parser.add_argument("--doc-id", required=True)
+    parser.add_argument("--outdir", required=True)
+    parser.add_argument("--text-file", help="Optional: path to pre-extracted plain text")
+    args = parser.parse_args()
+
+    # 1) segment -- PDF pages carry layout headings as well as text rules
+    in_path = Path(args.input)
+    if args.text_file:
+        clauses = segment(Path(args.text_file).read_text(encoding="utf-8", errors="ignore"))
+    elif in_path.suffix.lower() == ".pdf":
+        clauses = segment_pages(iter_pdf_pages(in_path.read_bytes(), mode="layout"))
+    elif in_path.suffix.lower() in {".txt"}:
+        clauses = segment(in_path.read_text(encoding="utf-8", errors="ignore"))
+    else:
+        raise SystemExit(f"Unsupported input type: {in_path.suffix}. Provide --text-file for extracted text.")
+
+    # 2) write correct JSON schema
+    out = {"document_id": args.doc_id, "clauses": clauses}
+    outdir = Path(args.outdir)
+    outdir.mkdir(parents=True, exist_ok=True)
+    outfile = outdir / f"{args.doc_id}_extracted.json"
+    outfile.write_text(json.dumps(out, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"Wrote {outfile}")
+
+if __name__ == "__main__":
+    main()
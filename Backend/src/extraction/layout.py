@@ -0,0 +1,169 @@
+"""
+Layout-aware page text extraction with PyMuPDF blocks.
+
+Headers, footers and page numbers repeated across pages are detected on a
+sample of pages and dropped, and two-column pages are read column by column
+instead of line by line across both columns. Lines set in a larger or bold
+font are reported as headings, for the clause segmenter.
+"""
+
+import re
+from collections import Counter
+
+# Fraction of the page height at the top and bottom treated as header/footer bands
+MARGIN_RATIO = 0.08
+# A margin block is boilerplate when it appears on at least this share of sampled pages
+BOILERPLATE_MIN_RATIO = 0.5
+BOILERPLATE_SAMPLE_PAGES = 16
+# Share of a page's text each column must hold for the page to be read as two columns
+COLUMN_MIN_SHARE = 0.25
+# Short lines at least this much larger than the body font, or all bold, are headings
+HEADING_SIZE_RATIO = 1.15
+HEADING_MAX_CHARS = 120
+BOLD_FLAG = 16
+
+PAGE_NUMBER = re.compile(r"^[-–(\[]?\s*(?:page\s*)?#(?:\s*(?:of|/)\s*#)?\s*[-–)\]]?$")
+
+def normalize_boilerplate(text: str) -> str:
+    """Normalize a header/footer so it matches across pages (numbers and dates vary)."""
+    return re.sub(r"\s+", " ", re.sub(r"\d+", "#", text.lower())).strip()
+
+def in_margin(bbox, page_rect) -> bool:
+    """Whether a bounding box lies in the header or footer band of a page."""
+    band = page_rect.height * MARGIN_RATIO
+    return bbox[3] <= page_rect.y0 + band or bbox[1] >= page_rect.y1 - band
+
+def _text_blocks(page) -> list:
+    # (x0, y0, x1, y1, text, block_no, block_type); type 1 is an image
+    return [block for block in page.get_text("blocks") if block[6] == 0 and block[4].strip()]
+
+def _sample_indices(page_count: int) -> list:
+    """Indices of up to BOILERPLATE_SAMPLE_PAGES pages spread evenly over the document."""
+    samples = min(page_count, BOILERPLATE_SAMPLE_PAGES)
+    if samples < 2:
+        return list(range(samples))
+    return sorted({round(i * (page_count - 1) / (samples - 1)) for i in range(samples)})
+
+def body_font_size(doc) -> float:
+    """
+    Most common font size on the sampled pages, weighted by characters.
+    Args:
+        doc: An open PyMuPDF document.
+    Returns:
+        float: The body font size, or 0.0 for a document without text.
+    """
+    sizes = Counter()
+    for index in _sample_indices(doc.page_count):
+        for block in doc[index].get_text("dict")["blocks"]:
+            for line in block.get("lines", []):
+                for span in line["spans"]:
+                    sizes[round(span["size"], 1)] += len(span["text"].strip())
+    return sizes.most_common(1)[0][0] if sizes else 0.0
+
+def is_heading_line(text: str, spans: list, body_size: float) -> bool:
+    """Whether a line is a heading: short, not a sentence, and larger than the body font or all bold."""
+    if len(text) >= HEADING_MAX_CHARS or text.rstrip().endswith("."):
+        return False
+    larger = bool(body_size) and max(span["size"] for span in spans) >= body_size * HEADING_SIZE_RATIO
+    return larger or all(span["flags"] & BOLD_FLAG for span in spans)
+
+def _dict_blocks(page, body_size: float) -> list:
+    """Text blocks as (x0, y0, x1, y1, text, heading lines), from one get_text("dict") pass."""
+    blocks = []
+    for block in page.get_text("dict")["blocks"]:
+        lines, headings = [], []
+        for line in block.get("lines", []):
+            spans = [span for span in line["spans"] if span["text"].strip()]
+            if not spans:
+                continue
+            text = "".join(span["text"] for span in spans).strip()
+            lines.append(text)
+            if is_heading_line(text, spans, body_size):
+                headings.append(text)
+        if lines:
+            blocks.append((*block["bbox"], "\n".join(lines), headings))
+    return blocks
+
+def find_boilerplate(doc) -> frozenset:
+    """
+    Find header/footer texts repeated across the document.
+    Args:
+        doc: An open PyMuPDF document.
+    Returns:
+        frozenset: Normalized texts of repeated margin blocks.
+    """
+    page_count = doc.page_count
+    if page_count < 3:
+        return frozenset()
+
+    indices = _sample_indices(page_count)
+    counts = Counter()
+    for index in indices:
+        page = doc[index]
+        counts.update({
+            normalize_boilerplate(block[4]) for block in _text_blocks(page) if in_margin(block, page.rect)
+        })
+
+    threshold = max(2, int(len(indices) * BOILERPLATE_MIN_RATIO))
+    return frozenset(text for text, count in counts.items() if count >= threshold)
+
+def is_boilerplate(text: str, bbox, page_rect, boilerplate: frozenset) -> bool:
+    """Whether a block or line is a repeated header/footer or a bare page number."""
+    if not in_margin(bbox, page_rect):
+        return False
+    normalized = normalize_boilerplate(text)
+    return normalized in boilerplate or bool(PAGE_NUMBER.match(normalized))
+
+def _reading_order(blocks: list, page_rect) -> tuple:
+    """Order blocks for reading; returns (blocks, column count)."""
+    blocks = sorted(blocks, key=lambda block: (round(block[1], 1), block[0]))
+    mid = page_rect.x0 + page_rect.width / 2
+    slack = page_rect.width * 0.05
+
+    def side(block):
+        if block[2] <= mid + slack:
+            return "left"
+        if block[0] >= mid - slack:
+            return "right"
+        return "full"
+
+    chars = Counter()
+    for block in blocks:
+        chars[side(block)] += len(block[4])
+    total = sum(chars.values())
+    if min(chars["left"], chars["right"]) < total * COLUMN_MIN_SHARE:
+        return blocks, 1
+
+    # Full-width blocks (titles, tables) split the page into bands; each band is
+    # read left column first, then right column
+    ordered, left, right = [], [], []
+    for block in blocks:
+        position = side(block)
+        if position == "full":
+            ordered += left + right + [block]
+            left, right = [], []
+        else:
+            (left if position == "left" else right).append(block)
+    ordered += left + right
+    return ordered, 2
+
+def extract_page_layout(page, boilerplate: frozenset = frozenset(), body_size: float = 0.0) -> dict:
+    """
+    Extract one page's text from its blocks, without boilerplate and in reading order.
+    Args:
+        page: A PyMuPDF page.
+        boilerplate: Normalized header/footer texts from find_boilerplate.
+        body_size: Body font size from body_font_size; headings are only detected by boldness without it.
+    Returns:
+        dict: {"text", "raw_chars", "columns", "boilerplate_blocks", "headings" (heading lines of the text)}
+    """
+    blocks = _dict_blocks(page, body_size)
+    kept = [block for block in blocks if not is_boilerplate(block[4], block, page.rect, boilerplate)]
+    ordered, columns = _reading_order(kept, page.rect)
+    return {
+        "text": "\n".join(block[4] for block in ordered),
+        "raw_chars": sum(len(block[4]) for block in blocks),
+        "columns": columns,
+        "boilerplate_blocks": len(blocks) - len(kept),
+        "headings": [heading for block in ordered for heading in block[5]]
+    }
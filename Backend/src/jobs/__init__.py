@@ -0,0 +1,7 @@
+"""
+Background jobs for the SEBI compliance system
+"""
+
+from .analysis_jobs import AnalysisJobManager, get_analysis_job_manager, shutdown_analysis_jobs
+
+__all__ = ['AnalysisJobManager', 'get_analysis_job_manager', 'shutdown_analysis_jobs']
@@ -0,0 +1,260 @@
+"""
+Background batch re-analysis of stored documents.
+
+Jobs are checkpointed to storage after every document, so a job interrupted by a
+crash or redeploy resumes where it stopped when the server starts again.
+Documents whose analysis inputs are unchanged reuse their stored analysis.
+"""
+
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from src.compliance_checker.compliance_agent import ComplianceAgent
+from src.storage.gcs_client import get_gcs_client
+
+logger = logging.getLogger(__name__)
+
+JOB_TYPE = "analysis"
+MAX_ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_JOB_WORKERS", "4"))
+ACTIVE_STATUSES = ("queued", "running")
+# Finished job states are deleted after this many days, and beyond this many (0 = no limit)
+JOB_RETENTION_DAYS = float(os.getenv("ANALYSIS_JOB_RETENTION_DAYS", "30"))
+JOB_RETENTION_COUNT = int(os.getenv("ANALYSIS_JOB_RETENTION_COUNT", "100"))
+
+class AnalysisJobManager:
+    """Queue, run and resume batch compliance re-analysis jobs"""
+
+    def __init__(self, storage, max_workers: int = MAX_ANALYSIS_WORKERS):
+        """
+        Args:
+            storage: GCSClient used for documents, analyses and job checkpoints
+            max_workers: Documents analyzed in parallel within a job
+        """
+        self.storage = storage
+        self.max_workers = max_workers
+        # Jobs run one at a time; documents within a job run in parallel
+        self._runner = ThreadPoolExecutor(max_workers=1, thread_name_prefix="analysis-job")
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._active: Dict[str, Dict[str, Any]] = {}
+        self._latest_completed: Optional[Dict[str, Any]] = None
+
+    def enqueue(self, limit: int = 50, force: bool = False) -> Dict[str, Any]:
+        """
+        Queue a re-analysis of up to `limit` documents
+
+        An identical job that is already queued or running is returned instead of
+        starting another one.
+
+        Args:
+            limit: Maximum number of documents to analyze
+            force: Re-analyze documents even if their inputs are unchanged
+
+        Returns:
+            Progress view of the queued (or existing) job
+        """
+        with self._lock:
+            for state in self._active.values():
+                if state["limit"] == limit and state["force"] == force:
+                    return self._view(state)
+
+            now = datetime.now(timezone.utc).isoformat()
+            state = {
+                "job_id": f"job_{uuid.uuid4().hex[:12]}",
+                "type": JOB_TYPE,
+                "status": "queued",
+                "limit": limit,
+                "force": force,
+                "created_at": now,
+                "started_at": None,
+                "finished_at": None,
+                "document_ids": None,
+                "documents": {},
+                "progress": {"total": 0, "analyzed": 0, "skipped": 0, "failed": 0},
+                "summary": None
+            }
+            self._active[state["job_id"]] = state
+
+        self.storage.save_job_state(JOB_TYPE, state["job_id"], state)
+        self._runner.submit(self._run, state["job_id"])
+        logger.info(f"[JOBS] Queued analysis job {state['job_id']} (limit={limit}, force={force})")
+        return self._view(state)
+
+    def resume(self) -> int:
+        """
+        Re-queue jobs that were queued or running when the server last stopped
+
+        Returns:
+            Number of jobs resumed
+        """
+        self._prune()
+        resumed = 0
+        # Only unfinished jobs and the latest completed one are downloaded
+        for state in self.storage.list_job_states(JOB_TYPE, statuses=ACTIVE_STATUSES):
+            if state.get("status") in ACTIVE_STATUSES and state.get("job_id") not in self._active:
+                with self._lock:
+                    self._active[state["job_id"]] = state
+                self._runner.submit(self._run, state["job_id"])
+                resumed += 1
+        for state in self.storage.list_job_states(JOB_TYPE, statuses=("completed",), limit=1):
+            if state.get("status") == "completed":
+                self._latest_completed = state
+        if resumed:
+            logger.info(f"[JOBS] Resumed {resumed} interrupted analysis jobs")
+        return resumed
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the progress of a job
+
+        Args:
+            job_id: Job identifier
+
+        Returns:
+            Progress view of the job or None if it does not exist
+        """
+        with self._lock:
+            state = self._active.get(job_id)
+            if state is not None:
+                return self._view(state)
+        state = self.storage.get_job_state(JOB_TYPE, job_id)
+        return self._view(state) if state else None
+
+    def latest_summary(self) -> Optional[Dict[str, Any]]:
+        """Summary statistics of the most recently completed job, if any"""
+        return self._latest_completed.get("summary") if self._latest_completed else None
+
+    def shutdown(self):
+        """Stop taking new documents; running jobs stay checkpointed and resume on next start"""
+        self._stopping.set()
+        self._runner.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job_id: str):
+        state = self._active[job_id]
+        try:
+            if state.get("started_at") is None:
+                state["started_at"] = datetime.now(timezone.utc).isoformat()
+            state["status"] = "running"
+            # The document set is fixed when the job starts, so a resumed job finishes the same set
+            if state.get("document_ids") is None:
+                state["document_ids"] = self.storage.list_documents(limit=state["limit"])
+            self._update_progress(state)
+            self.storage.save_job_state(JOB_TYPE, job_id, state)
+
+            pending = [doc_id for doc_id in state["document_ids"] if doc_id not in state["documents"]]
+            # One agent for the job: its retrieval model is loaded once, not per document
+            compliance_agent = ComplianceAgent()
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {executor.submit(self._analyze_document, doc_id, state["force"], compliance_agent): doc_id
+                           for doc_id in pending}
+                for future in as_completed(futures):
+                    record = future.result()
+                    if record is None:
+                        continue
+                    with self._lock:
+                        state["documents"][futures[future]] = record
+                        self._update_progress(state)
+                    self.storage.save_job_state(JOB_TYPE, job_id, state)
+
+            if self._stopping.is_set():
+                logger.info(f"[JOBS] Job {job_id} interrupted at {len(state['documents'])}/{len(state['document_ids'])} documents")
+                return
+
+            analyses = [record for record in state["documents"].values() if record["status"] != "failed"]
+            state["summary"] = self.storage.summarize_analyses(analyses, len(state["document_ids"]))
+            state["status"] = "completed"
+            logger.info(f"[JOBS] Job {job_id} completed: {state['progress']}")
+
+        except Exception as e:
+            logger.error(f"[JOBS] Job {job_id} failed: {e}")
+            state["status"] = "failed"
+            state["error"] = str(e)
+
+        state["finished_at"] = datetime.now(timezone.utc).isoformat()
+        self.storage.save_job_state(JOB_TYPE, job_id, state)
+        with self._lock:
+            self._active.pop(job_id, None)
+            if state["status"] == "completed":
+                self._latest_completed = state
+        self._prune()
+
+    def _prune(self):
+        """Delete finished job states past the retention limits"""
+        self.storage.prune_job_states(JOB_TYPE, ACTIVE_STATUSES, JOB_RETENTION_DAYS, JOB_RETENTION_COUNT)
+
+    def _analyze_document(self, document_id: str, force: bool,
+                          compliance_agent: ComplianceAgent) -> Optional[Dict[str, Any]]:
+        """Analyze one document, or reuse its stored analysis if the inputs are unchanged"""
+        if self._stopping.is_set():
+            return None
+        try:
+            if not force:
+                fingerprint = self.storage.document_fingerprint(document_id)
+                stored = self.storage.get_document_analysis(document_id) if fingerprint else None
+                if stored and stored.get("fingerprint") == fingerprint:
+                    return self._record("skipped", stored)
+
+            analysis = self.storage.analyze_document_compliance(document_id, compliance_agent)
+            if "error" in analysis:
+                return {"status": "failed", "error": analysis["error"]}
+            return self._record("analyzed", analysis)
+
+        except Exception as e:
+            logger.error(f"[JOBS] Failed to analyze {document_id}: {e}")
+            return {"status": "failed", "error": str(e)}
+
+    @staticmethod
+    def _record(status: str, analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """Keep only what the job summary needs from an analysis"""
+        risk = analysis["risk_assessment"]
+        return {
+            "status": status,
+            "compliance_analysis": analysis["compliance_analysis"],
+            "risk_assessment": {"overall_risk_score": risk["overall_risk_score"], "risk_level": risk["risk_level"]}
+        }
+
+    @staticmethod
+    def _update_progress(state: Dict[str, Any]):
+        statuses: List[str] = [record["status"] for record in state["documents"].values()]
+        state["progress"] = {
+            "total": len(state["document_ids"] or []),
+            "analyzed": statuses.count("analyzed"),
+            "skipped": statuses.count("skipped"),
+            "failed": statuses.count("failed")
+        }
+
+    @staticmethod
+    def _view(state: Dict[str, Any]) -> Dict[str, Any]:
+        """Public progress view of a job state"""
+        return {
+            **{key: value for key, value in state.items() if key not in ("documents", "document_ids")},
+            "documents": {
+                doc_id: {key: record[key] for key in ("status", "error") if key in record}
+                for doc_id, record in state.get("documents", {}).items()
+            }
+        }
+
+# Global job manager instance
+_job_manager = None
+_job_manager_lock = threading.Lock()
+
+def get_analysis_job_manager() -> AnalysisJobManager:
+    """Get or create the global analysis job manager"""
+    global _job_manager
+    if _job_manager is None:
+        with _job_manager_lock:
+            if _job_manager is None:
+                _job_manager = AnalysisJobManager(get_gcs_client())
+    return _job_manager
+
+def shutdown_analysis_jobs():
+    """Stop the analysis job manager, if it was started"""
+    global _job_manager
+    with _job_manager_lock:
+        if _job_manager is not None:
+            _job_manager.shutdown()
+            _job_manager = None
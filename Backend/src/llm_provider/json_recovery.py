@@ -0,0 +1,132 @@
+"""
+Recovery of JSON from LLM responses
+
+LLM "JSON" often arrives wrapped in markdown code fences or prose, with trailing
+commas, raw newlines inside strings, Windows paths with stray backslashes,
+Python literals, or cut off mid-object. `recover_json` parses well-formed
+responses directly and otherwise repairs them in a single linear scan:
+
+- everything before the outermost object (or leading array) and after its
+  matching close is dropped, which strips fences and prose,
+- string literals are kept intact, Unicode included; only raw control
+  characters and invalid escapes inside them are escaped,
+- trailing commas before a closing bracket are removed,
+- True/False/None outside strings become true/false/null,
+- brackets still open at the end of a truncated response are closed.
+
+The scan tokenizes with one regular expression, so string bodies and runs of
+plain characters are consumed by the regex engine rather than per character.
+"""
+
+import json
+import re
+from typing import Any
+
+TOKEN = re.compile(
+    r'"(?P<string>(?:[^"\\]|\\.)*)"?'
+    r'|(?P<open>[{\[])'
+    r'|(?P<close>[}\]])'
+    r'|(?P<comma>,)'
+    r'|(?P<other>[^"{}\[\],]+)',
+    re.DOTALL
+)
+CONTROL_CHARS = re.compile(r"[\x00-\x1f]")
+ESCAPE = re.compile(r'\\(?:[\\/"bfnrt]|u[0-9a-fA-F]{4}|(.))', re.DOTALL)
+PYTHON_LITERALS = re.compile(r"\b(True|False|None)\b")
+LITERAL_MAP = {"True": "true", "False": "false", "None": "null"}
+CLOSERS = {"{": "}", "[": "]"}
+CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t", "\b": "\\b", "\f": "\\f"}
+
+def _escape_control(match: re.Match) -> str:
+    char = match.group(0)
+    return CONTROL_ESCAPES.get(char) or f"\\u{ord(char):04x}"
+
+def _fix_escape(match: re.Match) -> str:
+    # Valid escapes leave the group unset; anything else gets its backslash escaped
+    if match.group(1) is None:
+        return match.group(0)
+    return "\\\\" + match.group(1)
+
+def _repair_string(body: str) -> str:
+    """Quote a string body, escaping what JSON does not allow raw; also closes cut-off strings."""
+    if "\\" in body:
+        body = ESCAPE.sub(_fix_escape, body)
+    if CONTROL_CHARS.search(body):
+        body = CONTROL_CHARS.sub(_escape_control, body)
+    return f'"{body}"'
+
+def _start(text: str) -> int:
+    """Index of the outermost value: a leading array, otherwise the first object."""
+    stripped = text.lstrip()
+    if stripped.startswith("```"):
+        newline = stripped.find("\n")
+        stripped = stripped[newline + 1:].lstrip() if newline >= 0 else ""
+    if stripped.startswith("["):
+        return len(text) - len(stripped)
+    return text.find("{")
+
+def extract_json_text(text: str) -> str:
+    """
+    Extract and repair the outermost JSON value of an LLM response.
+    Args:
+        text (str): Raw response text.
+    Returns:
+        str: JSON text; empty if the response contains no object or array.
+    """
+    start = _start(text)
+    if start < 0:
+        return ""
+
+    out = []
+    stack = []
+    last_comma = None
+    for match in TOKEN.finditer(text, start):
+        kind = match.lastgroup
+        if kind == "string":
+            out.append(_repair_string(match.group("string")))
+            last_comma = None
+        elif kind == "other":
+            token = match.group()
+            if not token.isspace():
+                last_comma = None
+                if "e" in token:
+                    token = PYTHON_LITERALS.sub(lambda m: LITERAL_MAP[m.group(1)], token)
+            out.append(token)
+        elif kind == "comma":
+            last_comma = len(out)
+            out.append(",")
+        elif kind == "open":
+            stack.append(match.group())
+            out.append(match.group())
+            last_comma = None
+        else:
+            if last_comma is not None:
+                out[last_comma] = ""
+                last_comma = None
+            # A mismatched closer is replaced by the one the open bracket needs
+            out.append(CLOSERS[stack.pop()])
+            if not stack:
+                break
+
+    if stack:
+        # Truncated response: drop a dangling comma and close what is still open
+        if last_comma is not None:
+            out[last_comma] = ""
+        out.extend(CLOSERS[opener] for opener in reversed(stack))
+    return "".join(out)
+
+def recover_json(text: str) -> Any:
+    """
+    Parse the JSON in an LLM response, repairing common defects.
+    Args:
+        text (str): Raw response text.
+    Returns:
+        The parsed JSON value.
+    Raises:
+        json.JSONDecodeError: If no JSON could be recovered.
+    """
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    return json.loads(extract_json_text(text))
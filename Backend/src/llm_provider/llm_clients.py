@@ -0,0 +1,384 @@
+"""
+Provider-agnostic LLM clients
+
+One long-lived client per provider is shared by every caller, so HTTP/gRPC
+connections are pooled and API keys are configured once instead of per request.
+Every provider exposes the same interface: async `complete` / `complete_json`
+for the event loop, and `complete_sync` / `complete_json_sync` for thread-pool
+callers, all with a per-request timeout. Calls go through the API key's rate
+limiter (see rate_limiter.py), which also owns retries.
+
+JSON completions can take a response Schema (see schemas.py): it is enforced
+through the provider's native structured-output mode and validated on parse.
+"""
+
+import asyncio
+import inspect
+import json
+import os
+import threading
+import weakref
+from typing import Dict
+from dotenv import load_dotenv
+from src.extraction.chunking import estimate_tokens
+from src.llm_provider.rate_limiter import get_rate_limiter
+from src.llm_provider.json_recovery import recover_json
+from src.llm_provider.schemas import Schema
+
+try:
+    from openai import OpenAI, AsyncOpenAI
+except ImportError:
+    OpenAI = AsyncOpenAI = None
+
+try:
+    from anthropic import Anthropic, AsyncAnthropic
+except ImportError:
+    Anthropic = AsyncAnthropic = None
+
+try:
+    import google.generativeai as genai
+    from google.ai import generativelanguage as glm
+except ImportError:
+    genai = glm = None
+
+try:
+    from mistralai import Mistral
+except ImportError:
+    Mistral = None
+
+load_dotenv()
+
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+# Output tokens budgeted per request when reserving tokens-per-minute quota
+EXPECTED_OUTPUT_TOKENS = 1000
+
+# provider -> (default model, API key environment variable)
+PROVIDER_DEFAULTS = {
+    "openai": ("gpt-4o-mini", "OPENAI_API_KEY"),
+    "gemini": ("gemini-2.5-flash", "GEMINI_API_KEY_2"),
+    "claude": ("claude-3-opus-20240229", "ANTHROPIC_API_KEY"),
+    "mistral": ("mistral-large-latest", "MISTRAL_API_KEY"),
+}
+
+def _json_schema_format(schema: Schema) -> dict:
+    """OpenAI/Mistral response_format enforcing a schema (strict: the model can only produce matching JSON)"""
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": schema.name, "description": schema.description, "schema": schema.definition, "strict": True}
+    }
+
+def json_generation_config(schema: Schema = None) -> dict:
+    """Gemini/Vertex AI generation_config for a JSON response, constrained to schema if given"""
+    config = {"response_mime_type": "application/json"}
+    if schema is not None:
+        config["response_schema"] = schema.gemini
+    return config
+
+class LLMClient:
+    """
+    Base class for pooled provider clients.
+    Subclasses create the SDK clients and implement the two completion calls.
+    """
+
+    provider = None
+
+    def __init__(self, model: str, api_key: str, timeout: float = LLM_TIMEOUT_SECONDS, key_env: str = None):
+        self.model = model
+        self.api_key = api_key
+        self.timeout = timeout
+        self.limiter = get_rate_limiter(self.provider, api_key, key_env)
+        self._sync_client = None
+        # Async SDK clients hold connections bound to the event loop that first used them
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _create_sync_client(self):
+        raise NotImplementedError
+
+    def _create_async_client(self):
+        raise NotImplementedError
+
+    def _complete_sync(self, client, system: str, user: str, json_mode: bool, schema: Schema = None) -> str:
+        raise NotImplementedError
+
+    async def _complete_async(self, client, system: str, user: str, json_mode: bool, schema: Schema = None) -> str:
+        raise NotImplementedError
+
+    def sync_client(self):
+        """Get the shared synchronous SDK client"""
+        if self._sync_client is None:
+            with self._lock:
+                if self._sync_client is None:
+                    self._sync_client = self._create_sync_client()
+        return self._sync_client
+
+    def async_client(self):
+        """Get the shared asynchronous SDK client for the running event loop"""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            with self._lock:
+                client = self._async_clients.get(loop)
+                if client is None:
+                    client = self._async_clients[loop] = self._create_async_client()
+        return client
+
+    def complete_sync(self, system: str, user: str, json_mode: bool = False, schema: Schema = None) -> str:
+        """
+        Run a completion from synchronous code.
+        Args:
+            system (str): The system prompt.
+            user (str): The user prompt.
+            json_mode (bool): Ask the provider for a JSON response where supported.
+            schema (Schema): Constrain a JSON response to this schema where supported.
+        Returns:
+            str: The raw response text.
+        """
+        client = self.sync_client()
+        return self.limiter.run_sync(
+            lambda: self._complete_sync(client, system, user, json_mode, schema),
+            self._estimate_tokens(system, user)
+        )
+
+    async def complete(self, system: str, user: str, json_mode: bool = False, schema: Schema = None) -> str:
+        """
+        Run a completion on the event loop.
+        Args:
+            system (str): The system prompt.
+            user (str): The user prompt.
+            json_mode (bool): Ask the provider for a JSON response where supported.
+            schema (Schema): Constrain a JSON response to this schema where supported.
+        Returns:
+            str: The raw response text.
+        """
+        client = self.async_client()
+        return await self.limiter.run(
+            lambda: asyncio.wait_for(self._complete_async(client, system, user, json_mode, schema), timeout=self.timeout),
+            self._estimate_tokens(system, user)
+        )
+
+    @staticmethod
+    def _estimate_tokens(system: str, user: str) -> int:
+        return estimate_tokens(system) + estimate_tokens(user) + EXPECTED_OUTPUT_TOKENS
+
+    def complete_json_sync(self, system: str, user: str, schema: Schema = None) -> dict:
+        """Run a completion from synchronous code and parse the JSON response, validated against schema if given."""
+        text = self.complete_sync(system, user, json_mode=True, schema=schema)
+        return schema.parse(text) if schema is not None else recover_json(text)
+
+    async def complete_json(self, system: str, user: str, schema: Schema = None) -> dict:
+        """Run a completion on the event loop and parse the JSON response, validated against schema if given."""
+        text = await self.complete(system, user, json_mode=True, schema=schema)
+        return schema.parse(text) if schema is not None else recover_json(text)
+
+    async def aclose(self):
+        """Close the async client bound to the running event loop, if any"""
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await self._close_async_client(client)
+
+    async def _close_async_client(self, client):
+        close = getattr(client, "close", None)
+        if close is not None:
+            result = close()
+            if inspect.isawaitable(result):
+                await result
+
+class OpenAIClient(LLMClient):
+    provider = "openai"
+
+    def _create_sync_client(self):
+        if OpenAI is None:
+            raise ImportError("openai is not installed. Install: pip install openai")
+        return OpenAI(api_key=self.api_key, timeout=self.timeout, max_retries=0)
+
+    def _create_async_client(self):
+        if AsyncOpenAI is None:
+            raise ImportError("openai is not installed. Install: pip install openai")
+        return AsyncOpenAI(api_key=self.api_key, timeout=self.timeout, max_retries=0)
+
+    def _request(self, system: str, user: str, json_mode: bool, schema: Schema) -> dict:
+        request = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system},
+                {"role": "user", "content": user}
+            ]
+        }
+        if schema is not None:
+            request["response_format"] = _json_schema_format(schema)
+        elif json_mode:
+            request["response_format"] = {"type": "json_object"}
+        return request
+
+    def _complete_sync(self, client, system, user, json_mode, schema=None):
+        response = client.chat.completions.create(**self._request(system, user, json_mode, schema))
+        return response.choices[0].message.content
+
+    async def _complete_async(self, client, system, user, json_mode, schema=None):
+        response = await client.chat.completions.create(**self._request(system, user, json_mode, schema))
+        return response.choices[0].message.content
+
+class ClaudeClient(LLMClient):
+    provider = "claude"
+    # Claude requires an output limit; it has to fit a whole verification batch (VERIFY_BATCH_OUTPUT_TOKENS)
+    max_tokens = int(os.getenv("CLAUDE_MAX_TOKENS", "4096"))
+
+    def _create_sync_client(self):
+        if Anthropic is None:
+            raise ImportError("anthropic is not installed. Install: pip install anthropic")
+        return Anthropic(api_key=self.api_key, timeout=self.timeout, max_retries=0)
+
+    def _create_async_client(self):
+        if AsyncAnthropic is None:
+            raise ImportError("anthropic is not installed. Install: pip install anthropic")
+        return AsyncAnthropic(api_key=self.api_key, timeout=self.timeout, max_retries=0)
+
+    def _request(self, system: str, user: str, schema: Schema) -> dict:
+        request = {
+            "model": self.model,
+            "max_tokens": self.max_tokens,
+            "system": system,
+            "messages": [{"role": "user", "content": user}]
+        }
+        if schema is not None:
+            # Claude has no JSON mode; a forced tool call returns arguments matching the input schema
+            request["tools"] = [{"name": schema.name, "description": schema.description or schema.name,
+                                 "input_schema": schema.definition}]
+            request["tool_choice"] = {"type": "tool", "name": schema.name}
+        return request
+
+    @staticmethod
+    def _text(response) -> str:
+        for block in response.content:
+            if block.type == "tool_use":
+                return json.dumps(block.input)
+        return response.content[0].text
+
+    def _complete_sync(self, client, system, user, json_mode, schema=None):
+        return self._text(client.messages.create(**self._request(system, user, schema)))
+
+    async def _complete_async(self, client, system, user, json_mode, schema=None):
+        return self._text(await client.messages.create(**self._request(system, user, schema)))
+
+class GeminiClient(LLMClient):
+    provider = "gemini"
+
+    def _model(self, **service_clients):
+        if genai is None:
+            raise ImportError("google-generativeai is not installed. Install: pip install google-generativeai")
+        model = genai.GenerativeModel(self.model)
+        # genai.configure is process-wide and the summarizer uses a different key, and the SDK
+        # has no per-model key option, so the model gets its own service clients through the
+        # attributes it lazily fills from the global default. These are private: the SDK is
+        # pinned (google-generativeai==0.8.5, its final release) and checked here, so a changed
+        # SDK fails loudly instead of silently calling with the global key
+        for attribute, service_client in service_clients.items():
+            if getattr(model, attribute, False) is not None:
+                raise RuntimeError(f"genai.GenerativeModel has no {attribute} slot; "
+                                   f"this google-generativeai version is not supported (pin 0.8.5)")
+            setattr(model, attribute, service_client)
+        return model
+
+    def _create_sync_client(self):
+        return self._model(_client=glm.GenerativeServiceClient(client_options={"api_key": self.api_key}))
+
+    def _create_async_client(self):
+        return self._model(_async_client=glm.GenerativeServiceAsyncClient(client_options={"api_key": self.api_key}))
+
+    async def _close_async_client(self, client):
+        # The model has no close(); its grpc channel lives in the private _async_client slot
+        # set by _model, so this depends on the google-generativeai==0.8.5 pin as well
+        result = client._async_client.transport.close()
+        if inspect.isawaitable(result):
+            await result
+
+    def _options(self, json_mode: bool, schema: Schema) -> dict:
+        options = {"request_options": {"timeout": self.timeout}}
+        if json_mode or schema is not None:
+            options["generation_config"] = json_generation_config(schema)
+        return options
+
+    def _complete_sync(self, client, system, user, json_mode, schema=None):
+        return client.generate_content(system + "\n" + user, **self._options(json_mode, schema)).text
+
+    async def _complete_async(self, client, system, user, json_mode, schema=None):
+        response = await client.generate_content_async(system + "\n" + user, **self._options(json_mode, schema))
+        return response.text
+
+class MistralLLMClient(LLMClient):
+    provider = "mistral"
+
+    def _create_sync_client(self):
+        if Mistral is None:
+            raise ImportError("mistralai is not installed. Install: pip install mistralai")
+        return Mistral(api_key=self.api_key, timeout_ms=int(self.timeout * 1000))
+
+    _create_async_client = _create_sync_client
+
+    def _request(self, system: str, user: str, json_mode: bool, schema: Schema) -> dict:
+        request = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system},
+                {"role": "user", "content": user + ("\nReturn ONLY valid JSON." if json_mode else "")}
+            ]
+        }
+        if schema is not None:
+            request["response_format"] = _json_schema_format(schema)
+        elif json_mode:
+            request["response_format"] = {"type": "json_object"}
+        return request
+
+    def _complete_sync(self, client, system, user, json_mode, schema=None):
+        response = client.chat.complete(**self._request(system, user, json_mode, schema))
+        return response.choices[0].message.content
+
+    async def _complete_async(self, client, system, user, json_mode, schema=None):
+        response = await client.chat.complete_async(**self._request(system, user, json_mode, schema))
+        return response.choices[0].message.content
+
+CLIENT_CLASSES = {
+    "openai": OpenAIClient,
+    "gemini": GeminiClient,
+    "claude": ClaudeClient,
+    "mistral": MistralLLMClient,
+}
+
+_clients: Dict[str, LLMClient] = {}
+_clients_lock = threading.Lock()
+
+def get_llm_client(provider: str) -> LLMClient:
+    """
+    Get the shared client for a provider.
+    The model and API key default to PROVIDER_DEFAULTS and can be overridden with
+    {PROVIDER}_MODEL (e.g. OPENAI_MODEL).
+    Args:
+        provider (str): One of "openai", "gemini", "claude", "mistral".
+    Returns:
+        LLMClient: The pooled client.
+    """
+    if provider not in CLIENT_CLASSES:
+        raise ValueError(f"Unsupported provider: {provider}")
+
+    client = _clients.get(provider)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(provider)
+            if client is None:
+                model, key_env = PROVIDER_DEFAULTS[provider]
+                client = CLIENT_CLASSES[provider](
+                    model=os.getenv(f"{provider.upper()}_MODEL", model),
+                    api_key=os.getenv(key_env),
+                    key_env=key_env
+                )
+                _clients[provider] = client
+    return client
+
+async def close_llm_clients():
+    """Close the async clients bound to the running event loop (call on shutdown)"""
+    for client in list(_clients.values()):
+        try:
+            await client.aclose()
+        except Exception as e:
+            print(f"[WARN] Could not close {client.provider} client: {e}")
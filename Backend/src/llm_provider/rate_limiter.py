@@ -0,0 +1,260 @@
+"""
+Client-side rate limiting for LLM providers
+
+Each API key gets request-per-minute and token-per-minute token buckets, an
+AIMD concurrency limit (grow by one per window of successes, halve on
+throttling) and jittered exponential retry on 429/5xx/timeouts. Callers share
+the limiter of their key, so concurrent work stays under the quota instead of
+failing on error spikes.
+
+Limits come from the environment, most specific first:
+    {KEY_ENV}_RPM / _TPM / _MAX_CONCURRENCY   e.g. GEMINI_API_KEY_2_RPM
+    {PROVIDER}_RPM / _TPM / _MAX_CONCURRENCY  e.g. GEMINI_RPM
+    DEFAULT_LIMITS below
+"""
+
+import asyncio
+import hashlib
+import os
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# provider -> (requests per minute, tokens per minute, max concurrency); set these to your quota
+DEFAULT_LIMITS = {
+    "openai": (500, 200000, 32),
+    "gemini": (150, 1000000, 16),
+    "claude": (50, 40000, 8),
+    "mistral": (60, 500000, 8),
+    "vertex_ai": (60, 1000000, 8),
+    "vertex_ai_embeddings": (600, 5000000, 8),
+}
+FALLBACK_LIMITS = (60, 100000, 8)
+
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "1.0"))
+RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "30.0"))
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504, 529}
+# Status codes that mean "slow down" rather than a transient failure
+THROTTLE_STATUS = {429, 503, 529}
+
+def _status_code(error: Exception) -> Optional[int]:
+    """HTTP status of an SDK error (OpenAI/Anthropic/Mistral status_code, google.api_core code)."""
+    for value in (getattr(error, "status_code", None), getattr(error, "code", None),
+                  getattr(getattr(error, "response", None), "status_code", None)):
+        if isinstance(value, int):
+            return value
+    return None
+
+def is_retryable(error: Exception) -> bool:
+    """Whether an LLM call failure is worth retrying."""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    name = type(error).__name__
+    return any(marker in name for marker in ("Timeout", "Connection", "ResourceExhausted", "ServiceUnavailable"))
+
+def is_throttled(error: Exception) -> bool:
+    """Whether an error signals that the provider wants us to slow down."""
+    return _status_code(error) in THROTTLE_STATUS or type(error).__name__ == "ResourceExhausted"
+
+def _retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `rate_per_minute`."""
+
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """
+        Take `amount` tokens, going into debt if needed.
+        Returns:
+            float: Seconds the caller must wait before using the reservation.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= min(amount, self.capacity)
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+class AdaptiveConcurrency:
+    """AIMD concurrency limit usable from threads and event loops alike."""
+
+    def __init__(self, max_limit: int, initial: int = None, min_limit: int = 1):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(initial or max(min_limit, max_limit // 2))
+        self.in_flight = 0
+        self._condition = threading.Condition()
+
+    def try_acquire(self) -> bool:
+        with self._condition:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait(timeout=0.1)
+            self.in_flight += 1
+
+    async def acquire_async(self):
+        # Polling keeps the limiter shared between worker threads and any event loop
+        while not self.try_acquire():
+            await asyncio.sleep(0.02)
+
+    def release(self, success: Optional[bool]):
+        """Release a slot; success grows the limit additively, throttling halves it."""
+        with self._condition:
+            self.in_flight -= 1
+            if success:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            elif success is False:
+                self.limit = max(self.min_limit, self.limit / 2)
+            self._condition.notify_all()
+
+class RateLimiter:
+    """Rate limits, adaptive concurrency and retries for one API key."""
+
+    def __init__(self, name: str, rpm: float, tpm: float, max_concurrency: int,
+                 max_retries: int = LLM_MAX_RETRIES):
+        self.name = name
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self.max_retries = max_retries
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        # Full jitter keeps retries from many clauses from arriving in lockstep
+        delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+        return max(delay, _retry_after(error) or 0.0)
+
+    def _reserve(self, estimated_tokens: int) -> float:
+        return max(self.requests.reserve(1), self.tokens.reserve(estimated_tokens))
+
+    def _should_retry(self, attempt: int, error: Exception) -> bool:
+        if attempt >= self.max_retries or not is_retryable(error):
+            return False
+        print(f"[WARN] {self.name} call failed ({type(error).__name__}: {error}); retry {attempt + 1}/{self.max_retries}")
+        return True
+
+    async def run(self, call: Callable[[], Awaitable[Any]], estimated_tokens: int = 0) -> Any:
+        """
+        Run an async LLM call under the limits, retrying transient failures.
+        Args:
+            call: Zero-argument function returning a new awaitable per attempt.
+            estimated_tokens (int): Tokens the request is expected to use (input + output).
+        Returns:
+            The call's result.
+        """
+        attempt = 0
+        while True:
+            await self.concurrency.acquire_async()
+            outcome = None
+            try:
+                await asyncio.sleep(self._reserve(estimated_tokens))
+                result = await call()
+                outcome = True
+                return result
+            except Exception as e:
+                if is_throttled(e):
+                    outcome = False
+                if not self._should_retry(attempt, e):
+                    raise
+                delay = self._backoff(attempt, e)
+            finally:
+                self.concurrency.release(outcome)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def run_sync(self, call: Callable[[], Any], estimated_tokens: int = 0) -> Any:
+        """
+        Run a blocking LLM call under the limits, retrying transient failures.
+        Args:
+            call: Zero-argument function making the request.
+            estimated_tokens (int): Tokens the request is expected to use (input + output).
+        Returns:
+            The call's result.
+        """
+        attempt = 0
+        while True:
+            self.concurrency.acquire()
+            outcome = None
+            try:
+                time.sleep(self._reserve(estimated_tokens))
+                result = call()
+                outcome = True
+                return result
+            except Exception as e:
+                if is_throttled(e):
+                    outcome = False
+                if not self._should_retry(attempt, e):
+                    raise
+                delay = self._backoff(attempt, e)
+            finally:
+                self.concurrency.release(outcome)
+            attempt += 1
+            time.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        """Current concurrency state, for diagnostics"""
+        return {
+            "name": self.name,
+            "concurrency_limit": round(self.concurrency.limit, 2),
+            "in_flight": self.concurrency.in_flight
+        }
+
+def _limit(names: list, default: float) -> float:
+    for name in names:
+        value = os.getenv(name)
+        if value:
+            return float(value)
+    return default
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+def get_rate_limiter(provider: str, api_key: Optional[str], key_env: Optional[str] = None) -> RateLimiter:
+    """
+    Get the shared limiter for a provider API key.
+    Callers using the same key share one limiter, since the quota is per key.
+    Args:
+        provider (str): Provider name, e.g. "gemini".
+        api_key (str): The API key (only its hash is kept).
+        key_env (str): Name of the environment variable holding the key, for per-key limits.
+    Returns:
+        RateLimiter: The limiter for that key.
+    """
+    key = f"{provider}:{hashlib.sha256((api_key or '').encode('utf-8')).hexdigest()[:16]}"
+    limiter = _limiters.get(key)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(key)
+            if limiter is None:
+                rpm, tpm, concurrency = DEFAULT_LIMITS.get(provider, FALLBACK_LIMITS)
+                prefixes = ([key_env] if key_env else []) + [provider.upper()]
+                limiter = RateLimiter(
+                    name=key_env or provider,
+                    rpm=_limit([f"{prefix}_RPM" for prefix in prefixes], rpm),
+                    tpm=_limit([f"{prefix}_TPM" for prefix in prefixes], tpm),
+                    max_concurrency=int(_limit([f"{prefix}_MAX_CONCURRENCY" for prefix in prefixes], concurrency))
+                )
+                _limiters[key] = limiter
+    return limiter
@@ -0,0 +1,241 @@
+"""
+Latency-aware routing across LLM providers
+
+The router keeps a rolling window of latency and outcome samples per provider
+and sends each request to the healthiest one: lowest p50 latency, penalised by
+its error rate. A provider that fails is skipped for the rest of the request
+(failover), and one that keeps failing is cooled down for a while. Optionally a
+hedged request goes to the next provider when the first is slower than its p95.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+from src.llm_provider.llm_clients import PROVIDER_DEFAULTS, get_llm_client
+from src.llm_provider.schemas import Schema
+
+ROUTER_PROVIDERS = [name.strip() for name in
+                    os.getenv("LLM_ROUTER_PROVIDERS", "gemini,openai,claude,mistral,vertex_ai").split(",") if name.strip()]
+ROUTER_HEDGE = os.getenv("LLM_ROUTER_HEDGE", "false").lower() == "true"
+ROUTER_WINDOW = int(os.getenv("LLM_ROUTER_WINDOW", "100"))
+# Samples needed before a provider's p95 is trusted for hedging
+HEDGE_MIN_SAMPLES = 10
+# Consecutive failures that put a provider in cooldown, and for how long
+FAILURE_THRESHOLD = 3
+COOLDOWN_SECONDS = float(os.getenv("LLM_ROUTER_COOLDOWN_SECONDS", "30"))
+# How strongly the error rate inflates a provider's latency score
+ERROR_PENALTY = 4.0
+
+class ProviderStats:
+    """Rolling latency and error statistics for one provider."""
+
+    def __init__(self, window: int = ROUTER_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool):
+        with self._lock:
+            self.samples.append((latency, ok))
+            if ok:
+                self.consecutive_failures = 0
+            else:
+                self.consecutive_failures += 1
+                if self.consecutive_failures >= FAILURE_THRESHOLD:
+                    self.cooldown_until = time.monotonic() + COOLDOWN_SECONDS
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            latencies = sorted(latency for latency, ok in self.samples if ok)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    def error_rate(self) -> float:
+        with self._lock:
+            if not self.samples:
+                return 0.0
+            return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+
+    def available(self) -> bool:
+        return time.monotonic() >= self.cooldown_until
+
+    def score(self) -> float:
+        """Lower is better; providers without samples score 0 so they get tried."""
+        p50 = self.percentile(0.5)
+        if p50 is None:
+            return 0.0 if not self.samples else float("inf")
+        return p50 * (1 + ERROR_PENALTY * self.error_rate())
+
+class LLMRouter:
+    """Route JSON completions to the healthiest provider, with failover and optional hedging."""
+
+    def __init__(self, backends: Dict[str, Any], hedge: bool = ROUTER_HEDGE):
+        """
+        Args:
+            backends: Provider name -> object with async complete_json(system, user, schema)
+                and complete_json_sync(system, user, schema), e.g. an LLMClient or VertexAIVerifier.
+            hedge: Send a second request to the next provider when the first exceeds its p95.
+        """
+        if not backends:
+            raise ValueError("LLMRouter needs at least one provider")
+        self.backends = backends
+        self.order = list(backends)
+        self.hedge = hedge
+        self.stats = {name: ProviderStats() for name in backends}
+
+    def ranked(self) -> List[str]:
+        """Providers from healthiest to least healthy; cooled-down ones only as a last resort."""
+        def key(name):
+            return (self.stats[name].score(), self.order.index(name))
+        available = sorted((name for name in self.order if self.stats[name].available()), key=key)
+        cooling = sorted((name for name in self.order if not self.stats[name].available()), key=key)
+        return available + cooling
+
+    def _hedge_delay(self, name: str) -> Optional[float]:
+        stats = self.stats[name]
+        if len(stats.samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return stats.percentile(0.95)
+
+    async def _call(self, name: str, system: str, user: str, schema: Schema = None) -> dict:
+        start = time.perf_counter()
+        try:
+            result = await self.backends[name].complete_json(system, user, schema)
+        except Exception:
+            self.stats[name].record(time.perf_counter() - start, ok=False)
+            raise
+        self.stats[name].record(time.perf_counter() - start, ok=True)
+        return result
+
+    def _call_sync(self, name: str, system: str, user: str, schema: Schema = None) -> dict:
+        start = time.perf_counter()
+        try:
+            result = self.backends[name].complete_json_sync(system, user, schema)
+        except Exception:
+            self.stats[name].record(time.perf_counter() - start, ok=False)
+            raise
+        self.stats[name].record(time.perf_counter() - start, ok=True)
+        return result
+
+    async def _hedged(self, primary: str, secondary: str, delay: float, system: str, user: str,
+                      schema: Schema = None) -> dict:
+        """Start on the primary; if it hasn't answered within `delay`, race the secondary against it."""
+        first = asyncio.create_task(self._call(primary, system, user, schema))
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            if first.exception() is None:
+                return first.result()
+            return await self._call(secondary, system, user, schema)
+
+        print(f"[ROUTER] {primary} slower than its p95 ({delay:.2f}s); hedging with {secondary}")
+        pending = {first, asyncio.create_task(self._call(secondary, system, user, schema))}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    return task.result()
+                error = task.exception()
+        raise error
+
+    async def complete_json(self, system: str, user: str, schema: Schema = None) -> dict:
+        """
+        Run a JSON completion on the healthiest provider, failing over on errors.
+        Args:
+            system (str): The system prompt.
+            user (str): The user prompt.
+            schema (Schema): Optional response schema, enforced by the provider and validated.
+        Returns:
+            dict: The parsed JSON response.
+        """
+        candidates = self.ranked()
+        errors = []
+        while candidates:
+            primary = candidates.pop(0)
+            delay = self._hedge_delay(primary) if self.hedge and candidates else None
+            try:
+                if delay is not None:
+                    secondary = candidates.pop(0)
+                    return await self._hedged(primary, secondary, delay, system, user, schema)
+                return await self._call(primary, system, user, schema)
+            except Exception as e:
+                errors.append(f"{primary}: {e}")
+                if candidates:
+                    print(f"[ROUTER] {primary} failed ({e}); failing over to {candidates[0]}")
+        raise RuntimeError(f"All LLM providers failed: {'; '.join(errors)}")
+
+    def complete_json_sync(self, system: str, user: str, schema: Schema = None) -> dict:
+        """
+        Blocking version of complete_json, with failover but no hedging.
+        Args:
+            system (str): The system prompt.
+            user (str): The user prompt.
+            schema (Schema): Optional response schema, enforced by the provider and validated.
+        Returns:
+            dict: The parsed JSON response.
+        """
+        errors = []
+        candidates = self.ranked()
+        for index, name in enumerate(candidates):
+            try:
+                return self._call_sync(name, system, user, schema)
+            except Exception as e:
+                errors.append(f"{name}: {e}")
+                if index + 1 < len(candidates):
+                    print(f"[ROUTER] {name} failed ({e}); failing over to {candidates[index + 1]}")
+        raise RuntimeError(f"All LLM providers failed: {'; '.join(errors)}")
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-provider routing statistics"""
+        stats = {}
+        for name in self.order:
+            provider = self.stats[name]
+            p50, p95 = provider.percentile(0.5), provider.percentile(0.95)
+            stats[name] = {
+                "p50_ms": round(p50 * 1000) if p50 is not None else None,
+                "p95_ms": round(p95 * 1000) if p95 is not None else None,
+                "error_rate": round(provider.error_rate(), 3),
+                "samples": len(provider.samples),
+                "available": provider.available()
+            }
+        return stats
+
+def _build_backends(providers: List[str]) -> Dict[str, Any]:
+    """Backends for the configured providers that have credentials."""
+    backends = {}
+    for name in providers:
+        try:
+            if name == "vertex_ai":
+                if not os.getenv("GOOGLE_APPLICATION_CREDENTIALS"):
+                    continue
+                from src.llm_provider.verifier_llms import VertexAIVerifier
+                if VertexAIVerifier is not None:
+                    backends[name] = VertexAIVerifier()
+            elif name in PROVIDER_DEFAULTS and os.getenv(PROVIDER_DEFAULTS[name][1]):
+                backends[name] = get_llm_client(name)
+        except Exception as e:
+            print(f"[WARN] Router: {name} unavailable: {e}")
+    return backends
+
+_router = None
+_router_lock = threading.Lock()
+
+def get_llm_router() -> LLMRouter:
+    """Get or create the global router over LLM_ROUTER_PROVIDERS that have credentials"""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = LLMRouter(_build_backends(ROUTER_PROVIDERS))
+    return _router
+
+def get_router_stats() -> Optional[Dict[str, Dict[str, Any]]]:
+    """Routing statistics, or None if the router has not been used yet"""
+    return _router.get_stats() if _router is not None else None
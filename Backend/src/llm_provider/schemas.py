@@ -0,0 +1,198 @@
+"""
+Shared response schemas for LLM outputs
+
+Each schema is defined once, as JSON Schema, and used two ways:
+- sent to the provider's native structured-output mode (OpenAI and Mistral
+  `json_schema` response formats, Gemini/Vertex `response_schema`, a forced
+  Claude tool call), so the model cannot return malformed or off-shape JSON,
+- checked by a validator compiled from the same definition when the response is
+  parsed, so every provider's output is held to the same contract.
+
+The definitions use the subset every provider accepts in strict mode: objects
+list all their properties as required and allow no others, optional values are
+nullable instead of missing, and free-form objects are not used.
+"""
+
+from typing import Any, Callable, Dict
+from src.llm_provider.json_recovery import recover_json
+
+class SchemaError(ValueError):
+    """Raised when a response does not match its schema"""
+
+JSON_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "boolean": bool,
+    "integer": int,
+    "number": (int, float),
+    "null": type(None),
+}
+
+def _compile(definition: dict, path: str = "$") -> Callable[[Any], None]:
+    """Build a checker for one schema node; raises SchemaError on the first mismatch."""
+    types = definition.get("type")
+    types = [types] if isinstance(types, str) else list(types or [])
+    python_types = tuple(JSON_TYPES[name] for name in types)
+    # bool is an int subclass, but JSON true is not a number
+    allow_bool = "boolean" in types
+    enum = definition.get("enum")
+
+    properties = {name: _compile(sub, f"{path}.{name}") for name, sub in definition.get("properties", {}).items()}
+    required = definition.get("required", [])
+    closed = definition.get("additionalProperties") is False
+    items = _compile(definition["items"], f"{path}[]") if "items" in definition else None
+
+    def check(value):
+        if python_types and (not isinstance(value, python_types) or isinstance(value, bool) and not allow_bool):
+            raise SchemaError(f"{path}: expected {'/'.join(types)}, got {type(value).__name__}")
+        if enum is not None and value not in enum:
+            raise SchemaError(f"{path}: {value!r} is not one of {enum}")
+        if isinstance(value, dict):
+            for name in required:
+                if name not in value:
+                    raise SchemaError(f"{path}: missing '{name}'")
+            for name, item in value.items():
+                checker = properties.get(name)
+                if checker is not None:
+                    checker(item)
+                elif closed:
+                    raise SchemaError(f"{path}: unexpected '{name}'")
+        elif isinstance(value, list) and items is not None:
+            for item in value:
+                items(item)
+
+    return check
+
+def _gemini(definition: dict) -> dict:
+    """Translate a JSON Schema node into the OpenAPI subset Gemini and Vertex AI accept"""
+    node = {}
+    types = definition.get("type")
+    types = [types] if isinstance(types, str) else list(types or [])
+    if "null" in types:
+        node["nullable"] = True
+        types.remove("null")
+    if types:
+        node["type"] = types[0].upper()
+    for key in ("description", "enum", "required"):
+        if key in definition:
+            node[key] = definition[key]
+    if "properties" in definition:
+        node["properties"] = {name: _gemini(sub) for name, sub in definition["properties"].items()}
+    if "items" in definition:
+        node["items"] = _gemini(definition["items"])
+    return node
+
+class Schema:
+    """A named response schema with a compiled validator"""
+
+    def __init__(self, name: str, definition: dict, description: str = ""):
+        """
+        Args:
+            name: Identifier sent to the provider (letters, digits, underscores)
+            definition: JSON Schema of the response
+            description: What the response contains; used where providers ask for one
+        """
+        self.name = name
+        self.definition = definition
+        self.description = description
+        self._check = _compile(definition)
+        self.gemini = _gemini(definition)
+
+    def validate(self, value: Any) -> Any:
+        """
+        Check a parsed response against the schema.
+
+        Args:
+            value: Parsed JSON value
+
+        Returns:
+            The value, unchanged
+
+        Raises:
+            SchemaError: If the value does not match
+        """
+        self._check(value)
+        return value
+
+    def is_valid(self, value: Any) -> bool:
+        """True if the value matches the schema"""
+        try:
+            self._check(value)
+        except SchemaError:
+            return False
+        return True
+
+    def parse(self, text: str) -> Any:
+        """
+        Parse and validate a response.
+
+        Args:
+            text: Raw response text
+
+        Returns:
+            The parsed value
+
+        Raises:
+            json.JSONDecodeError: If no JSON could be recovered
+            SchemaError: If the JSON does not match the schema
+        """
+        return self.validate(recover_json(text))
+
+    def __repr__(self):
+        return f"Schema({self.name!r})"
+
+def _object(properties: Dict[str, dict]) -> dict:
+    return {"type": "object", "properties": properties, "required": list(properties), "additionalProperties": False}
+
+def _array(items: dict) -> dict:
+    return {"type": "array", "items": items}
+
+STRING = {"type": "string"}
+BOOLEAN = {"type": "boolean"}
+STRINGS = _array(STRING)
+
+MATCHED_RULE = _object({
+    "rule": {"type": "string", "description": "The rule text, or its id when rules are listed with ids"},
+    "is_relevant": BOOLEAN,
+    "reason": STRING,
+})
+
+_VERIFICATION_FIELDS = {
+    "is_compliant": BOOLEAN,
+    "matched_rules": _array(MATCHED_RULE),
+    "final_reason": STRING,
+    "Section": STRING,
+}
+
+VERIFICATION = Schema("clause_verification", _object({"clause": STRING, **_VERIFICATION_FIELDS}),
+                      "Compliance verdict for one clause against its candidate rules")
+
+BATCH_RESULT = Schema("clause_verification_result", _object({"clause_id": STRING, **_VERIFICATION_FIELDS}))
+
+VERIFICATION_BATCH = Schema("clause_verification_batch", _object({"results": _array(BATCH_RESULT.definition)}),
+                            "Compliance verdicts for several clauses, one result per clause")
+
+CLAUSES = Schema("clauses", _object({
+    "Clauses": _array(_object({"clause_id": STRING, "text_en": STRING}))
+}), "Clauses extracted from a document")
+
+TIMELINES = Schema("timelines", _object({
+    "Timelines": _array(_object({
+        "start": STRING,
+        "end": {"type": ["string", "null"]},
+        "description": STRING,
+    }))
+}), "Chronological timeline entries extracted from a document")
+
+CLAUSE_REVIEW = Schema("clause_review", _object({
+    "compliant": BOOLEAN,
+    "confidence": {"type": "number"},
+    "explanation": STRING,
+    "risk_level": {"type": "string", "enum": ["LOW", "MEDIUM", "HIGH"]},
+    "risk_category": {"type": "string", "enum": ["LEGAL", "FINANCIAL", "OPERATIONAL", "REPUTATIONAL"]},
+    "violated_regulations": STRINGS,
+    "recommendations": STRINGS,
+    "affected_parties": STRINGS,
+    "timeline": STRING,
+}), "Detailed compliance review of one clause")
@@ -3,10 +3,10 @@ LLM Verifier Providers
 Multi-provider support for compliance verification
 """
 
-from .claude_verifier import verify_with_claude
-from .gemini_verifier import verify_with_gemini
-from .openai_verifier import verify_with_openai
-from .mistral_verifier import verify_with_mistral
+from .claude_verifier import verify_with_claude, averify_with_claude
+from .gemini_verifier import verify_with_gemini, averify_with_gemini
+from .openai_verifier import verify_with_openai, averify_with_openai
+from .mistral_verifier import verify_with_mistral, averify_with_mistral
 
 try:
     from .vertex_ai_verifier import VertexAIVerifier
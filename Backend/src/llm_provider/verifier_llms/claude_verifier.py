@@ -2,31 +2,32 @@
 Claude Verifier
 
 This module provides functionality to verify compliance using the Claude LLM.
+The shared, pooled Claude client comes from src.llm_provider.llm_clients.
 """
 
-from src.llm_provider.safe_json_helper import safe_json_response
-from anthropic import Anthropic
-import os
-from dotenv import load_dotenv
+from src.llm_provider.llm_clients import get_llm_client
+from src.llm_provider.schemas import Schema
 
-load_dotenv() 
-
-def verify_with_claude(system_prompt: str, user_prompt: str) -> dict:
+def verify_with_claude(system_prompt: str, user_prompt: str, schema: Schema = None) -> dict:
     """
     Verify compliance using the Claude LLM.
     Args:
         system_prompt (str): The system prompt to guide the LLM.
         user_prompt (str): The user prompt containing the query.
+        schema (Schema): Optional response schema, enforced by the provider and validated.
     Returns:
         dict: The verification result from the LLM.
     """
-    llm_client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+    return get_llm_client("claude").complete_json_sync(system_prompt, user_prompt, schema)
 
-    response = llm_client.messages.create(
-        model="claude-3-opus-20240229",
-        max_tokens=1000,
-        system=system_prompt,
-        messages=[{"role": "user", "content": user_prompt}]
-    )
-    raw = response.content[0].text
-    return safe_json_response(raw)
+async def averify_with_claude(system_prompt: str, user_prompt: str, schema: Schema = None) -> dict:
+    """
+    Verify compliance using the Claude LLM without blocking the event loop.
+    Args:
+        system_prompt (str): The system prompt to guide the LLM.
+        user_prompt (str): The user prompt containing the query.
+        schema (Schema): Optional response schema, enforced by the provider and validated.
+    Returns:
+        dict: The verification result from the LLM.
+    """
+    return await get_llm_client("claude").complete_json(system_prompt, user_prompt, schema)
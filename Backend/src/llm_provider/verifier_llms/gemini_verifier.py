@@ -2,26 +2,32 @@
 Gemini Verifier
 
 This module provides functionality to verify compliance using the Gemini LLM.
+The shared, pooled Gemini client comes from src.llm_provider.llm_clients.
 """
 
-from src.llm_provider.safe_json_helper import safe_json_response
-import google.generativeai as genai
-from dotenv import load_dotenv
-import os
+from src.llm_provider.llm_clients import get_llm_client
+from src.llm_provider.schemas import Schema
 
-load_dotenv()
-
-def verify_with_gemini(system_prompt: str, user_prompt: str) -> dict:
+def verify_with_gemini(system_prompt: str, user_prompt: str, schema: Schema = None) -> dict:
     """
     Verify compliance using the Gemini LLM.
     Args:
         system_prompt (str): The system prompt to guide the LLM.
         user_prompt (str): The user prompt containing the query.
+        schema (Schema): Optional response schema, enforced by the provider and validated.
+    Returns:
+        dict: The verification result from the LLM.
+    """
+    return get_llm_client("gemini").complete_json_sync(system_prompt, user_prompt, schema)
+
+async def averify_with_gemini(system_prompt: str, user_prompt: str, schema: Schema = None) -> dict:
+    """
+    Verify compliance using the Gemini LLM without blocking the event loop.
+    Args:
+        system_prompt (str): The system prompt to guide the LLM.
+        user_prompt (str): The user prompt containing the query.
+        schema (Schema): Optional response schema, enforced by the provider and validated.
     Returns:
         dict: The verification result from the LLM.
     """
-    genai.configure(api_key=os.getenv("GEMINI_API_KEY_2"))
-    model = genai.GenerativeModel("gemini-2.5-flash")
-    response = model.generate_content(system_prompt + "\n" + user_prompt)
-    raw = response.text
-    return safe_json_response(raw)
+    return await get_llm_client("gemini").complete_json(system_prompt, user_prompt, schema)
@@ -2,32 +2,32 @@
 Mistral Verifier
 
 This module provides functionality to verify compliance using the Mistral LLM.
+The shared, pooled Mistral client comes from src.llm_provider.llm_clients.
 """
 
-from src.llm_provider.safe_json_helper import safe_json_response
-from mistralai.client import MistralClient
-import os
-from dotenv import load_dotenv
+from src.llm_provider.llm_clients import get_llm_client
+from src.llm_provider.schemas import Schema
 
-load_dotenv()
-
-def verify_with_mistral(system_prompt: str, user_prompt: str) -> dict:
+def verify_with_mistral(system_prompt: str, user_prompt: str, schema: Schema = None) -> dict:
     """
     Verify compliance using the Mistral LLM.
     Args:
         system_prompt (str): The system prompt to guide the LLM.
         user_prompt (str): The user prompt containing the query.
+        schema (Schema): Optional response schema, enforced by the provider and validated.
     Returns:
         dict: The verification result from the LLM.
     """
-    llm_client = MistralClient(api_key=os.getenv("MISTRAL_API_KEY"))
+    return get_llm_client("mistral").complete_json_sync(system_prompt, user_prompt, schema)
 
-    response = llm_client.chat(
-        model="mistral-large",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt + "\nReturn ONLY valid JSON."}
-        ]
-    )
-    raw = response["choices"][0]["message"]["content"]
-    return safe_json_response(raw)
+async def averify_with_mistral(system_prompt: str, user_prompt: str, schema: Schema = None) -> dict:
+    """
+    Verify compliance using the Mistral LLM without blocking the event loop.
+    Args:
+        system_prompt (str): The system prompt to guide the LLM.
+        user_prompt (str): The user prompt containing the query.
+        schema (Schema): Optional response schema, enforced by the provider and validated.
+    Returns:
+        dict: The verification result from the LLM.
+    """
+    return await get_llm_client("mistral").complete_json(system_prompt, user_prompt, schema)
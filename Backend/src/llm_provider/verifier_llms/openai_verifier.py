@@ -2,32 +2,32 @@
 OpenAI Verifier
 
 This module provides functionality to verify compliance using the OpenAI LLM.
+The shared, pooled OpenAI client comes from src.llm_provider.llm_clients.
 """
 
-import json
-import os
-from openai import OpenAI
-from dotenv import load_dotenv
+from src.llm_provider.llm_clients import get_llm_client
+from src.llm_provider.schemas import Schema
 
-load_dotenv()
-
-def verify_with_openai(system_prompt: str, user_prompt: str) -> dict:
+def verify_with_openai(system_prompt: str, user_prompt: str, schema: Schema = None) -> dict:
     """
     Verify compliance using the OpenAI LLM.
     Args:
         system_prompt (str): The system prompt to guide the LLM.
         user_prompt (str): The user prompt containing the query.
+        schema (Schema): Optional response schema, enforced by the provider and validated.
     Returns:
         dict: The verification result from the LLM.
     """
-    llm_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return get_llm_client("openai").complete_json_sync(system_prompt, user_prompt, schema)
 
-    response = llm_client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
-        response_format={"type": "json_object"}
-    )
-    return json.loads(response.choices[0].message.content)
\ No newline at end of file
+async def averify_with_openai(system_prompt: str, user_prompt: str, schema: Schema = None) -> dict:
+    """
+    Verify compliance using the OpenAI LLM without blocking the event loop.
+    Args:
+        system_prompt (str): The system prompt to guide the LLM.
+        user_prompt (str): The user prompt containing the query.
+        schema (Schema): Optional response schema, enforced by the provider and validated.
+    Returns:
+        dict: The verification result from the LLM.
+    """
+    return await get_llm_client("openai").complete_json(system_prompt, user_prompt, schema)
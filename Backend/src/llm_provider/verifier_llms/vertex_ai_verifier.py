@@ -1,15 +1,84 @@
 """
 Vertex AI Verifier with Gemini Pro
 Integrates with Google Cloud Vertex AI for production-grade LLM access
+
+Chat histories are kept in a bounded session store as plain messages and a
+ChatSession is rebuilt from them per call, so sessions can expire, be evicted
+or live in an external backend. Calls without a session ID are stateless.
+
+Embeddings reuse one loaded TextEmbeddingModel per model name and are requested
+in batches sized to the service's per-request limits, several batches at once.
 """
 
+import asyncio
 import os
 import json
-from typing import Any, Dict, List
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, List
+from src.extraction.chunking import estimate_tokens
+from src.llm_provider.rate_limiter import get_rate_limiter
+from src.llm_provider.json_recovery import recover_json
+from src.llm_provider.llm_clients import LLM_TIMEOUT_SECONDS, json_generation_config
+from src.llm_provider.schemas import CLAUSE_REVIEW, Schema, SchemaError
+from src.storage.session_store import get_session_store
 from google.cloud import aiplatform
-from vertexai.generative_models import GenerativeModel, ChatSession
+from vertexai.generative_models import Content, GenerativeModel, Part
 import vertexai
 
+# Messages (user and model turns) kept per chat session
+CHAT_MAX_MESSAGES = int(os.getenv("VERTEX_CHAT_MAX_MESSAGES", "20"))
+
+EMBEDDING_MODEL = os.getenv("VERTEX_EMBEDDING_MODEL", "textembedding-gecko@003")
+# Per-request limits of the embeddings API: texts per request, total input tokens
+# per request, and tokens per text (longer texts are truncated by the service)
+EMBED_MAX_TEXTS_PER_REQUEST = int(os.getenv("VERTEX_EMBED_MAX_TEXTS_PER_REQUEST", "250"))
+EMBED_MAX_TOKENS_PER_REQUEST = int(os.getenv("VERTEX_EMBED_MAX_TOKENS_PER_REQUEST", "20000"))
+EMBED_MAX_TOKENS_PER_TEXT = 2048
+# Embedding requests in flight at once for one get_embeddings call
+EMBED_CONCURRENCY = int(os.getenv("VERTEX_EMBED_CONCURRENCY", "4"))
+
+# generate_content takes no timeout, so blocking calls wait here and a hung one is abandoned
+_sync_calls = ThreadPoolExecutor(thread_name_prefix="vertex-call")
+
+# model name -> loaded TextEmbeddingModel, shared by every verifier
+_embedding_models: Dict[str, Any] = {}
+_embedding_models_lock = threading.Lock()
+
+def _get_embedding_model(model_name: str):
+    """Load a TextEmbeddingModel once and reuse it"""
+    model = _embedding_models.get(model_name)
+    if model is None:
+        with _embedding_models_lock:
+            model = _embedding_models.get(model_name)
+            if model is None:
+                from vertexai.language_models import TextEmbeddingModel
+                model = _embedding_models[model_name] = TextEmbeddingModel.from_pretrained(model_name)
+    return model
+
+def _embedding_batches(texts: List[str]) -> List[tuple]:
+    """
+    Split texts into request-sized batches, in order.
+
+    Args:
+        texts: Texts to embed
+
+    Returns:
+        (start, end, estimated tokens) of each batch, within the per-request text and token limits
+    """
+    batches = []
+    start = tokens = 0
+    for i, text in enumerate(texts):
+        text_tokens = min(estimate_tokens(text), EMBED_MAX_TOKENS_PER_TEXT)
+        if i > start and (i - start >= EMBED_MAX_TEXTS_PER_REQUEST or tokens + text_tokens > EMBED_MAX_TOKENS_PER_REQUEST):
+            batches.append((start, i, tokens))
+            start, tokens = i, 0
+        tokens += text_tokens
+    if start < len(texts):
+        batches.append((start, len(texts), tokens))
+    return batches
+
 
 class VertexAIVerifier:
     """
@@ -28,12 +97,18 @@ class VertexAIVerifier:
         self.project_id = project_id or os.getenv("GCP_PROJECT_ID", "reglex-ai")
         self.location = location
         self.model_name = "gemini-1.5-pro"
+        # Per-request timeout of router completions, as for the other LLM clients
+        self.timeout = LLM_TIMEOUT_SECONDS
+        self.embedding_model_name = EMBEDDING_MODEL
+        # Latency of the last get_embeddings call
+        self.embedding_stats: Dict[str, Any] = {}
         
         # Initialize Vertex AI
         try:
             vertexai.init(project=self.project_id, location=self.location)
             self.model = GenerativeModel(self.model_name)
-            self.chat_sessions = {}  # Store chat sessions for conversational context
+            # Chat histories by session ID, for conversational context
+            self.chat_sessions = get_session_store("vertex_chats")
             print(f"✅ Vertex AI initialized: {self.project_id} in {self.location}")
         except Exception as e:
             print(f"⚠️ Vertex AI initialization error: {e}")
@@ -60,20 +135,15 @@ class VertexAIVerifier:
             # Build prompt
             prompt = self._build_verification_prompt(clause, retrieved_rules, chat_history)
             
-            # Get or create chat session for conversational context
-            session_id = clause.get('session_id', 'default')
-            
-            if session_id not in self.chat_sessions or not chat_history:
-                # Create new chat session
-                self.chat_sessions[session_id] = self.model.start_chat()
+            # Continue the clause's chat session only in a multi-turn dialogue; otherwise
+            # the call is stateless, so unrelated requests never share a chat
+            session_id = clause.get('session_id') if chat_history else None
             
-            chat_session = self.chat_sessions[session_id]
-            
-            # Send message to Vertex AI
-            response = chat_session.send_message(prompt)
+            # Send message to Vertex AI; the response schema makes the model return CLAUSE_REVIEW JSON
+            response_text = self._send(session_id, prompt, generation_config=json_generation_config(CLAUSE_REVIEW))
             
             # Parse response
-            result = self._parse_response(response.text, clause)
+            result = self._parse_response(response_text, clause)
             
             return result
             
@@ -141,16 +211,7 @@ Respond ONLY with valid JSON."""
     def _parse_response(self, response_text: str, clause: Dict[str, Any]) -> Dict[str, Any]:
         """Parse Vertex AI response into structured format."""
         try:
-            # Extract JSON from response
-            response_text = response_text.strip()
-            
-            # Handle markdown code blocks
-            if "```json" in response_text:
-                response_text = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                response_text = response_text.split("```")[1].split("```")[0].strip()
-            
-            result = json.loads(response_text)
+            result = CLAUSE_REVIEW.parse(response_text)
             
             # Add metadata
             result["clause_id"] = clause.get("id", "unknown")
@@ -159,7 +220,7 @@ Respond ONLY with valid JSON."""
             
             return result
             
-        except json.JSONDecodeError as e:
+        except (json.JSONDecodeError, SchemaError) as e:
             print(f"⚠️ JSON parse error: {e}")
             print(f"Response: {response_text[:500]}")
             
@@ -174,33 +235,186 @@ Respond ONLY with valid JSON."""
                 "raw_response": response_text
             }
 
-    def chat(self, message: str, session_id: str = "default") -> str:
+    def complete_json_sync(self, system: str, user: str, schema: Schema = None) -> dict:
+        """
+        Provider-agnostic JSON completion, matching the LLMClient interface.
+
+        Args:
+            system: System prompt
+            user: User prompt
+            schema: Optional response schema, enforced through response_schema and validated
+
+        Returns:
+            Parsed JSON response
+        """
+        response = self._limiter().run_sync(
+            lambda: _sync_calls.submit(
+                self.model.generate_content, system + "\n" + user, generation_config=json_generation_config(schema)
+            ).result(timeout=self.timeout),
+            estimate_tokens(system) + estimate_tokens(user)
+        )
+        return schema.parse(response.text) if schema is not None else recover_json(response.text)
+
+    async def complete_json(self, system: str, user: str, schema: Schema = None) -> dict:
+        """
+        Async provider-agnostic JSON completion, matching the LLMClient interface.
+
+        Args:
+            system: System prompt
+            user: User prompt
+            schema: Optional response schema, enforced through response_schema and validated
+
+        Returns:
+            Parsed JSON response
+        """
+        response = await self._limiter().run(
+            lambda: asyncio.wait_for(
+                self.model.generate_content_async(system + "\n" + user, generation_config=json_generation_config(schema)),
+                timeout=self.timeout
+            ),
+            estimate_tokens(system) + estimate_tokens(user)
+        )
+        return schema.parse(response.text) if schema is not None else recover_json(response.text)
+
+    def _limiter(self):
+        return get_rate_limiter("vertex_ai", self.project_id, "VERTEX_AI")
+
+    def _send(self, session_id: str, message: str, **kwargs) -> str:
+        """
+        Send a message in a chat session, rebuilt from its stored history.
+
+        Args:
+            session_id: Chat session identifier; None sends without history
+            message: Message to send
+            **kwargs: Passed to ChatSession.send_message, e.g. generation_config
+
+        Returns:
+            Response text
+        """
+        if session_id is None:
+            return self.model.start_chat().send_message(message, **kwargs).text
+
+        # The session lock keeps concurrent turns of one conversation from interleaving
+        with self.chat_sessions.session(session_id, list) as messages:
+            response = self._chat_session(messages).send_message(message, **kwargs)
+            self._record_turn(messages, message, response.text)
+        return response.text
+
+    def _chat_session(self, messages: List[Dict[str, str]]):
+        """Start a ChatSession continuing the stored messages."""
+        return self.model.start_chat(history=[
+            Content(role=item["role"], parts=[Part.from_text(item["text"])]) for item in messages
+        ])
+
+    @staticmethod
+    def _record_turn(messages: List[Dict[str, str]], message: str, answer: str):
+        messages.extend([{"role": "user", "text": message}, {"role": "model", "text": answer}])
+        del messages[:-CHAT_MAX_MESSAGES]
+
+    @staticmethod
+    async def _stream_text(chat_session, message: str) -> AsyncIterator[str]:
+        responses = await chat_session.send_message_async(message, stream=True)
+        async for chunk in responses:
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunks without text, e.g. the final one carrying only the finish reason
+                continue
+            if text:
+                yield text
+
+    async def chat_stream(self, message: str, session_id: str = None) -> AsyncIterator[str]:
+        """
+        Streaming version of chat: yields the answer in fragments as they are generated.
+        The turn is added to the session history once the stream completes; an
+        abandoned stream leaves the history unchanged.
+
+        Args:
+            message: User question
+            session_id: Chat session identifier; without one the message is answered without history
+
+        Yields:
+            Text fragments of the answer
+        """
+        if session_id is None:
+            async for text in self._stream_text(self.model.start_chat(), message):
+                yield text
+            return
+
+        async with self.chat_sessions.asession(session_id, list) as messages:
+            fragments = []
+            async for text in self._stream_text(self._chat_session(messages), message):
+                fragments.append(text)
+                yield text
+            self._record_turn(messages, message, "".join(fragments))
+
+    def chat(self, message: str, session_id: str = None) -> str:
         """
         Conversational interface for asking follow-up questions.
         
         Args:
             message: User question
-            session_id: Chat session identifier
+            session_id: Chat session identifier; without one the message is answered without history
             
         Returns:
             AI response
         """
         try:
-            if session_id not in self.chat_sessions:
-                self.chat_sessions[session_id] = self.model.start_chat()
-            
-            chat_session = self.chat_sessions[session_id]
-            response = chat_session.send_message(message)
-            
-            return response.text
+            return self._send(session_id, message)
             
         except Exception as e:
             return f"Error in chat: {str(e)}"
 
-    def clear_session(self, session_id: str = "default"):
+    def clear_session(self, session_id: str):
         """Clear a chat session."""
-        if session_id in self.chat_sessions:
-            del self.chat_sessions[session_id]
+        with self.chat_sessions.lock(session_id):
+            self.chat_sessions.delete(session_id)
+
+    def get_embeddings(self, texts: List[str], max_workers: int = EMBED_CONCURRENCY) -> List[List[float]]:
+        """
+        Get embeddings for many texts using Vertex AI.
+
+        Texts are sent in batches within the per-request limits, up to max_workers
+        batches at a time under the embeddings rate limiter. Suitable for bulk
+        corpus embedding; the default model returns 768-dimensional vectors, like LegalBERT.
+
+        Args:
+            texts: Texts to embed
+            max_workers: Batches requested concurrently
+
+        Returns:
+            One embedding per text, in input order
+        """
+        if not texts:
+            return []
+        model = _get_embedding_model(self.embedding_model_name)
+        limiter = get_rate_limiter("vertex_ai_embeddings", self.project_id, "VERTEX_AI_EMBEDDINGS")
+        batches = _embedding_batches(texts)
+
+        def embed(batch):
+            start, end, tokens = batch
+            began = time.perf_counter()
+            embeddings = limiter.run_sync(lambda: model.get_embeddings(texts[start:end]), tokens)
+            return [embedding.values for embedding in embeddings], time.perf_counter() - began
+
+        began = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as executor:
+            results = list(executor.map(embed, batches))
+        elapsed = time.perf_counter() - began
+
+        latencies = sorted(latency for _, latency in results)
+        self.embedding_stats = {
+            "texts": len(texts),
+            "requests": len(batches),
+            "seconds": round(elapsed, 3),
+            "texts_per_second": round(len(texts) / elapsed, 1) if elapsed else None,
+            "request_p50_seconds": round(latencies[len(latencies) // 2], 3),
+            "request_max_seconds": round(latencies[-1], 3),
+        }
+        print(f"[EMBED] {len(texts)} texts in {len(batches)} requests: {elapsed:.2f}s "
+              f"(request p50 {self.embedding_stats['request_p50_seconds']:.2f}s, "
+              f"max {self.embedding_stats['request_max_seconds']:.2f}s)")
+        return [values for batch_values, _ in results for values in batch_values]
 
     def get_embedding(self, text: str) -> List[float]:
         """
@@ -208,13 +422,7 @@ Respond ONLY with valid JSON."""
         Useful for custom semantic search implementations.
         """
         try:
-            from vertexai.language_models import TextEmbeddingModel
-            
-            embedding_model = TextEmbeddingModel.from_pretrained("textembedding-gecko@003")
-            embeddings = embedding_model.get_embeddings([text])
-            
-            return embeddings[0].values
-            
+            return self.get_embeddings([text])[0]
         except Exception as e:
             print(f"⚠️ Embedding error: {e}")
             return []
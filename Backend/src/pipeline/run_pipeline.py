@@ -1,13 +1,25 @@
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from contextlib import asynccontextmanager
-from src.extraction.extract_pipeline import _extract_text_from_pdf
-from src.summerizer.llm_client import generate_summary
+from src.extraction.extract_pipeline import iter_pdf_pages, shutdown_process_pool, extraction_version
+from src.extraction.clause_segmenter import ClauseSegmenter
+from src.summerizer.llm_client import generate_summary_streaming
+from src.summerizer.summary_cache import SummaryCache
 from src.storage.gcs_client import get_gcs_client
+from src.storage.diagnostics import DiagnosticsCapture
+from src.jobs import get_analysis_job_manager, shutdown_analysis_jobs
 # from src.anomaly_detector.ano_detector_agent import anomaly_detection_pipeline
-from src.compliance_checker.compliance_agent import ComplianceAgent
+from src.compliance_checker.compliance_agent import ComplianceAgent, count_verdicts
+from src.compliance_checker.conversational_agent import ConversationalComplianceAgent
+from src.compliance_checker.regulation_retriever import RegulationRetriever
+from src.llm_provider.llm_clients import close_llm_clients
+from src.llm_provider.router import get_router_stats
+from src.llm_provider.json_recovery import extract_json_text
 import traceback
-import re
+import asyncio
+import hashlib
 import json
 import numpy as np
 from fastapi.encoders import jsonable_encoder
@@ -27,24 +39,36 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def clean_json_string(json_str: str) -> str:
-    """Clean JSON string by removing invalid control characters and fixing common issues"""
-    # Remove markdown code blocks
-    json_str = json_str.replace("```json", "").replace("```", "").strip()
-    
-    
-    # Remove or replace control characters (except \n, \r, \t which are valid in JSON strings)
-    import string
-    valid_chars = string.printable + '\n\r\t'
-    cleaned = ''.join(char if char in valid_chars else ' ' for char in json_str)
-    
-    # Fix common JSON issues
-    cleaned = re.sub(r',\s*([}\]])', r'\1', cleaned)
-    
-    # Remove any non-printable characters that might remain
-    cleaned = ''.join(char if ord(char) >= 32 or char in '\n\r\t' else ' ' for char in cleaned)
-    
-    return cleaned.strip()
+JSON_ENCODERS = {
+    np.bool_: bool,
+    np.int64: int,
+    np.float64: float
+}
+# Seconds between SSE heartbeats while a processing stage is running
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+# Streamed uploads keep processing after a client disconnects; hold references until done
+_background_tasks = set()
+# Conversational agent behind the chat endpoint, created on first use
+_chat_agent = None
+# Clear-all purge running in the background; clients poll /api/dashboard/clear-all/status
+_purge_task = None
+
+def _collect_pages(pages, sink: list):
+    """Pass streamed pages through while keeping a copy for the extraction artifact"""
+    for page in pages:
+        sink.append(page)
+        yield page
+
+def _drain(pages):
+    """Consume whatever the summarizer left of a page stream"""
+    for _ in pages:
+        pass
+
+def _source_hash(content: bytes) -> str:
+    """Summary cache key of an uploaded PDF; the summarized text also depends on how it was extracted"""
+    digest = hashlib.sha256(content)
+    digest.update(extraction_version().encode("utf-8"))
+    return digest.hexdigest()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -57,6 +81,13 @@ async def lifespan(app: FastAPI):
         # Verify GCS configuration
         gcs_client = get_gcs_client()
         logger.info(f"[OK] GCS client initialized with bucket: {gcs_client.bucket_name}")
+
+        # Pick up batch analysis jobs interrupted by the last shutdown
+        try:
+            resumed = get_analysis_job_manager().resume()
+            logger.info(f"[OK] Analysis job manager ready ({resumed} jobs resumed)")
+        except Exception as e:
+            logger.warning(f"[WARN] Could not resume analysis jobs: {e}")
         yield
     except Exception as e:
         logger.error(f"[ERROR] Startup error: {e}\n{traceback.format_exc()}")
@@ -66,6 +97,9 @@ async def lifespan(app: FastAPI):
         logger.info("[SHUTDOWN] Application shutting down...")
         print("[STOP] FastAPI application shutting down...")
         try:
+            shutdown_analysis_jobs()
+            shutdown_process_pool()
+            await close_llm_clients()
             logger.info("[OK] Cleanup completed")
         except Exception as e:
             logger.error(f"[ERROR] Cleanup error: {e}")
@@ -81,6 +115,8 @@ app = FastAPI(
 # Add CORS middleware for frontend integration
 environment = os.getenv("ENVIRONMENT", "production")
 frontend_url = os.getenv("FRONTEND_URL", "")
+# "local": clauses come from the rule-based segmenter; "llm": from the Gemini clause stage
+clause_source = os.getenv("CLAUSE_SOURCE", "local").lower()
 
 cors_origins = [
     # Local development
@@ -125,7 +161,8 @@ async def root():
         "endpoints": [
             {"path": "/", "method": "GET", "description": "API information"},
             {"path": "/health", "method": "GET", "description": "Health check"},
-            {"path": "/upload-pdf/", "method": "POST", "description": "Upload PDF for analysis"}
+            {"path": "/upload-pdf/", "method": "POST", "description": "Upload PDF for analysis"},
+            {"path": "/upload-pdf/stream", "method": "POST", "description": "Upload PDF for analysis, streaming progress events (SSE)"}
         ]
     }
 
@@ -151,173 +188,263 @@ async def health_check():
             "version": "1.0.0"
         }
 
-@app.post("/upload-pdf/")
-async def run_backend(file: UploadFile = File(...), lang: Optional[str] = Form(None)):
-    document_id = f"doc_{uuid.uuid4().hex[:12]}_{int(datetime.now().timestamp())}"
+def _no_emit(event: str, data: Dict[str, Any]):
+    pass
+
+def _new_document_id() -> str:
+    return f"doc_{uuid.uuid4().hex[:12]}_{int(datetime.now().timestamp())}"
+
+async def _process_document(document_id: str, content: bytes, filename: str, content_type: str,
+                            lang: str, emit=_no_emit) -> Dict[str, Any]:
+    """
+    Extract, summarize, segment and compliance-check an uploaded PDF, storing everything in GCS
+
+    Args:
+        document_id: Identifier of the new document
+        content: PDF bytes
+        filename: Original file name
+        content_type: Upload content type
+        lang: Summary language
+        emit: Called with (event, data) as each stage finishes; may be called from worker threads
+
+    Returns:
+        JSON-ready processing results
+    """
+    diagnostics = DiagnosticsCapture(get_gcs_client(), document_id)
+    try:
+        return await _run_document_stages(document_id, content, filename, content_type, lang, emit, diagnostics)
+    except Exception:
+        diagnostics.add("error", traceback.format_exc())
+        raise
+    finally:
+        # Sampled documents only; uploads in the background
+        diagnostics.flush()
+
+async def _run_document_stages(document_id: str, content: bytes, filename: str, content_type: str,
+                               lang: str, emit, diagnostics: DiagnosticsCapture) -> Dict[str, Any]:
+    """Body of _process_document; artifacts worth debugging are recorded on `diagnostics`"""
+    gcs_client = get_gcs_client()
+    upload_metadata = {
+        "document_id": document_id,
+        "filename": filename,
+        "file_size": len(content),
+        "content_type": content_type,
+        "language": lang,
+        "uploaded_at": datetime.now().isoformat(),
+        "processing_status": "started"
+    }
     
-    logger.info(f"[UPLOAD] Upload request received: file={file.filename}, size={file.size if hasattr(file, 'size') else 'unknown'}, lang={lang}, doc_id={document_id}")
+    logger.info(f"[GCS] Storing metadata for document {document_id}")
+    gcs_client.upload_document_metadata(document_id, upload_metadata)
+    
+    logger.info(f"[GCS] Storing original file for document {document_id}")
+    gcs_client.upload_document_file(document_id, content, filename)
+    emit("uploaded", {"document_id": document_id, "filename": filename, "file_size": len(content)})
+    
+    # Pages are streamed into the summarizer so LLM calls on early pages overlap
+    # extraction of later ones; both are CPU/IO-bound, so keep them off the event loop
+    logger.info(f"[EXTRACT] Streaming text from PDF ({len(content)} bytes)")
+    logger.info(f"[SUMMARY] Generating summary in {lang}")
+    use_local_clauses = clause_source != "llm"
+    extraction_stats, extracted_pages = {}, []
+    # Clauses are segmented from the same page stream, using the headings layout extraction found.
+    # The stored extraction artifact always carries them, whichever clause source is used here
+    segmenter = ClauseSegmenter()
 
-    if lang is None:
-        lang = "English"
-        logger.info(f"[LANG] Using default language: {lang}")
+    def pages_with_progress():
+        for page in _collect_pages(iter_pdf_pages(content, stats=extraction_stats), extracted_pages):
+            segmenter.feed_page(page)
+            emit("page_extracted", {"page": len(extracted_pages)})
+            yield page
+        emit("extracted", {"pages": len(extracted_pages), **extraction_stats})
+
+    pages = pages_with_progress()
+    summary_task = run_in_threadpool(
+        generate_summary_streaming,
+        pages,
+        lang,
+        cache=SummaryCache(gcs_client),
+        source_hash=_source_hash(content),
+        include_clauses=not use_local_clauses
+    )
+    summary = await summary_task
+    # Stages served from the summary cache never read the pages; extraction still has
+    # to finish for its stats, progress events, local clauses and the stored artifact
+    await run_in_threadpool(_drain, pages)
+    segmented_clauses = segmenter.finish()
+    logger.info(f"[CLAUSES] Segmented {len(segmented_clauses)} clauses locally")
+    local_clauses = segmented_clauses if use_local_clauses else None
+    if use_local_clauses:
+        emit("clauses", {"count": len(local_clauses), "source": "local"})
+    if extraction_stats:
+        logger.info(f"[EXTRACT] {extraction_stats['mode']} mode: {extraction_stats['tokens']} tokens "
+                    f"from {extraction_stats['pages']} pages ({extraction_stats['tokens_saved']} saved)")
+        # Stats are only filled once every page was read, so the page list is complete here
+        await run_in_threadpool(lambda: gcs_client.upload_document_extraction(document_id, {
+            "version": extraction_version(),
+            "pages": extracted_pages,
+            "clauses": segmented_clauses,
+            "stats": extraction_stats
+        }, gcs_client.content_md5(content)))
+    logger.info(f"[RESULT] Summary type: {type(summary)}, length: {len(summary)}")
+    
+    diagnostics.add("extraction_stats", extraction_stats)
+    if isinstance(summary, dict):
+        data = summary
+        diagnostics.add("summary", summary)
+    elif isinstance(summary, str):
+        diagnostics.add("summary_raw", summary)
+        clean_json = extract_json_text(summary)
+        diagnostics.add("summary_cleaned", clean_json)
+        try:
+            data = json.loads(clean_json)
+            logger.info("[JSON] Successfully parsed JSON response")
+        except json.JSONDecodeError as e:
+            logger.error(f"[JSON] JSON parsing failed even after cleaning: {e}")
+            logger.error(f"[JSON] Error at position {e.pos}: '{clean_json[max(0, e.pos-10):e.pos+10]}'")
+            diagnostics.add("summary_parse_error", {"error": str(e), "position": e.pos})
+            data = {
+                "Summary": "Error parsing LLM response - using fallback structure",
+                "Clauses": [],
+                "processing_error": str(e),
+                "original_response_length": len(summary)
+            }
+    else:
+        raise TypeError(f"Unexpected summary type: {type(summary)}")
         
-    gcs_client = get_gcs_client()
+    if local_clauses is not None:
+        data["Clauses"] = local_clauses
+    clauses = data.get("Clauses", [])
+    emit("summary", {"summary": data.get("summary", ""), "timelines": data.get("Timelines", {}), "clauses": clauses})
+    logger.info(f"[COMPLIANCE] Processing {len(clauses)} clauses for compliance checking")
     
     try:
-        content = await file.read()
-        upload_metadata = {
-            "document_id": document_id,
-            "filename": file.filename,
-            "file_size": len(content),
-            "content_type": file.content_type,
-            "language": lang,
-            "uploaded_at": datetime.now().isoformat(),
-            "processing_status": "started"
-        }
-        
-        logger.info(f"[GCS] Storing metadata for document {document_id}")
-        gcs_client.upload_document_metadata(document_id, upload_metadata)
-        
-        logger.info(f"[GCS] Storing original file for document {document_id}")
-        gcs_client.upload_document_file(document_id, content, file.filename)
-        
-        logger.info(f"[EXTRACT] Extracting text from PDF ({len(content)} bytes)")
-        text = _extract_text_from_pdf(content)
-        logger.info(f"[SUMMARY] Generating summary in {lang}")
-        summary = generate_summary(text, lang)
-        logger.info(f"[RESULT] Summary type: {type(summary)}, length: {len(summary)}")
-        
-        if isinstance(summary, dict):
-            data = summary
-            with open("debug_summary.json", "w") as f:
-                json.dump(summary, f, indent=2)
-        elif isinstance(summary, str):
-            with open("debug_summary_original.json", "w", encoding='utf-8') as f:
-                f.write(summary)
-            clean_json = clean_json_string(summary)
-            with open("debug_summary_cleaned.json", "w", encoding='utf-8') as f:
-                f.write(clean_json)
-            try:
-                data = json.loads(clean_json)
-                logger.info("[JSON] Successfully parsed JSON response")
-            except json.JSONDecodeError as e:
-                logger.error(f"[JSON] JSON parsing failed even after cleaning: {e}")
-                logger.error(f"[JSON] Error at position {e.pos}: '{clean_json[max(0, e.pos-10):e.pos+10]}'")
-                data = {
-                    "Summary": "Error parsing LLM response - using fallback structure",
-                    "Clauses": [],
-                    "processing_error": str(e),
-                    "original_response_length": len(summary)
-                }
-        else:
-            raise TypeError(f"Unexpected summary type: {type(summary)}")
-            
-        clauses = data.get("Clauses", [])
-        logger.info(f"[COMPLIANCE] Processing {len(clauses)} clauses for compliance checking")
-        
-        try:
-            if len(clauses) == 0:
-                logger.warning("[COMPLIANCE] No clauses found to process, creating minimal compliance result")
-                compliance_results = {
-                    "verification_results": [],
-                    "risk_explanations": [],
-                    "compliance_stats": {
-                        "total_clauses": 0,
-                        "compliant_count": 0,
-                        "non_compliant_count": 0,
-                        "high_risk_count": 0,
-                        "medium_risk_count": 0,
-                        "low_risk_count": 0,
-                        "compliance_rate": 0
-                    }
-                }
-            else:
-                compliance_agent = ComplianceAgent(llm_client="gemini")
-                compliance_results = compliance_agent.ensure_compliance(clauses)
-                logger.info(f"[COMPLIANCE] Successfully completed compliance checking for {len(clauses)} clauses")
-                
-                verification_results = compliance_results.get("verification_results", [])
-                risk_explanations = compliance_results.get("risk_explanations", [])
-                
-                total_clauses = len(verification_results)
-                compliant_count = sum(1 for result in verification_results if result.get("is_compliant", False))
-                non_compliant_count = total_clauses - compliant_count
-                
-                high_risk_count = sum(1 for risk in risk_explanations if risk and risk.get("severity") == "High")
-                medium_risk_count = sum(1 for risk in risk_explanations if risk and risk.get("severity") == "Medium")
-                low_risk_count = sum(1 for risk in risk_explanations if risk and risk.get("severity") == "Low")
-                
-                compliance_results = {
-                    **compliance_results,
-                    "compliance_stats": {
-                        "total_clauses": total_clauses,
-                        "compliant_count": compliant_count,
-                        "non_compliant_count": non_compliant_count,
-                        "high_risk_count": high_risk_count,
-                        "medium_risk_count": medium_risk_count,
-                        "low_risk_count": low_risk_count,
-                        "compliance_rate": round((compliant_count / total_clauses * 100), 2) if total_clauses > 0 else 0
-                    }
-                }
-        except Exception as e:
-            logger.error(f"[COMPLIANCE] Error during compliance checking: {e}\n{traceback.format_exc()}")
+        if len(clauses) == 0:
+            logger.warning("[COMPLIANCE] No clauses found to process, creating minimal compliance result")
             compliance_results = {
-                "status": "Compliance checking failed",
-                "error": str(e),
                 "verification_results": [],
                 "risk_explanations": [],
                 "compliance_stats": {
-                    "total_clauses": len(clauses),
+                    "total_clauses": 0,
                     "compliant_count": 0,
                     "non_compliant_count": 0,
+                    "unverified_count": 0,
                     "high_risk_count": 0,
                     "medium_risk_count": 0,
                     "low_risk_count": 0,
                     "compliance_rate": 0
                 }
             }
-
-        custom_encoders = {
-            np.bool_: bool,
-            np.int64: int,
-            np.float64: float
+        else:
+            compliance_agent = ComplianceAgent()
+            compliance_results = await compliance_agent.aensure_compliance(
+                clauses,
+                on_result=lambda index, verification, risk: emit("clause_verified", {
+                    "index": index,
+                    "clause_id": clauses[index].get("clause_id") if isinstance(clauses[index], dict) else None,
+                    "is_compliant": verification.get("is_compliant"),
+                    "final_reason": verification.get("final_reason"),
+                    "risk": risk
+                })
+            )
+            logger.info(f"[COMPLIANCE] Successfully completed compliance checking for {len(clauses)} clauses")
+            
+            verification_results = compliance_results.get("verification_results", [])
+            risk_explanations = compliance_results.get("risk_explanations", [])
+            
+            total_clauses = len(verification_results)
+            verdicts = count_verdicts(verification_results)
+            
+            high_risk_count = sum(1 for risk in risk_explanations if risk and risk.get("severity") == "High")
+            medium_risk_count = sum(1 for risk in risk_explanations if risk and risk.get("severity") == "Medium")
+            low_risk_count = sum(1 for risk in risk_explanations if risk and risk.get("severity") == "Low")
+            
+            compliance_results = {
+                **compliance_results,
+                "compliance_stats": {
+                    "total_clauses": total_clauses,
+                    "compliant_count": verdicts["compliant_count"],
+                    "non_compliant_count": verdicts["non_compliant_count"],
+                    "unverified_count": verdicts["unverified_count"],
+                    "high_risk_count": high_risk_count,
+                    "medium_risk_count": medium_risk_count,
+                    "low_risk_count": low_risk_count,
+                    "compliance_rate": verdicts["compliance_rate"]
+                }
+            }
+    except Exception as e:
+        logger.error(f"[COMPLIANCE] Error during compliance checking: {e}\n{traceback.format_exc()}")
+        compliance_results = {
+            "status": "Compliance checking failed",
+            "error": str(e),
+            "verification_results": [],
+            "risk_explanations": [],
+            "compliance_stats": {
+                "total_clauses": len(clauses),
+                "compliant_count": 0,
+                "non_compliant_count": 0,
+                "unverified_count": len(clauses),
+                "high_risk_count": 0,
+                "medium_risk_count": 0,
+                "low_risk_count": 0,
+                "compliance_rate": 0
+            }
         }
 
-        results = {
-            "document_id": document_id,
-            "summary": data.get("summary", ""),
-            "timelines": data.get("Timelines", {}),
-            "clauses": clauses,
-            "compliance_results": compliance_results,
-            "processing_completed_at": datetime.now().isoformat()
-        }
-        
-        logger.info(f"[GCS] Storing processing results for document {document_id}")
-        gcs_client.upload_processing_results(document_id, results)
-        
-        compliance_stats = compliance_results.get("compliance_stats", {})
-        completion_metadata = {
-            **upload_metadata,
-            "processing_status": "completed",
-            "processed_at": datetime.now().isoformat(),
-            "total_clauses": len(clauses),
-            "has_compliance_results": bool(compliance_results),
-            "compliance_rate": compliance_stats.get("compliance_rate", 0),
-            "compliant_count": compliance_stats.get("compliant_count", 0),
-            "non_compliant_count": compliance_stats.get("non_compliant_count", 0),
-            "high_risk_count": compliance_stats.get("high_risk_count", 0),
-            "medium_risk_count": compliance_stats.get("medium_risk_count", 0),
-            "low_risk_count": compliance_stats.get("low_risk_count", 0),
-            "overall_score": compliance_stats.get("compliance_rate", 0)
-        }
-        gcs_client.upload_document_metadata(document_id, completion_metadata)
-        
-        with open("debug_results.json", "w") as f:
-            json.dump(results, f, indent=2)
+    emit("risk", {"compliance_stats": compliance_results.get("compliance_stats", {})})
 
-        logger.info(f"[GCS] Document {document_id} fully processed and stored in GCS bucket: {gcs_client.bucket_name}")
-        
-        return jsonable_encoder(results, custom_encoder=custom_encoders)
+    results = {
+        "document_id": document_id,
+        "summary": data.get("summary", ""),
+        "timelines": data.get("Timelines", {}),
+        "clauses": clauses,
+        "compliance_results": compliance_results,
+        "processing_completed_at": datetime.now().isoformat()
+    }
+    
+    logger.info(f"[GCS] Storing processing results for document {document_id}")
+    gcs_client.upload_processing_results(document_id, results)
+    
+    compliance_stats = compliance_results.get("compliance_stats", {})
+    completion_metadata = {
+        **upload_metadata,
+        "processing_status": "completed",
+        "processed_at": datetime.now().isoformat(),
+        "total_clauses": len(clauses),
+        "has_compliance_results": bool(compliance_results),
+        "compliance_rate": compliance_stats.get("compliance_rate", 0),
+        "compliant_count": compliance_stats.get("compliant_count", 0),
+        "non_compliant_count": compliance_stats.get("non_compliant_count", 0),
+        "unverified_count": compliance_stats.get("unverified_count", 0),
+        "high_risk_count": compliance_stats.get("high_risk_count", 0),
+        "medium_risk_count": compliance_stats.get("medium_risk_count", 0),
+        "low_risk_count": compliance_stats.get("low_risk_count", 0),
+        "overall_score": compliance_stats.get("compliance_rate", 0)
+    }
+    gcs_client.upload_document_metadata(document_id, completion_metadata)
+    diagnostics.add("compliance", {
+        "prompt_stats": compliance_results.get("prompt_stats"),
+        "compliance_stats": compliance_stats,
+        "error": compliance_results.get("error")
+    })
+
+    logger.info(f"[GCS] Document {document_id} fully processed and stored in GCS bucket: {gcs_client.bucket_name}")
+    
+    return jsonable_encoder(results, custom_encoder=JSON_ENCODERS)
+
+@app.post("/upload-pdf/")
+async def run_backend(file: UploadFile = File(...), lang: Optional[str] = Form(None)):
+    document_id = _new_document_id()
+    
+    logger.info(f"[UPLOAD] Upload request received: file={file.filename}, size={file.size if hasattr(file, 'size') else 'unknown'}, lang={lang}, doc_id={document_id}")
+
+    if lang is None:
+        lang = "English"
+        logger.info(f"[LANG] Using default language: {lang}")
+    
+    try:
+        content = await file.read()
+        return await _process_document(document_id, content, file.filename, file.content_type, lang)
 
     except Exception as e:
         logger.error(f"[ERROR] Error processing upload: {str(e)}\n{traceback.format_exc()}")
@@ -335,6 +462,130 @@ async def run_backend(file: UploadFile = File(...), lang: Optional[str] = Form(N
             }
         )
 
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data, custom_encoder=JSON_ENCODERS))}\n\n"
+
+@app.post("/upload-pdf/stream")
+async def run_backend_stream(file: UploadFile = File(...), lang: Optional[str] = Form(None)):
+    """
+    Process an uploaded PDF like /upload-pdf/, streaming progress as Server-Sent Events
+
+    Events: uploaded, page_extracted (per page), extracted, clauses, summary,
+    clause_verified (per clause, as verdicts arrive), risk, and finally complete with
+    the full results, or error. Comment heartbeats keep proxies from closing the connection while
+    a stage runs. If the client disconnects, processing still finishes and is stored.
+    """
+    document_id = _new_document_id()
+    lang = lang or "English"
+    logger.info(f"[UPLOAD] Streaming upload request received: file={file.filename}, lang={lang}, doc_id={document_id}")
+
+    # Read now: the upload is closed once the streaming response starts
+    content = await file.read()
+    filename, content_type = file.filename, file.content_type
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+
+    def emit(event: Optional[str], data: Optional[Dict[str, Any]]):
+        loop.call_soon_threadsafe(events.put_nowait, (event, data))
+
+    async def process():
+        try:
+            results = await _process_document(document_id, content, filename, content_type, lang, emit)
+            emit("complete", results)
+        except Exception as e:
+            logger.error(f"[ERROR] Error processing streamed upload: {str(e)}\n{traceback.format_exc()}")
+            emit("error", {"document_id": document_id, "error": "Processing error", "message": str(e), "type": type(e).__name__})
+        finally:
+            emit(None, None)
+
+    task = asyncio.create_task(process())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+    async def stream():
+        while True:
+            try:
+                event, data = await asyncio.wait_for(events.get(), timeout=SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if event is None:
+                break
+            yield _sse(event, data)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _get_chat_agent() -> ConversationalComplianceAgent:
+    """Create the conversational agent on first use; chats fall back to canned answers without Vertex AI"""
+    global _chat_agent
+    if _chat_agent is None:
+        llm_verifier = None
+        try:
+            from src.llm_provider.verifier_llms import VertexAIVerifier
+            if VertexAIVerifier is not None:
+                llm_verifier = VertexAIVerifier()
+        except Exception as e:
+            logger.warning(f"[CHAT] Vertex AI unavailable, using fallback answers: {e}")
+        _chat_agent = ConversationalComplianceAgent(
+            llm_verifier=llm_verifier,
+            retriever=RegulationRetriever("faiss_index.bin", "metadata.pkl")
+        )
+    return _chat_agent
+
+@app.post("/api/chat/stream")
+async def chat_stream(message: str = Form(...), session_id: Optional[str] = Form(None),
+                      document_name: Optional[str] = Form(None)):
+    """
+    Answer a compliance question, streaming the answer as Server-Sent Events
+
+    Events: start (session_id, intent, retrieved regulations), token (per answer
+    fragment), and complete with the full response, or error. Pass the session_id
+    from start to continue the conversation; the exchange is added to the session
+    history once the answer is complete.
+    """
+    logger.info(f"[CHAT] Streaming chat request: session_id={session_id}")
+    agent = await run_in_threadpool(_get_chat_agent)
+    document_context = {"name": document_name} if document_name else None
+
+    async def stream():
+        events = agent.chat_stream(message, session_id=session_id, document_context=document_context)
+        pending = None
+        try:
+            while True:
+                if pending is None:
+                    pending = asyncio.ensure_future(events.__anext__())
+                # Heartbeat while waiting for retrieval or the first token
+                done, _ = await asyncio.wait({pending}, timeout=SSE_HEARTBEAT_SECONDS)
+                if not done:
+                    yield ": keep-alive\n\n"
+                    continue
+                task, pending = pending, None
+                try:
+                    event, data = task.result()
+                except StopAsyncIteration:
+                    break
+                yield _sse(event, data)
+        except Exception as e:
+            logger.error(f"[CHAT] Streaming chat failed: {str(e)}\n{traceback.format_exc()}")
+            yield _sse("error", {"session_id": session_id, "error": "Chat error", "message": str(e), "type": type(e).__name__})
+        finally:
+            # Client disconnected mid-answer: stop generating; the session history is left unchanged
+            if pending is not None:
+                pending.cancel()
+                await asyncio.gather(pending, return_exceptions=True)
+            await events.aclose()
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # ============================================================================
 # DASHBOARD ENDPOINTS
 # ============================================================================
@@ -466,6 +717,7 @@ async def get_document_analysis(document_id: str):
         
         overall_score = compliance_stats.get('compliance_rate', 0)
         compliant_count = compliance_stats.get('compliant_count', 0)
+        unverified_count = compliance_stats.get('unverified_count', 0)
         high_risk_count = compliance_stats.get('high_risk_count', 0)
         medium_risk_count = compliance_stats.get('medium_risk_count', 0)
         low_risk_count = compliance_stats.get('low_risk_count', 0)
@@ -481,7 +733,8 @@ async def get_document_analysis(document_id: str):
             "complianceRate": overall_score,
             "totalClauses": len(clauses),
             "compliantClauses": compliant_count,
-            "nonCompliantClauses": len(clauses) - compliant_count,
+            "nonCompliantClauses": compliance_stats.get('non_compliant_count', len(clauses) - compliant_count - unverified_count),
+            "unverifiedClauses": unverified_count,
             "highRiskClauses": high_risk_count,
             "mediumRiskClauses": medium_risk_count,
             "lowRiskClauses": low_risk_count,
@@ -627,7 +880,8 @@ async def analyze_document_compliance(document_id: str):
     logger.info(f"[API] Analyzing document compliance for document_id: {document_id}")
     try:
         gcs_client = get_gcs_client()
-        analysis_result = gcs_client.analyze_document_compliance(document_id)
+        # Analysis blocks on retrieval and runs its own event loop, so keep it off this one
+        analysis_result = await run_in_threadpool(gcs_client.analyze_document_compliance, document_id)
         if "error" in analysis_result:
             raise HTTPException(status_code=400, detail=analysis_result["error"])
         return {
@@ -639,32 +893,41 @@ async def analyze_document_compliance(document_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/dashboard/analyze-all")
-async def analyze_all_documents(limit: int = 10):
-    """Perform comprehensive compliance analysis on all stored documents"""
-    logger.info(f"[API] Analyzing all documents with limit: {limit}")
+async def analyze_all_documents(limit: int = 10, force: bool = False):
+    """Queue a background compliance re-analysis of stored documents"""
+    logger.info(f"[API] Queueing analysis of all documents with limit: {limit}")
     try:
-        gcs_client = get_gcs_client()
-        analysis_result = gcs_client.analyze_all_documents_compliance(limit=limit)
-        if "error" in analysis_result:
-            raise HTTPException(status_code=500, detail=analysis_result["error"])
+        job = await run_in_threadpool(get_analysis_job_manager().enqueue, limit=limit, force=force)
         return {
-            "status": "success",
-            "data": analysis_result
+            "status": "accepted",
+            "message": f"Analysis job {job['job_id']} is {job['status']}",
+            "data": job
         }
     except Exception as e:
-        logger.error(f"[API] Failed to analyze all documents: {e}\n{traceback.format_exc()}")
+        logger.error(f"[API] Failed to queue analysis of all documents: {e}\n{traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/dashboard/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """Get progress of a background analysis job"""
+    logger.info(f"[API] Job status requested for {job_id}")
+    job = await run_in_threadpool(get_analysis_job_manager().get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return {
+        "status": "success",
+        "data": job
+    }
+
 @app.post("/api/dashboard/refresh-analytics")
 async def refresh_dashboard_analytics():
-    """Refresh all dashboard analytics with real-time data"""
+    """Refresh dashboard analytics; re-analysis runs in the background"""
     logger.info("[API] Refreshing dashboard analytics")
     try:
-        gcs_client = get_gcs_client()
-        comprehensive_analysis = gcs_client.analyze_all_documents_compliance(limit=50)
-        if "error" in comprehensive_analysis:
-            raise HTTPException(status_code=500, detail=comprehensive_analysis["error"])
-        summary = comprehensive_analysis.get("summary", {})
+        job_manager = get_analysis_job_manager()
+        job = await run_in_threadpool(job_manager.enqueue, limit=50)
+        # Serve the last completed analysis while the new job runs
+        summary = job_manager.latest_summary() or {}
         analytics_data = {
             "complianceTrend": [
                 {
@@ -693,8 +956,9 @@ async def refresh_dashboard_analytics():
         }
         return {
             "status": "success",
-            "message": "Dashboard analytics refreshed with real-time data",
-            "data": analytics_data
+            "message": f"Dashboard analytics refresh queued as job {job['job_id']}",
+            "data": analytics_data,
+            "job": {"job_id": job["job_id"], "status": job["status"], "progress": job["progress"]}
         }
     except Exception as e:
         logger.error(f"[API] Failed to refresh dashboard analytics: {e}\n{traceback.format_exc()}")
@@ -960,6 +1224,10 @@ async def get_llm_providers():
                     "capabilities": ["text-processing", "compliance-analysis", "enterprise-features"]
                 }
             ],
+            "routing": {
+                "compliance_provider": os.getenv("COMPLIANCE_LLM_PROVIDER", "gemini"),
+                "stats": get_router_stats()
+            },
             "source": "fastapi_backend_real",
             "timestamp": datetime.now().isoformat()
         }
@@ -993,38 +1261,42 @@ async def delete_document(document_id: str):
         logger.error(f"[DELETE] Error deleting document {document_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to delete document: {str(e)}")
 
+def _purge_all_documents() -> Dict[str, Any]:
+    """Purge every document prefix, then the diagnostics, in batches; resumes an interrupted purge"""
+    gcs_client = get_gcs_client()
+    purge_result = gcs_client.delete_documents(
+        progress_callback=lambda progress: logger.info(
+            f"[CLEAR] Deleted {progress['deleted_blobs']} blobs from {progress['deleted_documents']} documents so far"
+        )
+    )
+    diagnostics_result = gcs_client.delete_documents("diagnostics/")
+    failed_blobs = purge_result["failed_blobs"] + diagnostics_result["failed_blobs"]
+    if failed_blobs:
+        logger.warning(f"[CLEAR] {len(failed_blobs)} blobs could not be deleted; rerun to resume")
+    logger.info(f"[CLEAR] Cleared {purge_result['deleted_documents']} documents "
+                f"and {diagnostics_result['deleted_blobs']} diagnostics")
+    return purge_result
+
+def _log_purge_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"[CLEAR] Error during GCS cleanup: {task.exception()}")
+
 @app.post("/api/dashboard/clear-all")
 async def clear_all_data():
-    """Clear all data from the system"""
+    """Start clearing all data in the background; progress is at /api/dashboard/clear-all/status"""
+    global _purge_task
     logger.info("[API] Clear all data endpoint accessed")
     try:
-        gcs_client = get_gcs_client()
-        
-        # Get list of all documents first
-        try:
-            documents = gcs_client.list_documents()
-            deleted_count = 0
-            
-            for doc_metadata in documents:
-                doc_id = doc_metadata.get('document_id')
-                if doc_id:
-                    try:
-                        success = gcs_client.delete_document(doc_id)
-                        if success:
-                            deleted_count += 1
-                    except Exception as doc_error:
-                        logger.warning(f"[CLEAR] Error deleting document {doc_id}: {doc_error}")
-                        continue
-            
-            logger.info(f"[CLEAR] Cleared {deleted_count} documents successfully")
-        except Exception as gcs_error:
-            logger.warning(f"[CLEAR] Error during GCS cleanup: {gcs_error}")
-            deleted_count = 0
-        
+        started = _purge_task is None or _purge_task.done()
+        if started:
+            _purge_task = asyncio.create_task(run_in_threadpool(_purge_all_documents))
+            _purge_task.add_done_callback(_log_purge_failure)
+
         return {
             "success": True,
-            "message": f"Successfully cleared {deleted_count} documents",
-            "deletedCount": deleted_count,
+            "status": "accepted",
+            "message": "Clearing all documents" if started else "A clear-all is already running",
+            "statusUrl": "/api/dashboard/clear-all/status",
             "timestamp": datetime.now().isoformat(),
             "source": "fastapi_backend_real"
         }
@@ -1032,6 +1304,22 @@ async def clear_all_data():
         logger.error(f"[CLEAR] Error clearing all data: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to clear all data: {str(e)}")
 
+@app.get("/api/dashboard/clear-all/status")
+async def get_clear_all_status():
+    """Get progress of the current or most recent clear-all purge"""
+    logger.info("[API] Clear all status endpoint accessed")
+    try:
+        gcs_client = get_gcs_client()
+        status = await run_in_threadpool(gcs_client.get_purge_status)
+        status = status or {"completed": True, "deleted_blobs": 0, "deleted_documents": 0}
+        return {
+            "status": "success",
+            "data": {**status, "running": _purge_task is not None and not _purge_task.done()}
+        }
+    except Exception as e:
+        logger.error(f"[CLEAR] Error getting clear-all status: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get clear-all status: {str(e)}")
+
 @app.get("/test")
 async def test_endpoint():
     """Test endpoint for deployment verification"""
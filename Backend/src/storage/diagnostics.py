@@ -0,0 +1,98 @@
+"""
+Sampled diagnostics capture for document processing
+
+Debugging artifacts (raw LLM output, cleaned JSON, final results) are collected
+per document and written to the storage backend in the background, instead of
+to files in the working directory on every upload. Capture is off by default;
+set DIAGNOSTICS_SAMPLE_RATE (0-1) to keep artifacts for a fraction of documents.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+# Fraction of documents whose artifacts are kept; 0 disables capture
+DIAGNOSTICS_SAMPLE_RATE = float(os.getenv("DIAGNOSTICS_SAMPLE_RATE", "0"))
+# Upper bound on the artifacts stored per document, in bytes of JSON
+DIAGNOSTICS_MAX_BYTES = int(os.getenv("DIAGNOSTICS_MAX_BYTES", str(512 * 1024)))
+
+# Uploads still in flight; holding references keeps the tasks from being collected
+_pending_uploads = set()
+
+def is_sampled(document_id: str, sample_rate: float = DIAGNOSTICS_SAMPLE_RATE) -> bool:
+    """
+    Decide whether a document's diagnostics are captured
+
+    The decision hashes the document ID, so it is stable across retries and processes.
+
+    Args:
+        document_id: Document identifier
+        sample_rate: Fraction of documents to capture
+
+    Returns:
+        True if the document is sampled
+    """
+    if sample_rate <= 0:
+        return False
+    bucket = int(hashlib.sha256(document_id.encode("utf-8")).hexdigest()[:8], 16) / 0xFFFFFFFF
+    return bucket < sample_rate
+
+class DiagnosticsCapture:
+    """Collects one document's debugging artifacts and stores them asynchronously"""
+
+    def __init__(self, storage, document_id: str, sample_rate: float = DIAGNOSTICS_SAMPLE_RATE,
+                 max_bytes: int = DIAGNOSTICS_MAX_BYTES):
+        """
+        Args:
+            storage: GCSClient the artifacts are written to
+            document_id: Document the artifacts belong to
+            sample_rate: Fraction of documents to capture
+            max_bytes: Size limit for all artifacts of the document
+        """
+        self.storage = storage
+        self.document_id = document_id
+        self.enabled = is_sampled(document_id, sample_rate)
+        self.remaining = max_bytes
+        self.artifacts: Dict[str, Any] = {}
+
+    def add(self, name: str, value: Any):
+        """
+        Record an artifact; over-budget artifacts are truncated
+
+        Args:
+            name: Artifact name, e.g. "summary_raw"
+            value: String or JSON-serializable value
+        """
+        if not self.enabled:
+            return
+        text = value if isinstance(value, str) else json.dumps(value, default=str)
+        size = len(text.encode("utf-8"))
+        if size <= self.remaining:
+            self.artifacts[name] = value
+            self.remaining -= size
+            return
+        # Character slicing keeps multi-byte text under the byte budget as well
+        kept = text[:max(0, self.remaining // 4)]
+        self.artifacts[name] = {"truncated": True, "original_bytes": size, "content": kept}
+        self.remaining -= len(kept.encode("utf-8"))
+
+    def flush(self):
+        """Upload the collected artifacts in the background; returns immediately"""
+        if not self.enabled or not self.artifacts:
+            return
+        payload = {
+            "document_id": self.document_id,
+            "captured_at": datetime.now(timezone.utc).isoformat(),
+            "artifacts": self.artifacts
+        }
+        self.artifacts = {}
+        task = asyncio.get_running_loop().create_task(
+            asyncio.to_thread(self.storage.upload_diagnostics, self.document_id, payload)
+        )
+        _pending_uploads.add(task)
+        task.add_done_callback(_pending_uploads.discard)
@@ -4,18 +4,28 @@ Google Cloud Storage client for handling document storage and metadata
 import os
 import json
 import logging
-from datetime import datetime, timezone
-from typing import Dict, Any, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional, Callable, List
 from google.cloud import storage
 from google.cloud.exceptions import NotFound, GoogleCloudError
-from src.compliance_checker.compliance_agent import ComplianceAgent
-from src.extraction.extract_pipeline import _extract_text_from_pdf
-import json
+from src.compliance_checker.compliance_agent import ComplianceAgent, count_verdicts
+from src.extraction.extract_pipeline import extract_document, extraction_version
+from src.storage.serialization import PayloadCodec, decode_payload
 import base64
+import hashlib
 from io import BytesIO
 
 logger = logging.getLogger(__name__)
 
+# The JSON batch API accepts at most 100 calls per request
+GCS_BATCH_SIZE = 100
+# Checkpoint of the documents/ purge; other prefixes get jobs/purge/{prefix}.json
+PURGE_CHECKPOINT_BLOB = "jobs/purge/checkpoint.json"
+# Bump when the compliance analysis changes, so stored analyses are recomputed by batch jobs
+ANALYSIS_VERSION = "compliance-v1"
+
 class GCSClient:
     """Google Cloud Storage client for SEBI compliance system"""
     
@@ -29,6 +39,11 @@ class GCSClient:
             self.client = storage.Client()
             self.bucket = self.client.bucket(self.bucket_name)
 
+            # Results are large and read often, so compress them by default;
+            # metadata stays plain JSON unless configured otherwise
+            self.results_codec = PayloadCodec.from_env('GCS_RESULTS', default_compression='gzip')
+            self.metadata_codec = PayloadCodec.from_env('GCS_METADATA')
+
             logger.info(f"[GCS] Initialized client for bucket: {self.bucket_name}")
 
         except Exception as e:
@@ -36,6 +51,31 @@ class GCSClient:
             logger.error("[GCS] Please ensure GOOGLE_APPLICATION_CREDENTIALS is set correctly")
             raise
     
+    def _upload_payload(self, blob, payload: Dict[str, Any], codec: PayloadCodec) -> None:
+        """
+        Encode a payload with the given codec and upload it to a blob
+
+        Args:
+            blob: Target blob
+            payload: JSON-serializable dictionary
+            codec: Codec controlling the encoder and content encoding
+        """
+        blob.content_encoding = codec.content_encoding
+        blob.upload_from_string(codec.encode(payload), content_type=codec.content_type)
+
+    def _download_payload(self, blob) -> Any:
+        """
+        Download a blob and decode it, whatever encoder or compression it was written with
+
+        Args:
+            blob: Source blob
+
+        Returns:
+            Decoded JSON payload
+        """
+        # raw_download skips GCS decompressive transcoding; decode_payload sniffs the encoding itself
+        return decode_payload(blob.download_as_bytes(raw_download=True))
+
     def upload_document_metadata(self, document_id: str, metadata: Dict[str, Any]) -> bool:
         """
         Upload document processing metadata to GCS
@@ -62,10 +102,7 @@ class GCSClient:
             }
             
             # Upload as JSON
-            blob.upload_from_string(
-                json.dumps(enriched_metadata, indent=2),
-                content_type='application/json'
-            )
+            self._upload_payload(blob, enriched_metadata, self.metadata_codec)
             
             logger.info(f"[GCS] Uploaded metadata for document {document_id} to {blob_name}")
             return True
@@ -103,10 +140,7 @@ class GCSClient:
             }
             
             # Upload as JSON
-            blob.upload_from_string(
-                json.dumps(enriched_results, indent=2, default=str),
-                content_type='application/json'
-            )
+            self._upload_payload(blob, enriched_results, self.results_codec)
             
             logger.info(f"[GCS] Uploaded results for document {document_id} to {blob_name}")
             return True
@@ -179,8 +213,7 @@ class GCSClient:
                 logger.warning(f"[GCS] Metadata not found for document {document_id}")
                 return None
 
-            content = blob.download_as_text()
-            metadata = json.loads(content)
+            metadata = self._download_payload(blob)
 
             # Ensure all required fields are present with defaults for dashboard
             enhanced_metadata = {
@@ -195,6 +228,7 @@ class GCSClient:
                 "total_clauses": metadata.get("total_clauses", 0),
                 "compliant_count": metadata.get("compliant_count", 0),
                 "non_compliant_count": metadata.get("non_compliant_count", 0),
+                "unverified_count": metadata.get("unverified_count", 0),
                 "high_risk_count": metadata.get("high_risk_count", 0),
                 "medium_risk_count": metadata.get("medium_risk_count", 0),
                 "low_risk_count": metadata.get("low_risk_count", 0),
@@ -309,12 +343,14 @@ class GCSClient:
             logger.error(f"[GCS] Failed to generate dashboard summary: {e}")
             raise
 
-    def analyze_document_compliance(self, document_id: str) -> Dict[str, Any]:
+    def analyze_document_compliance(self, document_id: str,
+                                    compliance_agent: Optional[ComplianceAgent] = None) -> Dict[str, Any]:
         """
         Perform real-time compliance analysis on a stored document
 
         Args:
             document_id: Unique identifier for the document
+            compliance_agent: Agent to reuse across documents; a new one (and its retrieval model) otherwise
 
         Returns:
             Dictionary containing detailed compliance analysis
@@ -325,47 +361,28 @@ class GCSClient:
             metadata = self.get_document_metadata(document_id)
             if not metadata:
                 return {"error": "Document metadata not found"}
+            fingerprint = self.document_fingerprint(document_id, metadata)
 
-            # Try to get stored document content, fallback to stored results
-            document_content = self.get_document_content(document_id)
-            clauses = []
+            # Reuse the stored extraction; the PDF is only parsed when it is missing or stale
+            extraction = None
+            if metadata.get("content_type") == "application/pdf":
+                extraction = self.get_document_extraction(document_id, metadata)
 
-            # If no content but we have stored results, use those
-            if not document_content:
+            if extraction is not None:
+                clauses = extraction.get("clauses", [])
+                if not clauses:
+                    return {"error": "No clauses found in document"}
+            else:
+                # Fall back to clauses from the upload-time processing results
                 stored_results = self.get_processing_results(document_id)
                 if stored_results and "clauses" in stored_results:
                     logger.info(f"[GCS] Using stored results for {document_id}")
                     clauses = stored_results["clauses"]
                 else:
-                    return {"error": "Document content and stored results not found"}
-            else:
-                # Extract text from document if it's a PDF
-                if metadata.get("content_type") == "application/pdf":
-                    try:
-                        # Convert base64 content back to bytes
-                        content_bytes = base64.b64decode(document_content)
-
-                        # Extract text from PDF
-                        extracted_text = _extract_text_from_pdf(content_bytes)
-
-                        # Split text into clauses (simple approach - split by newlines)
-                        clauses = [clause.strip() for clause in extracted_text.split('\n\n') if clause.strip()]
-                        if not clauses:
-                            return {"error": "No clauses found in document"}
-
-                    except Exception as e:
-                        logger.error(f"[GCS] Failed to extract text from PDF {document_id}: {e}")
-                        return {"error": f"PDF processing failed: {str(e)}"}
-                else:
-                    # For non-PDF documents, try to extract clauses from stored data
-                    stored_results = self.get_processing_results(document_id)
-                    if stored_results and "clauses" in stored_results:
-                        clauses = stored_results["clauses"]
-                    else:
-                        return {"error": "No clause data available for analysis"}
+                    return {"error": "No clause data available for analysis"}
 
             # Perform compliance analysis
-            compliance_agent = ComplianceAgent(llm_client="gemini")
+            compliance_agent = compliance_agent or ComplianceAgent()
             compliance_results = compliance_agent.ensure_compliance(clauses)
 
             # Extract compliance statistics
@@ -373,19 +390,19 @@ class GCSClient:
             risk_explanations = compliance_results.get("risk_explanations", [])
 
             total_clauses = len(verification_results)
-            compliant_count = sum(1 for result in verification_results if result.get("is_compliant", False))
-            non_compliant_count = total_clauses - compliant_count
+            verdicts = count_verdicts(verification_results)
+            verified_clauses = total_clauses - verdicts["unverified_count"]
 
             # Calculate risk distribution
             high_risk_count = sum(1 for risk in risk_explanations if risk and risk.get("severity") == "High")
             medium_risk_count = sum(1 for risk in risk_explanations if risk and risk.get("severity") == "Medium")
             low_risk_count = sum(1 for risk in risk_explanations if risk and risk.get("severity") == "Low")
 
-            compliance_rate = round((compliant_count / total_clauses * 100), 2) if total_clauses > 0 else 0
+            compliance_rate = verdicts["compliance_rate"]
 
-            # Calculate overall risk score (weighted by severity)
+            # Calculate overall risk score (weighted by severity) over the clauses that were verified
             risk_score = (high_risk_count * 3) + (medium_risk_count * 2) + (low_risk_count * 1)
-            max_possible_risk = total_clauses * 3
+            max_possible_risk = verified_clauses * 3
             normalized_risk_score = round((risk_score / max_possible_risk * 100), 2) if max_possible_risk > 0 else 0
 
             analysis_result = {
@@ -394,8 +411,9 @@ class GCSClient:
                 "analysis_timestamp": datetime.now(timezone.utc).isoformat(),
                 "compliance_analysis": {
                     "total_clauses": total_clauses,
-                    "compliant_clauses": compliant_count,
-                    "non_compliant_clauses": non_compliant_count,
+                    "compliant_clauses": verdicts["compliant_count"],
+                    "non_compliant_clauses": verdicts["non_compliant_count"],
+                    "unverified_clauses": verdicts["unverified_count"],
                     "compliance_rate": compliance_rate,
                     "high_risk_clauses": high_risk_count,
                     "medium_risk_clauses": medium_risk_count,
@@ -411,8 +429,10 @@ class GCSClient:
                     "risk_explanations": risk_explanations,
                     "extracted_clauses": clauses
                 },
-                "processing_status": "analyzed"
+                "processing_status": "analyzed",
+                "fingerprint": fingerprint
             }
+            self.upload_document_analysis(document_id, analysis_result)
 
             logger.info(f"[GCS] Completed real-time compliance analysis for {document_id}")
             return analysis_result
@@ -421,6 +441,154 @@ class GCSClient:
             logger.error(f"[GCS] Failed to analyze document compliance for {document_id}: {e}")
             return {"error": str(e)}
 
+    def get_document_extraction(self, document_id: str, metadata: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Get the extracted pages and clauses of a stored PDF
+
+        The artifact at documents/{id}/extracted.json is reused while it matches the
+        original file's MD5 and the current extraction version. Otherwise the PDF is
+        downloaded and extracted once, and the artifact is rewritten.
+
+        Args:
+            document_id: Unique identifier for the document
+            metadata: Document metadata, if already loaded
+
+        Returns:
+            Extraction artifact or None if the original is missing or not a PDF
+        """
+        try:
+            original = self._original_blob(document_id, metadata)
+            if original is None:
+                logger.warning(f"[GCS] Document content not found for {document_id}")
+                return None
+
+            try:
+                artifact = self._download_payload(self.bucket.blob(f"documents/{document_id}/extracted.json"))
+                if artifact.get("source_md5") == original.md5_hash and artifact.get("version") == extraction_version():
+                    logger.info(f"[GCS] Using stored extraction for {document_id}")
+                    return artifact
+                logger.info(f"[GCS] Stored extraction for {document_id} is stale")
+            except NotFound:
+                pass
+
+            logger.info(f"[GCS] Extracting {original.name}")
+            artifact = extract_document(original.download_as_bytes())
+            self.upload_document_extraction(document_id, artifact, original.md5_hash)
+            return artifact
+
+        except Exception as e:
+            logger.error(f"[GCS] Failed to get extraction for {document_id}: {e}")
+            return None
+
+    def upload_document_extraction(self, document_id: str, extraction: Dict[str, Any], source_md5: str) -> bool:
+        """
+        Store a document's extraction artifact next to the original file
+
+        Args:
+            document_id: Unique identifier for the document
+            extraction: Output of extract_document (version, pages, clauses, stats)
+            source_md5: Base64 MD5 of the original file, as reported by GCS
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        try:
+            blob = self.bucket.blob(f"documents/{document_id}/extracted.json")
+            payload = {
+                **extraction,
+                "document_id": document_id,
+                "source_md5": source_md5,
+                "extracted_at": datetime.now(timezone.utc).isoformat()
+            }
+            self._upload_payload(blob, payload, self.results_codec)
+            logger.info(f"[GCS] Stored extraction for {document_id} ({len(extraction.get('pages', []))} pages)")
+            return True
+        except Exception as e:
+            logger.error(f"[GCS] Failed to store extraction for {document_id}: {e}")
+            return False
+
+    def document_fingerprint(self, document_id: str, metadata: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """
+        Fingerprint the inputs of a document's compliance analysis
+
+        Covers the original file's MD5, the extraction version and the analysis version,
+        so an unchanged fingerprint means a stored analysis is still valid.
+
+        Args:
+            document_id: Unique identifier for the document
+            metadata: Document metadata, if already loaded
+
+        Returns:
+            Hex fingerprint or None if the original file is missing
+        """
+        try:
+            original = self._original_blob(document_id, metadata)
+            if original is None:
+                return None
+            key = f"{original.md5_hash}|{extraction_version()}|{ANALYSIS_VERSION}"
+            return hashlib.sha256(key.encode('utf-8')).hexdigest()
+        except Exception as e:
+            logger.warning(f"[GCS] Could not fingerprint {document_id}: {e}")
+            return None
+
+    def get_document_analysis(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Retrieve the most recent compliance analysis of a document
+
+        Args:
+            document_id: Unique identifier for the document
+
+        Returns:
+            Stored analysis or None if the document has not been analyzed
+        """
+        try:
+            return self._download_payload(self.bucket.blob(f"documents/{document_id}/analysis.json"))
+        except NotFound:
+            return None
+        except Exception as e:
+            logger.error(f"[GCS] Failed to retrieve analysis for {document_id}: {e}")
+            return None
+
+    def upload_document_analysis(self, document_id: str, analysis: Dict[str, Any]) -> bool:
+        """
+        Store a document's compliance analysis
+
+        Args:
+            document_id: Unique identifier for the document
+            analysis: Output of analyze_document_compliance
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        try:
+            self._upload_payload(self.bucket.blob(f"documents/{document_id}/analysis.json"), analysis, self.results_codec)
+            return True
+        except Exception as e:
+            logger.error(f"[GCS] Failed to store analysis for {document_id}: {e}")
+            return False
+
+    @staticmethod
+    def content_md5(content: bytes) -> str:
+        """Base64 MD5 of file content, in the same form as a blob's md5_hash"""
+        return base64.b64encode(hashlib.md5(content).digest()).decode('utf-8')
+
+    def _original_blob(self, document_id: str, metadata: Optional[Dict[str, Any]] = None):
+        """Find the original file blob of a document, with its metadata (size, MD5) loaded"""
+        metadata = metadata or self.get_document_metadata(document_id) or {}
+        filename = metadata.get("filename", "")
+        candidates = []
+        if filename:
+            file_extension = filename.split('.')[-1] if '.' in filename else 'pdf'
+            candidates.append(f"documents/{document_id}/original.{file_extension}")
+        # Older uploads used content.bin
+        candidates.append(f"documents/{document_id}/content.bin")
+
+        for blob_name in candidates:
+            blob = self.bucket.get_blob(blob_name)
+            if blob is not None:
+                return blob
+        return None
+
     def get_document_content(self, document_id: str) -> Optional[str]:
         """
         Retrieve the original document content from GCS
@@ -478,43 +646,13 @@ class GCSClient:
         try:
             document_ids = self.list_documents(limit=limit)
             analysis_results = []
-            summary_stats = {
-                "total_documents": len(document_ids),
-                "analyzed_documents": 0,
-                "total_compliance_rate": 0.0,
-                "avg_risk_score": 0.0,
-                "high_risk_documents": 0,
-                "total_clauses_analyzed": 0,
-                "total_compliant_clauses": 0
-            }
 
             for doc_id in document_ids:
                 analysis = self.analyze_document_compliance(doc_id)
-
                 if "error" not in analysis:
                     analysis_results.append(analysis)
-                    summary_stats["analyzed_documents"] += 1
 
-                    # Update summary statistics
-                    compliance = analysis["compliance_analysis"]
-                    risk = analysis["risk_assessment"]
-
-                    summary_stats["total_compliance_rate"] += compliance["compliance_rate"]
-                    summary_stats["avg_risk_score"] += risk["overall_risk_score"]
-                    summary_stats["total_clauses_analyzed"] += compliance["total_clauses"]
-                    summary_stats["total_compliant_clauses"] += compliance["compliant_clauses"]
-
-                    if risk["risk_level"] == "High":
-                        summary_stats["high_risk_documents"] += 1
-
-            # Calculate averages
-            if summary_stats["analyzed_documents"] > 0:
-                summary_stats["total_compliance_rate"] = round(
-                    summary_stats["total_compliance_rate"] / summary_stats["analyzed_documents"], 2
-                )
-                summary_stats["avg_risk_score"] = round(
-                    summary_stats["avg_risk_score"] / summary_stats["analyzed_documents"], 2
-                )
+            summary_stats = self.summarize_analyses(analysis_results, len(document_ids))
 
             result = {
                 "summary": summary_stats,
@@ -529,6 +667,54 @@ class GCSClient:
             logger.error(f"[GCS] Failed to analyze all documents: {e}")
             return {"error": str(e)}
 
+    @staticmethod
+    def summarize_analyses(analyses: List[Dict[str, Any]], total_documents: int) -> Dict[str, Any]:
+        """
+        Aggregate per-document compliance analyses into dashboard statistics
+
+        Args:
+            analyses: Successful outputs of analyze_document_compliance
+            total_documents: Number of documents considered, including failures
+
+        Returns:
+            Dictionary of summary statistics
+        """
+        summary_stats = {
+            "total_documents": total_documents,
+            "analyzed_documents": 0,
+            "total_compliance_rate": 0.0,
+            "avg_risk_score": 0.0,
+            "high_risk_documents": 0,
+            "total_clauses_analyzed": 0,
+            "total_compliant_clauses": 0
+        }
+
+        for analysis in analyses:
+            summary_stats["analyzed_documents"] += 1
+
+            # Update summary statistics
+            compliance = analysis["compliance_analysis"]
+            risk = analysis["risk_assessment"]
+
+            summary_stats["total_compliance_rate"] += compliance["compliance_rate"]
+            summary_stats["avg_risk_score"] += risk["overall_risk_score"]
+            summary_stats["total_clauses_analyzed"] += compliance["total_clauses"]
+            summary_stats["total_compliant_clauses"] += compliance["compliant_clauses"]
+
+            if risk["risk_level"] == "High":
+                summary_stats["high_risk_documents"] += 1
+
+        # Calculate averages
+        if summary_stats["analyzed_documents"] > 0:
+            summary_stats["total_compliance_rate"] = round(
+                summary_stats["total_compliance_rate"] / summary_stats["analyzed_documents"], 2
+            )
+            summary_stats["avg_risk_score"] = round(
+                summary_stats["avg_risk_score"] / summary_stats["analyzed_documents"], 2
+            )
+
+        return summary_stats
+
     def get_processing_results(self, document_id: str) -> Optional[Dict[str, Any]]:
         """
         Retrieve processing results from GCS
@@ -547,8 +733,7 @@ class GCSClient:
                 logger.warning(f"[GCS] Results not found for document {document_id}")
                 return None
                 
-            content = blob.download_as_text()
-            results = json.loads(content)
+            results = self._download_payload(blob)
             
             logger.info(f"[GCS] Retrieved results for document {document_id}")
             return results
@@ -560,6 +745,172 @@ class GCSClient:
             logger.error(f"[GCS] Failed to retrieve results for {document_id}: {e}")
             return None
     
+    def get_cache_entry(self, namespace: str, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Retrieve a cached payload from GCS
+
+        Args:
+            namespace: Cache namespace (e.g. "summaries")
+            key: Cache key within the namespace
+
+        Returns:
+            Cached payload or None on a miss
+        """
+        try:
+            blob = self.bucket.blob(f"cache/{namespace}/{key}.json")
+            payload = self._download_payload(blob)
+            logger.info(f"[GCS] Cache hit for {namespace}/{key}")
+            return payload
+        except NotFound:
+            return None
+        except Exception as e:
+            logger.warning(f"[GCS] Failed to read cache entry {namespace}/{key}: {e}")
+            return None
+
+    def put_cache_entry(self, namespace: str, key: str, payload: Dict[str, Any]) -> bool:
+        """
+        Store a payload in the GCS cache
+
+        Args:
+            namespace: Cache namespace (e.g. "summaries")
+            key: Cache key within the namespace
+            payload: JSON-serializable dictionary
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        try:
+            blob = self.bucket.blob(f"cache/{namespace}/{key}.json")
+            self._upload_payload(blob, {**payload, "cached_at": datetime.now(timezone.utc).isoformat()}, self.results_codec)
+            return True
+        except Exception as e:
+            logger.warning(f"[GCS] Failed to write cache entry {namespace}/{key}: {e}")
+            return False
+
+    def upload_diagnostics(self, document_id: str, diagnostics: Dict[str, Any]) -> bool:
+        """
+        Store sampled debugging artifacts for a document
+
+        Args:
+            document_id: Document identifier
+            diagnostics: Captured artifacts (see src.storage.diagnostics)
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        try:
+            blob = self.bucket.blob(f"diagnostics/{document_id}.json")
+            self._upload_payload(blob, diagnostics, self.results_codec)
+            logger.info(f"[GCS] Stored diagnostics for {document_id}")
+            return True
+        except Exception as e:
+            logger.warning(f"[GCS] Failed to store diagnostics for {document_id}: {e}")
+            return False
+
+    def get_job_state(self, job_type: str, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Retrieve the checkpointed state of a background job
+
+        Args:
+            job_type: Job type (e.g. "analysis")
+            job_id: Job identifier
+
+        Returns:
+            Job state or None if the job does not exist
+        """
+        try:
+            return self._download_payload(self.bucket.blob(f"jobs/{job_type}/{job_id}.json"))
+        except NotFound:
+            return None
+        except Exception as e:
+            logger.error(f"[GCS] Failed to load {job_type} job {job_id}: {e}")
+            return None
+
+    def save_job_state(self, job_type: str, job_id: str, state: Dict[str, Any]) -> bool:
+        """
+        Checkpoint the state of a background job
+
+        Args:
+            job_type: Job type (e.g. "analysis")
+            job_id: Job identifier
+            state: JSON-serializable job state
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        try:
+            blob = self.bucket.blob(f"jobs/{job_type}/{job_id}.json")
+            # The status is also kept in blob metadata, so listings can filter and prune without downloads
+            blob.metadata = {"status": str(state.get("status", ""))}
+            self._upload_payload(blob, {**state, "updated_at": datetime.now(timezone.utc).isoformat()}, self.metadata_codec)
+            return True
+        except Exception as e:
+            logger.error(f"[GCS] Failed to save {job_type} job {job_id}: {e}")
+            return False
+
+    def list_job_states(self, job_type: str, statuses: Optional[tuple] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        List the checkpointed states of jobs of a type
+
+        Args:
+            job_type: Job type (e.g. "analysis")
+            statuses: Only download jobs with one of these statuses; states saved without
+                a status in their blob metadata are always downloaded
+            limit: Only the most recently updated matching jobs
+
+        Returns:
+            Job states, oldest first
+        """
+        states = []
+        try:
+            blobs = [blob for blob in self.client.list_blobs(self.bucket_name, prefix=f"jobs/{job_type}/")
+                     if blob.name.endswith('.json')]
+            if statuses is not None:
+                blobs = [blob for blob in blobs
+                         if (blob.metadata or {}).get("status") in (None, *statuses)]
+            if limit is not None:
+                blobs = sorted(blobs, key=lambda blob: blob.updated, reverse=True)[:limit]
+            for blob in blobs:
+                try:
+                    states.append(self._download_payload(blob))
+                except Exception as e:
+                    logger.warning(f"[GCS] Skipping unreadable job state {blob.name}: {e}")
+        except Exception as e:
+            logger.error(f"[GCS] Failed to list {job_type} jobs: {e}")
+        return sorted(states, key=lambda state: state.get("created_at", ""))
+
+    def prune_job_states(self, job_type: str, keep_statuses: tuple, max_age_days: float, max_count: int) -> int:
+        """
+        Delete finished job states older than max_age_days or beyond the newest max_count
+
+        Args:
+            job_type: Job type (e.g. "analysis")
+            keep_statuses: Statuses never pruned, e.g. queued and running jobs
+            max_age_days: Age after which a finished job's state is deleted (0 = no age limit)
+            max_count: Finished job states kept, newest first (0 = no count limit)
+
+        Returns:
+            Number of job states deleted
+        """
+        try:
+            finished = sorted(
+                (blob for blob in self.client.list_blobs(self.bucket_name, prefix=f"jobs/{job_type}/")
+                 if blob.name.endswith('.json') and (blob.metadata or {}).get("status") not in keep_statuses),
+                key=lambda blob: blob.updated, reverse=True
+            )
+            cutoff = datetime.now(timezone.utc) - timedelta(days=max_age_days)
+            expired = [blob.name for index, blob in enumerate(finished)
+                       if (max_count and index >= max_count) or (max_age_days and blob.updated < cutoff)]
+            if not expired:
+                return 0
+            deleted = sum(self._delete_blob_batch(expired[start:start + GCS_BATCH_SIZE])[0]
+                          for start in range(0, len(expired), GCS_BATCH_SIZE))
+            logger.info(f"[GCS] Pruned {deleted} old {job_type} job states")
+            return deleted
+        except Exception as e:
+            logger.warning(f"[GCS] Failed to prune {job_type} jobs: {e}")
+            return 0
+
     def list_documents(self, limit: int = 100) -> list:
         """
         List all documents in the bucket
@@ -572,7 +923,8 @@ class GCSClient:
         """
         try:
             document_ids = set()
-            blobs = self.client.list_blobs(self.bucket, prefix="documents/", max_results=limit * 3)
+            # One metadata.json per document, however many other artifacts it has
+            blobs = self.client.list_blobs(self.bucket, match_glob="documents/*/metadata.json", max_results=limit)
 
             for blob in blobs:
                 # Extract document ID from path like "documents/doc_123/metadata.json"
@@ -601,21 +953,208 @@ class GCSClient:
             bool: True if successful, False otherwise
         """
         try:
-            # Delete all blobs with the document prefix
-            blobs = self.client.list_blobs(self.bucket, prefix=f"documents/{document_id}/")
-            deleted_count = 0
+            blobs = list(self.client.list_blobs(self.bucket, prefix=f"documents/{document_id}/"))
+            deleted, failed = self._delete_blob_batch([blob.name for blob in blobs])
 
-            for blob in blobs:
-                blob.delete()
-                deleted_count += 1
+            # Only sampled documents have diagnostics, so a missing blob is expected
+            try:
+                self.bucket.blob(f"diagnostics/{document_id}.json").delete()
+                deleted += 1
+            except NotFound:
+                pass
 
-            logger.info(f"[GCS] Deleted {deleted_count} files for document {document_id}")
-            return True
+            logger.info(f"[GCS] Deleted {deleted} files for document {document_id}")
+            return not failed
 
         except Exception as e:
             logger.error(f"[GCS] Failed to delete document {document_id}: {e}")
             return False
 
+    def delete_documents(
+        self,
+        prefix: str = "documents/",
+        max_workers: int = 8,
+        resume: bool = True,
+        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Delete every blob under a prefix using batched requests on a bounded pool
+
+        Listing is paged; each page is split into batches of up to 100 deletes,
+        which are sent concurrently. After every page a checkpoint is written so an
+        interrupted purge resumes after the last listed blob. Blobs that could not
+        be deleted are kept in the checkpoint and retried first when resuming.
+
+        Args:
+            prefix: Blob prefix to purge (defaults to all documents)
+            max_workers: Maximum number of concurrent batch requests
+            resume: Continue from the stored checkpoint for this prefix if one exists
+            progress_callback: Called with the running totals after every page
+
+        Returns:
+            Dictionary with deleted blob/document counts and failed blob names
+        """
+        progress = {
+            "prefix": prefix,
+            "deleted_blobs": 0,
+            "deleted_documents": 0,
+            "failed_blobs": [],
+            "last_blob": None,
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "completed": False
+        }
+
+        checkpoint = self._load_purge_checkpoint(prefix) if resume else None
+        if checkpoint and checkpoint.get("prefix") == prefix and not checkpoint.get("completed"):
+            progress.update({k: checkpoint[k] for k in ("deleted_blobs", "deleted_documents", "last_blob", "started_at")})
+            logger.info(f"[GCS] Resuming purge of {prefix} after {progress['last_blob']}")
+            retry = checkpoint.get("failed_blobs") or []
+        else:
+            retry = []
+
+        # Blobs are listed in name order, so each document's files are contiguous
+        current_document = self._document_id_from_blob(progress["last_blob"])
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # Blobs that failed before the last checkpoint are not listed again
+            if retry:
+                logger.info(f"[GCS] Retrying {len(retry)} blobs that failed before the checkpoint")
+                batches = [retry[i:i + GCS_BATCH_SIZE] for i in range(0, len(retry), GCS_BATCH_SIZE)]
+                for deleted, failed in executor.map(self._delete_blob_batch, batches):
+                    progress["deleted_blobs"] += deleted
+                    progress["failed_blobs"].extend(failed)
+                self._save_purge_checkpoint(prefix, progress)
+
+            blobs = self.client.list_blobs(
+                self.bucket,
+                prefix=prefix,
+                start_offset=progress["last_blob"],
+                page_size=1000
+            )
+            for page in blobs.pages:
+                names = [blob.name for blob in page]
+                if not names:
+                    continue
+
+                batches = [names[i:i + GCS_BATCH_SIZE] for i in range(0, len(names), GCS_BATCH_SIZE)]
+                for deleted, failed in executor.map(self._delete_blob_batch, batches):
+                    progress["deleted_blobs"] += deleted
+                    progress["failed_blobs"].extend(failed)
+
+                for name in names:
+                    document_id = self._document_id_from_blob(name)
+                    if document_id and document_id != current_document:
+                        progress["deleted_documents"] += 1
+                        current_document = document_id
+
+                progress["last_blob"] = names[-1]
+                self._save_purge_checkpoint(prefix, progress)
+
+                if progress_callback:
+                    progress_callback(dict(progress))
+
+        progress["completed"] = not progress["failed_blobs"]
+        self._save_purge_checkpoint(prefix, progress)
+
+        logger.info(f"[GCS] Purged {progress['deleted_blobs']} blobs ({progress['deleted_documents']} documents) under {prefix}")
+        return progress
+
+    def _delete_blob_batch(self, blob_names: List[str]) -> tuple:
+        """
+        Delete up to 100 blobs in a single batch request
+
+        Batches are tracked on the client, so each worker thread uses its own client.
+        Falls back to individual deletes if the batch request fails.
+
+        Args:
+            blob_names: Names of the blobs to delete
+
+        Returns:
+            Tuple of (deleted count, list of names that could not be deleted)
+        """
+        if not blob_names:
+            return 0, []
+
+        client = self._thread_client()
+        bucket = client.bucket(self.bucket_name)
+        try:
+            with client.batch():
+                for name in blob_names:
+                    bucket.blob(name).delete()
+            return len(blob_names), []
+        except Exception as e:
+            logger.warning(f"[GCS] Batch delete failed, retrying individually: {e}")
+
+        failed = []
+
+        def on_error(blob):
+            # Already gone counts as deleted
+            if bucket.blob(blob.name).exists():
+                failed.append(blob.name)
+
+        bucket.delete_blobs([bucket.blob(name) for name in blob_names], on_error=on_error)
+        return len(blob_names) - len(failed), failed
+
+    @staticmethod
+    def _document_id_from_blob(blob_name: Optional[str]) -> Optional[str]:
+        """Extract the document ID from a blob path like documents/doc_123/metadata.json"""
+        if not blob_name:
+            return None
+        path_parts = blob_name.split('/')
+        if len(path_parts) >= 3 and path_parts[0] == "documents":
+            return path_parts[1]
+        return None
+
+    def _thread_client(self) -> storage.Client:
+        """Get a storage client owned by the current thread"""
+        if not hasattr(self, "_thread_local"):
+            self._thread_local = threading.local()
+        if threading.current_thread() is threading.main_thread():
+            return self.client
+        client = getattr(self._thread_local, "client", None)
+        if client is None:
+            client = storage.Client()
+            self._thread_local.client = client
+        return client
+
+    def get_purge_status(self, prefix: str = "documents/") -> Optional[Dict[str, Any]]:
+        """
+        Get the progress of the current or most recent purge
+
+        Args:
+            prefix: Blob prefix of the purge
+
+        Returns:
+            The stored purge checkpoint or None if no purge has run
+        """
+        return self._load_purge_checkpoint(prefix)
+
+    @staticmethod
+    def _purge_checkpoint_blob(prefix: str) -> str:
+        """Each prefix keeps its own checkpoint, so purging one does not reset another's"""
+        if prefix == "documents/":
+            return PURGE_CHECKPOINT_BLOB
+        return f"jobs/purge/{prefix.strip('/').replace('/', '_')}.json"
+
+    def _load_purge_checkpoint(self, prefix: str) -> Optional[Dict[str, Any]]:
+        """Load the purge checkpoint of a prefix if one exists"""
+        try:
+            blob = self.bucket.blob(self._purge_checkpoint_blob(prefix))
+            if not blob.exists():
+                return None
+            return self._download_payload(blob)
+        except Exception as e:
+            logger.warning(f"[GCS] Could not load purge checkpoint: {e}")
+            return None
+
+    def _save_purge_checkpoint(self, prefix: str, progress: Dict[str, Any]) -> None:
+        """Persist purge progress so an interrupted purge can resume"""
+        try:
+            # The full failed list is kept: a resumed purge only lists blobs after last_blob
+            checkpoint = {**progress, "updated_at": datetime.now(timezone.utc).isoformat()}
+            self._upload_payload(self.bucket.blob(self._purge_checkpoint_blob(prefix)), checkpoint, self.metadata_codec)
+        except Exception as e:
+            logger.warning(f"[GCS] Could not save purge checkpoint: {e}")
+
     def export_compliance_reports(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Dict[str, Any]:
         """
         Export detailed compliance reports from GCS
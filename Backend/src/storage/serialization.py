@@ -0,0 +1,145 @@
+"""
+Serialization helpers for JSON payloads stored in GCS
+
+Results and metadata are encoded with a configurable JSON encoder
+(stdlib json, orjson or msgspec) and optionally compressed with gzip or zstd.
+Decoding sniffs the payload's magic bytes, so blobs written with any
+configuration (including legacy pretty-printed JSON) remain readable.
+"""
+import os
+import gzip
+import json
+import logging
+from typing import Any, Dict, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+SUPPORTED_ENCODERS = ("json", "orjson", "msgspec")
+SUPPORTED_COMPRESSIONS = ("none", "gzip", "zstd")
+
+
+def _json_default(value: Any) -> Any:
+    """Fallback for values the encoders can't serialize natively (numpy scalars, datetimes, ...)"""
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+class PayloadCodec:
+    """Encodes and decodes JSON payloads for storage"""
+
+    def __init__(self, encoder: str = "json", compression: str = "none", level: Optional[int] = None):
+        """
+        Args:
+            encoder: JSON encoder to use ("json", "orjson" or "msgspec")
+            compression: Content encoding to apply ("none", "gzip" or "zstd")
+            level: Optional compression level
+        """
+        if encoder not in SUPPORTED_ENCODERS:
+            raise ValueError(f"Unsupported encoder: {encoder}")
+        if compression not in SUPPORTED_COMPRESSIONS:
+            raise ValueError(f"Unsupported compression: {compression}")
+
+        # Fall back to what is installed rather than failing uploads
+        if encoder == "orjson" and orjson is None:
+            logger.warning("[CODEC] orjson not installed, falling back to json")
+            encoder = "json"
+        if encoder == "msgspec" and msgspec is None:
+            logger.warning("[CODEC] msgspec not installed, falling back to json")
+            encoder = "json"
+        if compression == "zstd" and zstandard is None:
+            logger.warning("[CODEC] zstandard not installed, falling back to gzip")
+            compression = "gzip"
+
+        self.encoder = encoder
+        self.compression = compression
+        self.level = level
+        self._msgspec_encoder = msgspec.json.Encoder(enc_hook=_json_default) if encoder == "msgspec" else None
+
+    @classmethod
+    def from_env(cls, prefix: str, default_compression: str = "none") -> "PayloadCodec":
+        """
+        Build a codec from environment variables, e.g. GCS_RESULTS_ENCODER / GCS_RESULTS_COMPRESSION
+
+        Args:
+            prefix: Environment variable prefix
+            default_compression: Compression used when the variable is not set
+        """
+        encoder = os.getenv(f"{prefix}_ENCODER", "json").lower()
+        compression = os.getenv(f"{prefix}_COMPRESSION", default_compression).lower()
+        level = os.getenv(f"{prefix}_COMPRESSION_LEVEL")
+        return cls(encoder=encoder, compression=compression, level=int(level) if level else None)
+
+    @property
+    def content_encoding(self) -> Optional[str]:
+        """
+        Value for the blob's Content-Encoding header
+
+        Only gzip is declared: GCS transcodes gzip for clients that don't accept it, but
+        serves zstd as-is, so other readers would get an undecodable body. zstd payloads
+        are recognized by their magic bytes instead.
+        """
+        return "gzip" if self.compression == "gzip" else None
+
+    @property
+    def content_type(self) -> str:
+        """Value for the blob's Content-Type header"""
+        return "application/zstd" if self.compression == "zstd" else "application/json"
+
+    def encode(self, payload: Dict[str, Any]) -> bytes:
+        """Serialize and compress a payload"""
+        if self.encoder == "orjson":
+            data = orjson.dumps(payload, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+        elif self.encoder == "msgspec":
+            data = self._msgspec_encoder.encode(payload)
+        else:
+            data = json.dumps(payload, separators=(",", ":"), ensure_ascii=False, default=_json_default).encode("utf-8")
+
+        if self.compression == "gzip":
+            return gzip.compress(data, compresslevel=self.level or 6, mtime=0)
+        if self.compression == "zstd":
+            return zstandard.ZstdCompressor(level=self.level or 3).compress(data)
+        return data
+
+    def decode(self, data: bytes) -> Any:
+        """Decompress (based on magic bytes) and parse a payload"""
+        return decode_payload(data)
+
+
+def decompress_payload(data: bytes) -> bytes:
+    """Strip gzip/zstd content encoding if present"""
+    if data[:2] == GZIP_MAGIC:
+        return gzip.decompress(data)
+    if data[:4] == ZSTD_MAGIC:
+        if zstandard is None:
+            raise RuntimeError("zstd-compressed payload but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    return data
+
+
+def decode_payload(data: bytes) -> Any:
+    """Parse a stored payload regardless of the encoder/compression it was written with"""
+    raw = decompress_payload(data)
+    if orjson is not None:
+        return orjson.loads(raw)
+    if msgspec is not None:
+        return msgspec.json.decode(raw)
+    return json.loads(raw)
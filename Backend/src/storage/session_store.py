@@ -0,0 +1,354 @@
+"""
+Bounded session storage for conversational state
+
+Chat histories are kept per session ID in a store that evicts the least
+recently used sessions beyond a session count or total size, and sessions idle
+longer than a TTL. Each session has its own lock, so concurrent requests for
+one session are serialized while different sessions proceed in parallel.
+
+Two backends share the interface: an in-process LRU (default) and SQLite
+(SESSION_STORE=sqlite), which keeps sessions across restarts. Session locks are
+per process, so a database file must not be shared by several workers.
+Values must be JSON-serializable; a session larger than the byte limit is dropped.
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# "memory" or "sqlite"
+SESSION_STORE = os.getenv("SESSION_STORE", "memory").lower()
+SESSION_SQLITE_PATH = os.getenv("SESSION_SQLITE_PATH", "sessions.db")
+# Polling interval while an async caller waits for a session held by a worker thread
+SESSION_LOCK_POLL_SECONDS = 0.01
+# Sessions idle longer than this are dropped
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "1800"))
+# Least recently used sessions are evicted beyond these limits, per namespace
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "1000"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024 * 1024)))
+
+class _SessionLock:
+    """A lock that can be weakly referenced, so idle sessions' locks are freed"""
+    __slots__ = ("_lock", "_loop_locks", "__weakref__")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Event loop -> asyncio.Lock queueing that loop's async callers
+        self._loop_locks = weakref.WeakKeyDictionary()
+
+    def __enter__(self):
+        self._lock.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self._lock.release()
+
+    def _loop_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        with _loop_locks_guard:
+            lock = self._loop_locks.get(loop)
+            if lock is None:
+                lock = self._loop_locks[loop] = asyncio.Lock()
+            return lock
+
+    async def acquire_async(self):
+        """
+        Acquire without blocking the event loop; cancelling the wait leaves the lock untouched
+
+        Async callers of one loop wait on an asyncio.Lock; only the first of them
+        polls, and only while a worker thread holds the session.
+        """
+        loop_lock = self._loop_lock()
+        await loop_lock.acquire()
+        try:
+            while not self._lock.acquire(blocking=False):
+                await asyncio.sleep(SESSION_LOCK_POLL_SECONDS)
+        except BaseException:
+            loop_lock.release()
+            raise
+
+    def release_async(self):
+        """Release a lock taken with acquire_async"""
+        self._lock.release()
+        self._loop_lock().release()
+
+# Guards the per-loop lock tables of all session locks
+_loop_locks_guard = threading.Lock()
+
+class SessionStore:
+    """
+    Base class: per-session locking and the session() read-modify-write helper.
+    Subclasses implement get/set/delete with LRU and TTL eviction.
+    """
+
+    def __init__(self, namespace: str, ttl_seconds: float = SESSION_TTL_SECONDS,
+                 max_sessions: int = SESSION_MAX_SESSIONS, max_bytes: int = SESSION_MAX_BYTES):
+        """
+        Args:
+            namespace: Separates stores sharing a backend, e.g. "conversations"
+            ttl_seconds: Idle time after which a session expires
+            max_sessions: Sessions kept before the least recently used are evicted
+            max_bytes: Serialized size kept before the least recently used are evicted
+        """
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._locks = weakref.WeakValueDictionary()
+        self._locks_guard = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[Any]:
+        """Get a session's value and mark it as used; None if missing or expired"""
+        raise NotImplementedError
+
+    def set(self, session_id: str, value: Any):
+        """Store a session's value, evicting other sessions if over the limits; a session over max_bytes is dropped"""
+        raise NotImplementedError
+
+    def delete(self, session_id: str):
+        """Remove a session"""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        """Session count, stored bytes and evictions so far"""
+        raise NotImplementedError
+
+    def lock(self, session_id: str) -> _SessionLock:
+        """
+        Get the lock of a session
+
+        Hold it across a get/set pair so concurrent requests for the same session
+        do not overwrite each other's updates.
+        """
+        with self._locks_guard:
+            lock = self._locks.get(session_id)
+            if lock is None:
+                lock = self._locks[session_id] = _SessionLock()
+            return lock
+
+    @contextmanager
+    def session(self, session_id: str, factory: Callable[[], Any]):
+        """
+        Lock a session, yield its value (created with factory if missing) and store it on exit
+
+        Args:
+            session_id: Session identifier
+            factory: Builds the initial value of a new or expired session
+
+        Yields:
+            The session value, to be modified in place
+        """
+        with self.lock(session_id):
+            value = self.get(session_id)
+            if value is None:
+                value = factory()
+            yield value
+            self.set(session_id, value)
+
+    @asynccontextmanager
+    async def asession(self, session_id: str, factory: Callable[[], Any]):
+        """
+        Async version of session(), for streaming handlers on the event loop
+
+        The value is only written back if the block completes; callers that may be
+        abandoned midway should modify it at the end.
+        """
+        lock = self.lock(session_id)
+        await lock.acquire_async()
+        try:
+            value = self.get(session_id)
+            if value is None:
+                value = factory()
+            yield value
+            self.set(session_id, value)
+        finally:
+            lock.release_async()
+
+    @staticmethod
+    def _encode(value: Any) -> str:
+        return json.dumps(value, ensure_ascii=False, default=str)
+
+    def _oversized(self, session_id: str, size: int) -> bool:
+        """
+        A value over max_bytes would evict every other session and then itself, so the
+        session is dropped instead; values are modified in place, so the stored one is stale too
+        """
+        if size <= self.max_bytes:
+            return False
+        logger.warning(f"[SESSIONS] Session {session_id} in {self.namespace} is {size} bytes, "
+                       f"over the {self.max_bytes} byte limit; dropping it")
+        self.delete(session_id)
+        return True
+
+class MemorySessionStore(SessionStore):
+    """In-process store: an LRU-ordered dict with sliding TTL"""
+
+    def __init__(self, namespace: str, **limits):
+        super().__init__(namespace, **limits)
+        # session_id -> (value, size, expires_at), least recently used first
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _pop(self, session_id: str):
+        _, size, _ = self._entries.pop(session_id)
+        self._bytes -= size
+
+    def _evict(self, now: float):
+        # With a sliding TTL the least recently used entry also expires first
+        while self._entries:
+            session_id, (_, _, expires_at) = next(iter(self._entries.items()))
+            over_limit = len(self._entries) > self.max_sessions or self._bytes > self.max_bytes
+            if expires_at > now and not over_limit:
+                break
+            self._pop(session_id)
+            self.evictions += 1
+
+    def get(self, session_id: str) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return None
+            value, size, expires_at = entry
+            if expires_at <= now:
+                self._pop(session_id)
+                self.evictions += 1
+                return None
+            self._entries[session_id] = (value, size, now + self.ttl_seconds)
+            self._entries.move_to_end(session_id)
+            return value
+
+    def set(self, session_id: str, value: Any):
+        size = len(self._encode(value).encode("utf-8"))
+        if self._oversized(session_id, size):
+            return
+        now = time.monotonic()
+        with self._lock:
+            if session_id in self._entries:
+                self._pop(session_id)
+            self._entries[session_id] = (value, size, now + self.ttl_seconds)
+            self._bytes += size
+            self._evict(now)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            if session_id in self._entries:
+                self._pop(session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._evict(time.monotonic())
+            return {"backend": "memory", "sessions": len(self._entries), "bytes": self._bytes, "evictions": self.evictions}
+
+class SQLiteSessionStore(SessionStore):
+    """SQLite-backed store; values are stored as JSON"""
+
+    def __init__(self, namespace: str, path: str = SESSION_SQLITE_PATH, **limits):
+        super().__init__(namespace, **limits)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "namespace TEXT NOT NULL, session_id TEXT NOT NULL, value TEXT NOT NULL, "
+                "size INTEGER NOT NULL, expires_at REAL NOT NULL, "
+                "PRIMARY KEY (namespace, session_id))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_expiry ON sessions (namespace, expires_at)")
+
+    def _evict(self, now: float):
+        cursor = self._conn.execute("DELETE FROM sessions WHERE namespace = ? AND expires_at <= ?", (self.namespace, now))
+        self.evictions += cursor.rowcount
+        count, total = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM sessions WHERE namespace = ?", (self.namespace,)
+        ).fetchone()
+        if count <= self.max_sessions and total <= self.max_bytes:
+            return
+        # expires_at orders sessions by last use, so the oldest go first
+        evict = []
+        for session_id, size in self._conn.execute(
+                "SELECT session_id, size FROM sessions WHERE namespace = ? ORDER BY expires_at", (self.namespace,)):
+            if count <= self.max_sessions and total <= self.max_bytes:
+                break
+            evict.append((self.namespace, session_id))
+            count -= 1
+            total -= size
+        self._conn.executemany("DELETE FROM sessions WHERE namespace = ? AND session_id = ?", evict)
+        self.evictions += len(evict)
+
+    def get(self, session_id: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM sessions WHERE namespace = ? AND session_id = ? AND expires_at > ?",
+                (self.namespace, session_id, now)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE sessions SET expires_at = ? WHERE namespace = ? AND session_id = ?",
+                               (now + self.ttl_seconds, self.namespace, session_id))
+        return json.loads(row[0])
+
+    def set(self, session_id: str, value: Any):
+        encoded = self._encode(value)
+        size = len(encoded.encode("utf-8"))
+        if self._oversized(session_id, size):
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (namespace, session_id, value, size, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, session_id, encoded, size, now + self.ttl_seconds)
+            )
+            self._evict(now)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE namespace = ? AND session_id = ?", (self.namespace, session_id))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._evict(time.time())
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM sessions WHERE namespace = ?", (self.namespace,)
+            ).fetchone()
+        return {"backend": "sqlite", "sessions": count, "bytes": total, "evictions": self.evictions}
+
+# namespace -> shared store
+_stores: Dict[str, SessionStore] = {}
+_stores_lock = threading.Lock()
+
+def get_session_store(namespace: str) -> SessionStore:
+    """
+    Get the shared session store for a namespace, using the SESSION_STORE backend
+
+    Args:
+        namespace: Store namespace, e.g. "conversations" or "vertex_chats"
+
+    Returns:
+        The store
+    """
+    with _stores_lock:
+        store = _stores.get(namespace)
+        if store is None:
+            if SESSION_STORE == "sqlite":
+                store = SQLiteSessionStore(namespace)
+            else:
+                if SESSION_STORE != "memory":
+                    logger.warning(f"[SESSIONS] Unknown SESSION_STORE '{SESSION_STORE}'; using memory")
+                store = MemorySessionStore(namespace)
+            _stores[namespace] = store
+        return store
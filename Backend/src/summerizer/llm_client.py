@@ -1,95 +1,278 @@
 import os
+import re
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Union
 import google.generativeai as genai
 from dotenv import load_dotenv
-from sympy import re
+from src.llm_provider.rate_limiter import get_rate_limiter
+from src.llm_provider.llm_clients import json_generation_config
+from src.llm_provider.schemas import CLAUSES, TIMELINES, Schema
+from src.extraction.chunking import estimate_tokens, iter_page_chunks, split_into_chunks
 
 load_dotenv()
 
 # Configure API keys
 API = os.getenv("GEMINI_API_KEY")
 genai.configure(api_key=API)
+# Shared with any other caller of this key, so parallel chunk calls stay within its quota
+RATE_LIMITER = get_rate_limiter("gemini", API, "GEMINI_API_KEY")
 
-def return_api_key():
-    print(API)
+SUMMARY_MODEL = "gemini-2.5-flash"
 
-def summarize_with_gemini(text: str, lang: str) -> str:
-    try:
-        model = genai.GenerativeModel("gemini-2.5-flash")
-        prompt = f"""
-        You are an advanced text analysis system. Your task is to carefully read and process the following text, 
-        then produce a comprehensive, structured output in JSON format.
-
-        Your responsibilities:
-        1. **Summarization**: Create a detailed and cohesive summary that preserves all key facts, events, and context. 
-           - The summary must not be overly brief. 
-           - Avoid redundancy and filler. 
-           - Ensure clarity, flow, and readability in {lang}.
+# Bump the version of a stage whenever its prompt changes so cached responses are not reused.
+# Clauses and timelines are extracted in English only, so they are shared across languages.
+CLAUSES_PROMPT_VERSION = "clauses-v1"
+TIMELINES_PROMPT_VERSION = "timelines-v2"
+SUMMARY_PROMPT_VERSION = "summary-v3"
+LANGUAGE_INDEPENDENT = "*"
 
-        2. **Timelines**: Extract chronological events and represent them as structured timeline entries. 
-           - Each timeline entry must include a start, an end (if applicable), and a description. 
-           - If exact dates are unavailable, use approximate references (e.g., "early 2000s", "ancient period"). 
-           - Maintain chronological order. 
-           - If no timelines are present, return an empty object {{}}.
+# Documents above this size are processed chunk by chunk (map) and merged (reduce)
+CHUNK_TOKEN_BUDGET = int(os.getenv("SUMMARY_CHUNK_TOKENS", "60000"))
+CHUNKED_MODE_THRESHOLD = int(os.getenv("SUMMARY_CHUNKED_THRESHOLD_TOKENS", str(CHUNK_TOKEN_BUDGET)))
+MAX_CHUNK_WORKERS = int(os.getenv("SUMMARY_MAX_WORKERS", "8"))
+CLAUSES_PER_CHUNK = 8
 
-        3. **Clauses**: Identify distinct clauses, rules, or provisions in the text. 
-           - Each clause should have a unique `"clause_id"` in the format `"C-1"`, `"C-2"`, etc.
-           - Provide the extracted clause text in English under `"text_en"`. 
-           - Ensure clauses are semantically meaningful and not just random sentence splits. 
-           - If no clauses exist, return an empty list [].
+def return_api_key():
+    print(API)
 
-        ---
+def _clauses_prompt(text: str, max_clauses: int = CLAUSES_PER_CHUNK) -> str:
+    return f"""
+        You are an advanced legal text analysis system. Identify distinct clauses, rules, or provisions in the text below.
+           - Each clause should have a unique `"clause_id"` in the format `"C-1"`, `"C-2"`, etc.
+           - Provide the extracted clause text in English under `"text_en"`.
+           - Ensure clauses are semantically meaningful and not just random sentence splits.
+           - If no clauses exist, return an empty "Clauses" list.
 
         ### Input Text:
         {text}
 
-        ---
-
         ### Output JSON Schema (strictly follow this structure):
         {{
-            "summary": "A detailed summary of the text, covering all major points, facts, and context in a cohesive narrative.",
-            "Timelines": {{
-                "timeline1": {{
-                    "start": "Exact or approximate start date",
-                    "end": "Exact or approximate end date or null",
-                    "description": "Explanation of events in this period"
-                }},
-                "timeline2": {{
-                    "start": "...",
-                    "end": "...",
-                    "description": "..."
-                }}
-            }},
             "Clauses": [
                 {{
                     "clause_id": "C-1",
                     "text_en": "..."
-                }},
+                }}
+            ] #Limit to {max_clauses} clauses
+        }}
+
+        Don't give it as a markdown return it as valid, parsable JSON with no extra keys.
+        """
+
+def _timelines_prompt(text: str) -> str:
+    return f"""
+        You are an advanced text analysis system. Extract chronological events from the text below as structured timeline entries.
+           - Each timeline entry must include a start, an end (if applicable), and a description in English.
+           - If exact dates are unavailable, use approximate references (e.g., "early 2000s", "ancient period").
+           - Maintain chronological order.
+           - If no timelines are present, return an empty "Timelines" list.
+
+        ### Input Text:
+        {text}
+
+        ### Output JSON Schema (strictly follow this structure):
+        {{
+            "Timelines": [
                 {{
-                    "clause_id": "C-2",
-                    "text_en": "..."
+                    "start": "Exact or approximate start date",
+                    "end": "Exact or approximate end date or null",
+                    "description": "Explanation of events in this period"
                 }}
-            ] #Limit to 8 clauses
+            ]
         }}
 
-        ---
-
-        ### Guidelines:
-        - Follow the JSON schema strictly.
-        - Don't give it as a markdown return it as a json.
-        - Always provide a `"summary"` field.
-        - Ensure JSON is **valid and parsable** (no trailing commas, properly quoted strings).
-        - If timelines or clauses are missing, return `"Timelines": {{}}` or `"Clauses": []` respectively.
-        - The `"summary"` must be at least 3–4 well-structured paragraphs, not a single abstract line.
-        - Use consistent naming for `"clause_id"` in sequential order.
-        - Do not add extra keys or fields outside the specified schema.
+        Don't give it as a markdown return it as valid, parsable JSON with no extra keys.
         """
-        response = model.generate_content(prompt, generation_config={"temperature": 0.1})
+
+def _summary_prompt(text: str, lang: str) -> str:
+    return f"""
+        You are an advanced text analysis system. Create a detailed and cohesive summary of the text below
+        that preserves all key facts, events, and context.
+           - The summary must not be overly brief; write at least 3–4 well-structured paragraphs.
+           - Avoid redundancy and filler.
+           - Ensure clarity, flow, and readability in {lang}.
+
+        ### Input Text:
+        {text}
+
+        Return only the summary text, not JSON or markdown.
+        """
+
+def _call_gemini(prompt: str, schema: Schema = None) -> str:
+    try:
+        model = genai.GenerativeModel(SUMMARY_MODEL)
+        generation_config = {"temperature": 0.1}
+        if schema is not None:
+            # Constrained decoding: the response is JSON matching the schema
+            generation_config.update(json_generation_config(schema))
+        response = RATE_LIMITER.run_sync(
+            lambda: model.generate_content(prompt, generation_config=generation_config),
+            estimate_tokens(prompt) + 2000
+        )
         return response.text.strip()
-    
     except Exception as e:
-        print(f"[ERROR] Gemini summarization failed: {e}")
+        print(f"[ERROR] Gemini call failed: {e}")
         return None
 
+def _call_gemini_json(prompt: str, schema: Schema) -> dict:
+    raw = _call_gemini(prompt, schema)
+    if not raw:
+        return None
+    try:
+        return schema.parse(raw)
+    except Exception as e:
+        print(f"[ERROR] Could not parse Gemini JSON response: {e}")
+        return None
+
+def _map_chunks(func, text: str, chunked: bool = None) -> list:
+    """Apply a per-chunk function over the text, in parallel when the text is chunked."""
+    if chunked is None:
+        chunked = estimate_tokens(text) > CHUNKED_MODE_THRESHOLD
+    if not chunked:
+        return [func(text)]
+
+    chunks = split_into_chunks(text, CHUNK_TOKEN_BUDGET)
+    with ThreadPoolExecutor(max_workers=min(MAX_CHUNK_WORKERS, len(chunks)) or 1) as executor:
+        return list(executor.map(func, chunks))
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\W+", " ", text).strip().lower()
+
+def _merge_clauses(partials: list[dict]) -> list[dict]:
+    """Merge clauses from all chunks, dropping duplicates and renumbering sequentially."""
+    merged, seen = [], set()
+    for partial in partials:
+        for clause in (partial or {}).get("Clauses", []) or []:
+            text_en = (clause.get("text_en") or "").strip()
+            key = _normalize(text_en)
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            merged.append({"clause_id": f"C-{len(merged) + 1}", "text_en": text_en})
+    return merged
+
+def _merge_timelines(partials: list[dict]) -> dict:
+    """Merge timelines from all chunks in document order, dropping duplicates."""
+    merged, seen = {}, set()
+    for partial in partials:
+        timelines = (partial or {}).get("Timelines", {}) or {}
+        entries = timelines.values() if isinstance(timelines, dict) else timelines
+        for entry in entries:
+            if not isinstance(entry, dict):
+                continue
+            key = (_normalize(str(entry.get("start", ""))), _normalize(str(entry.get("description", ""))))
+            if key in seen:
+                continue
+            seen.add(key)
+            merged[f"timeline{len(merged) + 1}"] = entry
+    return merged
+
+def _merge_summaries(summaries: list[str], lang: str) -> str:
+    """Reduce per-chunk summaries into one cohesive summary."""
+    summaries = [s for s in summaries if s]
+    if len(summaries) <= 1:
+        return summaries[0] if summaries else None
+
+    sections = "\n\n".join(f"Part {i + 1}:\n{s}" for i, s in enumerate(summaries))
+    merged = _call_gemini(f"""
+        The following are summaries of consecutive parts of one long document.
+        Combine them into a single detailed and cohesive summary in {lang} that preserves all key facts,
+        events and context, without redundancy. Write at least 3–4 well-structured paragraphs.
+        Return only the summary text, not JSON or markdown.
+
+        {sections}
+        """)
+    return merged or "\n\n".join(summaries)
+
+def _cached_stage(cache, content_hash: str, lang: str, prompt_version: str, compute):
+    """
+    Run a stage through the cache; only stages where every chunk succeeded are stored.
+    compute() returns (result, complete), complete being False if any chunk failed.
+    """
+    if cache is not None:
+        try:
+            cached = cache.get_by_hash(content_hash, lang, SUMMARY_MODEL, prompt_version)
+            if cached is not None:
+                print(f"[SUMMARY] Cache hit for {prompt_version} ({lang})")
+                return cached
+        except Exception as e:
+            print(f"[WARN] Summary cache lookup failed: {e}")
+
+    result, complete = compute()
+
+    if cache is not None and result is not None:
+        if not complete:
+            print(f"[SUMMARY] Not caching {prompt_version}: some chunks failed")
+            return result
+        try:
+            cache.set_by_hash(content_hash, lang, SUMMARY_MODEL, prompt_version, result)
+        except Exception as e:
+            print(f"[WARN] Could not cache {prompt_version}: {e}")
+    return result
+
+def _complete(partials: list) -> bool:
+    """True if every chunk of a stage produced a result"""
+    return all(partial is not None for partial in partials)
+
+def _clauses_map(chunk: str) -> dict:
+    return _call_gemini_json(_clauses_prompt(chunk), CLAUSES)
+
+def _clauses_reduce(partials: list) -> list[dict]:
+    return _merge_clauses(partials) if any(partials) else None
+
+def _timelines_map(chunk: str) -> dict:
+    return _call_gemini_json(_timelines_prompt(chunk), TIMELINES)
+
+def _timelines_reduce(partials: list) -> dict:
+    return _merge_timelines(partials) if any(partials) else None
+
+def _hash_for(cache, text: str, text_hash: str = None) -> str:
+    """Cache hash of the text: the precomputed one if given, None without a cache."""
+    if cache is None or text_hash is not None:
+        return text_hash
+    return cache.text_hash(text)
+
+def extract_clauses(text: str, chunked: bool = None, cache=None, text_hash: str = None) -> list[dict]:
+    """
+    Extract English clauses from the document. Language-independent, so cached once per text.
+    Args:
+        text_hash (str): Precomputed cache hash of the text, shared by the stages of one document.
+    Returns:
+        list[dict]: Clauses with "clause_id" and "text_en", or None if extraction failed.
+    """
+    def compute():
+        partials = _map_chunks(_clauses_map, text, chunked)
+        return _clauses_reduce(partials), _complete(partials)
+    return _cached_stage(cache, _hash_for(cache, text, text_hash), LANGUAGE_INDEPENDENT, CLAUSES_PROMPT_VERSION, compute)
+
+def extract_timelines(text: str, chunked: bool = None, cache=None, text_hash: str = None) -> dict:
+    """
+    Extract timeline entries from the document. Language-independent, so cached once per text.
+    Args:
+        text_hash (str): Precomputed cache hash of the text, shared by the stages of one document.
+    Returns:
+        dict: Timelines keyed "timeline1", "timeline2", ..., or None if extraction failed.
+    """
+    def compute():
+        partials = _map_chunks(_timelines_map, text, chunked)
+        return _timelines_reduce(partials), _complete(partials)
+    return _cached_stage(cache, _hash_for(cache, text, text_hash), LANGUAGE_INDEPENDENT, TIMELINES_PROMPT_VERSION, compute)
+
+def render_summary(text: str, lang: str, chunked: bool = None, cache=None, text_hash: str = None) -> str:
+    """
+    Render the document summary in the requested language.
+    Args:
+        text_hash (str): Precomputed cache hash of the text, shared by the stages of one document.
+    Returns:
+        str: The summary text, or None if generation failed.
+    """
+    def compute():
+        partials = _map_chunks(lambda chunk: _call_gemini(_summary_prompt(chunk, lang)), text, chunked)
+        return _merge_summaries(partials, lang), _complete(partials)
+    return _cached_stage(cache, _hash_for(cache, text, text_hash), lang, SUMMARY_PROMPT_VERSION, compute)
+
 # def summarize_with_openai(text: str) -> str:
 #     try:
 #         response = openai.ChatCompletion.create(
@@ -102,11 +285,31 @@ def summarize_with_gemini(text: str, lang: str) -> str:
 #         print(f"[ERROR] OpenAI summarization failed: {e}")
 #         return None
 
-def generate_summary(text: str, lang: str) -> str:
-    # Try Gemini first
-    summary = summarize_with_gemini(text, lang)
-    if summary:
-        return summary
+def generate_summary(text: str, lang: str, chunked: bool = None, cache=None, include_clauses: bool = True) -> str:
+    """
+    Produce the summary, timelines and clauses for a document.
+    The three stages run concurrently and are cached independently, so requesting
+    another language for the same text only re-runs the summary stage.
+    Args:
+        text (str): The extracted document text.
+        lang (str): Language of the summary.
+        chunked (bool): Force map-reduce mode on or off; decided by length when None.
+        cache: Optional SummaryCache.
+        include_clauses (bool): Run the LLM clause stage; skip it when clauses come from the local segmenter.
+    Returns:
+        str: JSON string with "summary", "Timelines" and "Clauses", or None if every stage failed.
+    """
+    # Hashed once for all three stages
+    text_hash = _hash_for(cache, text)
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        clauses = executor.submit(extract_clauses, text, chunked, cache, text_hash) if include_clauses else None
+        timelines = executor.submit(extract_timelines, text, chunked, cache, text_hash)
+        summary = executor.submit(render_summary, text, lang, chunked, cache, text_hash)
+        clauses = clauses.result() if clauses else None
+        timelines, summary = timelines.result(), summary.result()
+
+    if clauses is None and timelines is None and summary is None:
+        return None
     # Fallback to OpenAI
     # if os.getenv("OPENAI_API_KEY"):
     #     summary = summarize_with_openai(text)
@@ -114,3 +317,98 @@ def generate_summary(text: str, lang: str) -> str:
     #         return summary
     # Fallback to naive rule-based summary
     # return " ".join(text.split(". ")[:5]) + "..."
+
+    return json.dumps({
+        "summary": summary or "",
+        "Timelines": timelines or {},
+        "Clauses": clauses or []
+    })
+
+def _hashed_pages(pages: Iterable[Union[dict, str]], hasher) -> Iterable[Union[dict, str]]:
+    """Pass pages through while hashing them exactly as "\n\n".join(pages) would be hashed."""
+    for index, page in enumerate(pages):
+        text = page.get("text", "") if isinstance(page, dict) else page
+        hasher.update((text if index == 0 else "\n\n" + text).encode("utf-8"))
+        yield page
+
+def generate_summary_streaming(
+    pages: Iterable[Union[dict, str]],
+    lang: str,
+    cache=None,
+    source_hash: str = None,
+    include_clauses: bool = True
+) -> str:
+    """
+    Produce the summary, timelines and clauses from a stream of pages.
+    Per-chunk LLM calls are submitted as soon as enough pages have arrived, so the
+    work on early pages overlaps extraction of later ones and the full text is never
+    held in memory at once.
+    Args:
+        pages: Page dicts ({"page": n, "text": ...}) or page strings, e.g. from iter_pdf_pages.
+        lang (str): Language of the summary.
+        cache: Optional SummaryCache. Results are stored under the text hash and, when
+            given, the source hash; lookups before streaming can only use the source hash.
+        source_hash (str): Optional hash of the source file, e.g. SHA-256 of the PDF bytes. It must also
+            cover whatever changes the extracted text, such as the extraction version and mode.
+        include_clauses (bool): Run the LLM clause stage; skip it when clauses come from the local segmenter.
+    Returns:
+        str: JSON string with "summary", "Timelines" and "Clauses", or None if every stage failed.
+    """
+    stages = {
+        "Clauses": (LANGUAGE_INDEPENDENT, CLAUSES_PROMPT_VERSION, _clauses_map, _clauses_reduce),
+        "Timelines": (LANGUAGE_INDEPENDENT, TIMELINES_PROMPT_VERSION, _timelines_map, _timelines_reduce),
+        "summary": (lang, SUMMARY_PROMPT_VERSION,
+                    lambda chunk: _call_gemini(_summary_prompt(chunk, lang)),
+                    lambda partials: _merge_summaries(partials, lang)),
+    }
+    if not include_clauses:
+        del stages["Clauses"]
+
+    results = {}
+    if cache is not None and source_hash:
+        for key, (stage_lang, version, _, _) in stages.items():
+            try:
+                results[key] = cache.get_by_hash(source_hash, stage_lang, SUMMARY_MODEL, version)
+            except Exception as e:
+                print(f"[WARN] Summary cache lookup failed: {e}")
+    pending = [key for key in stages if results.get(key) is None]
+
+    if pending:
+        text_hash = hashlib.sha256()
+        futures = {key: [] for key in pending}
+        chunk_count = 0
+        with ThreadPoolExecutor(max_workers=MAX_CHUNK_WORKERS) as executor:
+            for chunk in iter_page_chunks(_hashed_pages(pages, text_hash), CHUNK_TOKEN_BUDGET):
+                chunk_count += 1
+                for key in pending:
+                    futures[key].append(executor.submit(stages[key][2], chunk["text"]))
+            complete = {}
+            for key in pending:
+                partials = [future.result() for future in futures[key]]
+                results[key] = stages[key][3](partials)
+                complete[key] = _complete(partials)
+        print(f"[SUMMARY] Streamed {chunk_count} chunks for {', '.join(pending)}")
+
+        if cache is not None:
+            hashes = [text_hash.hexdigest()] + ([source_hash] if source_hash else [])
+            for key in pending:
+                if results[key] is None:
+                    continue
+                if not complete[key]:
+                    print(f"[SUMMARY] Not caching {stages[key][1]}: some chunks failed")
+                    continue
+                stage_lang, version = stages[key][0], stages[key][1]
+                for content_hash in hashes:
+                    try:
+                        cache.set_by_hash(content_hash, stage_lang, SUMMARY_MODEL, version, results[key])
+                    except Exception as e:
+                        print(f"[WARN] Could not cache {version}: {e}")
+
+    if all(results.get(key) is None for key in stages):
+        return None
+
+    return json.dumps({
+        "summary": results.get("summary") or "",
+        "Timelines": results.get("Timelines") or {},
+        "Clauses": results.get("Clauses") or []
+    })
@@ -0,0 +1,87 @@
+"""
+Summary Cache
+
+Caches the results of the summarization stages (clauses, timelines and
+per-language summaries) keyed by a hash of the extracted text, the output
+language, the model and the prompt-template version, so repeated analyses
+of the same document skip the Gemini calls.
+"""
+
+import hashlib
+from typing import Any, Optional
+
+
+class SummaryCache:
+    def __init__(self, storage, namespace: str = "summaries"):
+        """
+        Initialize the SummaryCache with a storage backend.
+        Args:
+            storage: Object exposing get_cache_entry(namespace, key) and
+                put_cache_entry(namespace, key, payload), e.g. GCSClient.
+            namespace (str): Cache namespace within the storage backend.
+        """
+        self.storage = storage
+        self.namespace = namespace
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        """Hash of the extracted document text; compute it once and use the *_by_hash methods for several stages."""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def make_key(text_hash: str, lang: str, model: str, prompt_version: str) -> str:
+        """
+        Build the cache key for a summary.
+        Args:
+            text_hash (str): Hash of the extracted document text.
+            lang (str): Output language, or "*" for language-independent stages.
+            model (str): Model that produced the summary.
+            prompt_version (str): Version of the stage's prompt template.
+        Returns:
+            str: Hex digest identifying the cache entry.
+        """
+        raw = "|".join([text_hash, lang.strip().lower(), model, prompt_version])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, text: str, lang: str, model: str, prompt_version: str) -> Optional[Any]:
+        """
+        Look up a cached stage result.
+        Returns:
+            The cached result, or None on a miss.
+        """
+        return self.get_by_hash(self.text_hash(text), lang, model, prompt_version)
+
+    def get_by_hash(self, content_hash: str, lang: str, model: str, prompt_version: str) -> Optional[Any]:
+        """
+        Look up a cached stage result by a precomputed hash (of the text or of the source file).
+        Returns:
+            The cached result, or None on a miss.
+        """
+        key = self.make_key(content_hash, lang, model, prompt_version)
+        entry = self.storage.get_cache_entry(self.namespace, key)
+        if entry:
+            return entry.get("response")
+        return None
+
+    def set(self, text: str, lang: str, model: str, prompt_version: str, response: Any) -> bool:
+        """
+        Store a stage result (any JSON-serializable value).
+        Returns:
+            bool: True if the entry was written.
+        """
+        return self.set_by_hash(self.text_hash(text), lang, model, prompt_version, response)
+
+    def set_by_hash(self, content_hash: str, lang: str, model: str, prompt_version: str, response: Any) -> bool:
+        """
+        Store a stage result under a precomputed hash (of the text or of the source file).
+        Returns:
+            bool: True if the entry was written.
+        """
+        key = self.make_key(content_hash, lang, model, prompt_version)
+        return self.storage.put_cache_entry(self.namespace, key, {
+            "response": response,
+            "content_hash": content_hash,
+            "lang": lang,
+            "model": model,
+            "prompt_version": prompt_version
+        })